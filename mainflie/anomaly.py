@@ -0,0 +1,236 @@
+import heapq
+import math
+from collections import deque
+
+# =============================================================================
+# 수집 단계 이상치 필터 (지표별 증분 통계)
+#
+# 지표마다 아래 통계를 읽기 한 건씩 갱신한다 (히스토리를 다시 훑지 않음):
+#   - Welford 누적 평균/분산
+#   - EWMA 평균/분산 (최근 값에 가중)
+#   - 최근 window개의 이동 중앙값 (두 힙 + 지연 삭제, 읽기당 O(log w))
+#
+# 판정:
+#   - 물리적으로 불가능한 값(PHYSICAL_LIMITS 밖)은 바로 거부
+#   - 워밍업 이후 |값 - 이동 중앙값| / EWMA 표준편차가
+#       flag_z 이상이면 표시(flagged), reject_z 이상이면 거부(rejected)
+#   - 거부된 값은 통계에 반영하지 않는다 (스파이크가 기준을 끌고 가지 않도록)
+#   - 단, 연속으로 max_rejects번 거부되면 실제 수준 변화로 보고 통계를 새로 시작
+# =============================================================================
+
+# 센서가 낼 수 있는 값의 범위 - 밖이면 통신/센서 오류로 본다
+PHYSICAL_LIMITS = {
+    "temperature": (-40.0, 80.0),
+    "soil_temperature": (-40.0, 80.0),
+    "humidity": (0.0, 100.0),
+    "soil_moisture": (0.0, 100.0),
+    "water_level": (0.0, 100.0),
+    "light_intensity": (0.0, 200000.0),
+    "ph": (0.0, 14.0),
+    "ec": (0.0, 20.0),
+    "co2": (0.0, 10000.0),
+}
+
+
+class RollingMedian:
+    """최근 window개 값의 중앙값 (최대 힙 + 최소 힙, 빠진 값은 지연 삭제)"""
+
+    def __init__(self, window):
+        self.window = window
+        self.values = deque()
+        self.low = []    # 작은 절반 (부호를 뒤집은 최대 힙)
+        self.high = []   # 큰 절반 (최소 힙)
+        self.low_size = 0   # 지연 삭제분을 뺀 실제 개수
+        self.high_size = 0
+        self.delayed = {}   # 값 -> 아직 힙에서 꺼내지 않은 삭제 개수
+
+    def _prune(self, heap, sign):
+        while heap:
+            value = heap[0] * sign
+            if not self.delayed.get(value):
+                break
+            self.delayed[value] -= 1
+            if not self.delayed[value]:
+                del self.delayed[value]
+            heapq.heappop(heap)
+
+    def _balance(self):
+        if self.low_size > self.high_size + 1:
+            heapq.heappush(self.high, -heapq.heappop(self.low))
+            self.low_size -= 1
+            self.high_size += 1
+            self._prune(self.low, -1)
+        elif self.low_size < self.high_size:
+            heapq.heappush(self.low, -heapq.heappop(self.high))
+            self.high_size -= 1
+            self.low_size += 1
+            self._prune(self.high, 1)
+
+    def add(self, value):
+        if not self.low or value <= -self.low[0]:
+            heapq.heappush(self.low, -value)
+            self.low_size += 1
+        else:
+            heapq.heappush(self.high, value)
+            self.high_size += 1
+        self.values.append(value)
+
+        if len(self.values) > self.window:
+            old = self.values.popleft()
+            self.delayed[old] = self.delayed.get(old, 0) + 1
+            if old <= -self.low[0]:
+                self.low_size -= 1
+                if old == -self.low[0]:
+                    self._prune(self.low, -1)
+            else:
+                self.high_size -= 1
+                if old == self.high[0]:
+                    self._prune(self.high, 1)
+        self._balance()
+        # 꼭대기가 아닌 곳에서 지연 삭제된 값이 쌓이면 가끔 다시 만든다 (분할 상환 O(log w))
+        if len(self.low) + len(self.high) > 4 * self.window + 8:
+            self._rebuild()
+
+    def _rebuild(self):
+        ordered = sorted(self.values)
+        half = (len(ordered) + 1) // 2
+        self.low = [-value for value in ordered[:half]]
+        self.high = ordered[half:]
+        heapq.heapify(self.low)
+        heapq.heapify(self.high)
+        self.low_size = len(self.low)
+        self.high_size = len(self.high)
+        self.delayed = {}
+
+    def median(self):
+        if not self.values:
+            return None
+        if self.low_size > self.high_size:
+            return -self.low[0]
+        return (-self.low[0] + self.high[0]) / 2
+
+
+class MetricStats:
+    """지표 하나의 증분 통계"""
+
+    def __init__(self, window, alpha):
+        self.alpha = alpha
+        self.count = 0
+        self.mean = 0.0
+        self.m2 = 0.0           # Welford 제곱편차 합
+        self.ewma = None
+        self.ewm_var = 0.0
+        self.median = RollingMedian(window)
+        self.flagged = 0
+        self.rejected = 0
+        self.consecutive_rejects = 0
+
+    def reset(self):
+        """수준이 바뀌었을 때 통계를 새로 시작 (표시/거부 횟수는 유지)"""
+        self.count = 0
+        self.mean = 0.0
+        self.m2 = 0.0
+        self.ewma = None
+        self.ewm_var = 0.0
+        self.median = RollingMedian(self.median.window)
+
+    def std(self):
+        return math.sqrt(self.m2 / (self.count - 1)) if self.count > 1 else 0.0
+
+    def update(self, value):
+        self.count += 1
+        delta = value - self.mean
+        self.mean += delta / self.count
+        self.m2 += delta * (value - self.mean)
+
+        if self.ewma is None:
+            self.ewma = value
+        else:
+            diff = value - self.ewma
+            increment = self.alpha * diff
+            self.ewma += increment
+            self.ewm_var = (1 - self.alpha) * (self.ewm_var + diff * increment)
+        self.median.add(value)
+
+    def to_dict(self):
+        return {
+            "count": self.count,
+            "mean": self.mean,
+            "std": self.std(),
+            "ewma": self.ewma,
+            "ewm_std": math.sqrt(self.ewm_var),
+            "median": self.median.median(),
+            "flagged": self.flagged,
+            "rejected": self.rejected
+        }
+
+
+class AnomalyFilter:
+    """저장소 수집 단계에서 읽기마다 호출되는 이상치 필터
+
+    농장/지표별 통계를 들고 있으며, 저장소가 같은 농장의 읽기를 항상 같은 잠금
+    안에서 넘기므로 따로 잠그지 않는다.
+    """
+
+    def __init__(self, window=31, alpha=0.1, flag_z=4.0, reject_z=8.0, warmup=20,
+                 max_rejects=5, min_scale=0.1, relative_scale=0.02, limits=None):
+        self.window = window
+        self.alpha = alpha
+        self.flag_z = flag_z
+        self.reject_z = reject_z
+        self.warmup = warmup
+        self.max_rejects = max_rejects
+        # 값이 한동안 일정하면 EWMA 표준편차가 0에 가까워져 작은 흔들림도 큰 z가 된다.
+        # 센서 분해능 정도(절대값, 중앙값의 비율)를 척도의 하한으로 둔다.
+        self.min_scale = min_scale
+        self.relative_scale = relative_scale
+        self.limits = PHYSICAL_LIMITS if limits is None else limits
+        self.stats = {}  # farm_id -> {metric: MetricStats}
+
+    def check(self, farm_id, reading):
+        """읽기 한 건 검사 → (표시된 지표 목록, 거부된 지표 목록)
+
+        bool(액추에이터) 필드는 검사하지 않는다.
+        """
+        farm_stats = self.stats.setdefault(farm_id, {})
+        flagged = []
+        rejected = []
+        for metric, value in reading.items():
+            if isinstance(value, bool) or not isinstance(value, (int, float)) or metric == "timestamp":
+                continue
+            value = float(value)
+            stats = farm_stats.get(metric)
+            if stats is None:
+                stats = farm_stats[metric] = MetricStats(self.window, self.alpha)
+
+            limit = self.limits.get(metric)
+            if math.isnan(value) or (limit and not limit[0] <= value <= limit[1]):
+                stats.rejected += 1
+                rejected.append(metric)
+                continue
+
+            if stats.count >= self.warmup:
+                median = stats.median.median()
+                scale = max(math.sqrt(stats.ewm_var), self.min_scale, abs(median) * self.relative_scale)
+                z = abs(value - median) / scale
+                if z >= self.reject_z and stats.consecutive_rejects < self.max_rejects:
+                    stats.rejected += 1
+                    stats.consecutive_rejects += 1
+                    rejected.append(metric)
+                    continue
+                if z >= self.reject_z:
+                    stats.reset()  # 계속 같은 쪽으로 벗어나면 실제 변화
+                elif z >= self.flag_z:
+                    stats.flagged += 1
+                    flagged.append(metric)
+            stats.consecutive_rejects = 0
+            stats.update(value)
+        return flagged, rejected
+
+    def snapshot(self, farm_id, metric=None):
+        """농장의 지표별 통계 dict (metric을 주면 그 지표만)"""
+        farm_stats = self.stats.get(farm_id, {})
+        if metric is not None:
+            stats = farm_stats.get(metric)
+            return {metric: stats.to_dict()} if stats is not None else {}
+        return {name: stats.to_dict() for name, stats in list(farm_stats.items())}
@@ -0,0 +1,189 @@
+import os
+import queue
+import sqlite3
+import threading
+import time
+
+# =============================================================================
+# SQLite 장기 보관소 (원본 + 1분/1시간 롤업)
+# =============================================================================
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS readings (
+    farm_id TEXT NOT NULL,
+    metric TEXT NOT NULL,
+    ts REAL NOT NULL,
+    value REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_readings ON readings (farm_id, metric, ts);
+CREATE INDEX IF NOT EXISTS idx_readings_ts ON readings (ts);
+CREATE TABLE IF NOT EXISTS rollup_1m (
+    farm_id TEXT NOT NULL,
+    metric TEXT NOT NULL,
+    bucket INTEGER NOT NULL,
+    min REAL, max REAL, sum REAL, count INTEGER,
+    PRIMARY KEY (farm_id, metric, bucket)
+) WITHOUT ROWID;
+CREATE TABLE IF NOT EXISTS rollup_1h (
+    farm_id TEXT NOT NULL,
+    metric TEXT NOT NULL,
+    bucket INTEGER NOT NULL,
+    min REAL, max REAL, sum REAL, count INTEGER,
+    PRIMARY KEY (farm_id, metric, bucket)
+) WITHOUT ROWID;
+"""
+
+# 해상도 이름 → 롤업 테이블, 버킷 크기(초)
+ROLLUPS = (("1m", "rollup_1m", 60), ("1h", "rollup_1h", 3600))
+
+
+class SensorArchive:
+    """센서 읽기를 SQLite에 쌓아두고 범위 조회 시 알맞은 해상도를 골라주는 보관소
+
+    - 저장소의 recorder로 등록되어 큐에 넣기만 하고, 기록 스레드가 executemany로 일괄 삽입
+    - 같은 스레드가 주기적으로 1분/1시간 min/max/avg 롤업을 갱신
+    - 조회는 요청한 포인트 수를 넘지 않는 가장 세밀한 해상도를 자동 선택
+    """
+
+    def __init__(self, path="data/archive.db", flush_interval=1.0, rollup_interval=60,
+                 raw_retention_days=30):
+        self.path = path
+        self.flush_interval = flush_interval
+        self.rollup_interval = rollup_interval
+        self.raw_retention_seconds = raw_retention_days * 86400 if raw_retention_days else None
+
+        self.queue = queue.Queue()
+        self.local = threading.local()  # 조회 스레드별 읽기 연결
+        self.running = False
+        self.thread = None
+        self.rollup_from = None  # 다음 롤업을 다시 계산할 시작 시각
+        self.last_rollup = 0.0
+
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        connection = self._connect()
+        connection.executescript(SCHEMA)
+        row = connection.execute("SELECT MAX(bucket) FROM rollup_1m").fetchone()
+        self.rollup_from = row[0] if row[0] is not None else 0
+        connection.close()
+
+    def _connect(self):
+        connection = sqlite3.connect(self.path, timeout=10)
+        connection.execute("PRAGMA journal_mode=WAL")
+        connection.execute("PRAGMA synchronous=NORMAL")
+        return connection
+
+    # --- 기록 ---
+    def record(self, farm_id, ts, values):
+        """저장소 recorder - 큐에 넣기만 한다"""
+        for metric, value in values.items():
+            self.queue.put((farm_id, metric, ts, value))
+
+    def start(self):
+        self.running = True
+        self.thread = threading.Thread(target=self._run, daemon=True)
+        self.thread.start()
+
+    def _run(self):
+        connection = self._connect()
+        while self.running or not self.queue.empty():
+            time.sleep(self.flush_interval)
+            rows = []
+            while True:
+                try:
+                    rows.append(self.queue.get_nowait())
+                except queue.Empty:
+                    break
+            if rows:
+                with connection:
+                    connection.executemany(
+                        "INSERT INTO readings (farm_id, metric, ts, value) VALUES (?, ?, ?, ?)", rows
+                    )
+                # 늦게 도착한 읽기(스풀 재전송 등)가 있으면 그 버킷부터 다시 계산
+                oldest = min(row[2] for row in rows)
+                self.rollup_from = min(self.rollup_from, int(oldest // 60) * 60)
+            if time.time() - self.last_rollup >= self.rollup_interval:
+                self._rollup(connection)
+        self._rollup(connection)
+        connection.close()
+
+    def _rollup(self, connection):
+        """rollup_from 이후 버킷의 1분/1시간 롤업 재계산 (진행 중인 버킷 포함)"""
+        now = time.time()
+        start_minute = int(self.rollup_from // 60) * 60
+        start_hour = int(self.rollup_from // 3600) * 3600
+        with connection:
+            connection.execute("""
+                INSERT OR REPLACE INTO rollup_1m (farm_id, metric, bucket, min, max, sum, count)
+                SELECT farm_id, metric, CAST(ts / 60 AS INTEGER) * 60,
+                       MIN(value), MAX(value), SUM(value), COUNT(*)
+                FROM readings WHERE ts >= ?
+                GROUP BY farm_id, metric, CAST(ts / 60 AS INTEGER)
+            """, (start_minute,))
+            connection.execute("""
+                INSERT OR REPLACE INTO rollup_1h (farm_id, metric, bucket, min, max, sum, count)
+                SELECT farm_id, metric, (bucket / 3600) * 3600,
+                       MIN(min), MAX(max), SUM(sum), SUM(count)
+                FROM rollup_1m WHERE bucket >= ?
+                GROUP BY farm_id, metric, bucket / 3600
+            """, (start_hour,))
+            if self.raw_retention_seconds:
+                connection.execute("DELETE FROM readings WHERE ts < ?", (now - self.raw_retention_seconds,))
+        # 현재 진행 중인 분은 다음 번에 다시 계산
+        self.rollup_from = int(now // 60) * 60
+        self.last_rollup = now
+
+    def close(self):
+        self.running = False
+        if self.thread is not None:
+            self.thread.join()
+
+    # --- 조회 ---
+    def _reader(self):
+        connection = getattr(self.local, "connection", None)
+        if connection is None:
+            connection = self._connect()
+            self.local.connection = connection
+        return connection
+
+    def query(self, farm_id, metric, start_ts, end_ts, max_points=500):
+        """[start_ts, end_ts] 구간을 max_points 이하로 반환할 수 있는 가장 세밀한 해상도로 조회"""
+        connection = self._reader()
+        # max_points + 1건까지만 세면 충분하다 (한 달치 원본을 다 세지 않도록)
+        raw_count = connection.execute(
+            "SELECT COUNT(*) FROM (SELECT 1 FROM readings WHERE farm_id = ? AND metric = ? "
+            "AND ts BETWEEN ? AND ? LIMIT ?)",
+            (farm_id, metric, start_ts, end_ts, max_points + 1)
+        ).fetchone()[0]
+
+        if raw_count <= max_points:
+            rows = connection.execute(
+                "SELECT ts, value FROM readings WHERE farm_id = ? AND metric = ? AND ts BETWEEN ? AND ? "
+                "ORDER BY ts", (farm_id, metric, start_ts, end_ts)
+            ).fetchall()
+            return {
+                "resolution": "raw",
+                "timestamps": [row[0] for row in rows],
+                "values": [row[1] for row in rows]
+            }
+
+        span = end_ts - start_ts
+        resolution, table, bucket_seconds = ROLLUPS[-1]
+        for name, rollup_table, seconds in ROLLUPS:
+            if span / seconds <= max_points:
+                resolution, table, bucket_seconds = name, rollup_table, seconds
+                break
+
+        rows = connection.execute(
+            f"SELECT bucket, min, max, sum, count FROM {table} "
+            "WHERE farm_id = ? AND metric = ? AND bucket BETWEEN ? AND ? ORDER BY bucket",
+            (farm_id, metric, int(start_ts // bucket_seconds) * bucket_seconds, end_ts)
+        ).fetchall()
+        return {
+            "resolution": resolution,
+            "timestamps": [row[0] for row in rows],
+            "values": [row[3] / row[4] for row in rows],
+            "min": [row[1] for row in rows],
+            "max": [row[2] for row in rows]
+        }
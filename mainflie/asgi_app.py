@@ -0,0 +1,502 @@
+import asyncio
+import hashlib
+import io
+import json
+import logging
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import parse_qs
+
+from farm_summary import FarmSummary
+from main import (DASHBOARD_PATH, DEFAULT_FARM_ID, HTTP_REQUEST_SECONDS, CachedJSON, SimpleWebApp, decode_batch,
+                  load_page, register_store_metrics, validate_readings)
+from metrics import REGISTRY, CONTENT_TYPE as METRICS_CONTENT_TYPE
+from log_setup import set_level
+from profiler import PROFILER, parse_options as parse_profiler_options
+from stream import format_sse
+from wire_format import PACKED_TYPE
+
+logger = logging.getLogger("smartfarm.asgi")
+
+# =============================================================================
+# asyncio(ASGI) 서빙 모드
+#
+# Flask 개발 서버는 연결마다 스레드를 하나씩 쓰므로 SSE처럼 오래 열려 있는
+# 연결이 수천 개가 되면 버티지 못한다. 여기서는 같은 저장소를 쓰는 ASGI 앱을
+# 이벤트 루프 하나로 돌리고, uvicorn으로 서빙한다 (keep-alive 설정).
+#
+# 수집/최신값/SSE/요약처럼 부하가 큰 경로만 여기서 직접 처리하고, 나머지 라우트
+# (히스토리, 보관소, 규칙, 명령 등)는 같은 저장소를 쓰는 Flask 앱(SimpleWebApp)에
+# 스레드 풀에서 넘긴다 - 어느 서버로 띄워도 API가 같다.
+#
+# 사용 방법:
+#   python main.py asgi        # 단일 프로세스 (저장소/영속화/시뮬레이터 공유)
+# =============================================================================
+
+MAX_BODY_BYTES = 10 * 1024 * 1024
+INGEST_BATCH_MAX = 1000
+FALLBACK_THREADS = 32  # Flask 라우트용 스레드 (명령 롱폴링이 요청마다 최대 30초 붙잡음)
+ROUTES = ("/", "/api/data", "/api/farms/summary", "/api/stream", "/api/external_data",
+          "/api/external_data/batch", "/metrics", "/api/profiler")  # 지표 라벨로 쓰는 경로 (그 밖은 "unmatched")
+
+
+class AsyncSubscriber:
+    """SSE 구독자 한 명 (이벤트 루프 안의 제한 큐)"""
+
+    def __init__(self, max_queue, topic):
+        self.queue = asyncio.Queue(maxsize=max_queue)
+        self.topic = topic
+        self.dropped = False
+
+
+class AsyncWebApp:
+    """SimpleWebApp과 같은 라우트를 제공하는 ASGI 앱
+
+    - 수집 요청은 본문을 수집 스레드에서 해석해 큐에 넣고 바로 응답한다 (이벤트 루프를 막지 않음)
+    - 수집 작업자가 큐에 쌓인 읽기를 모아 별도 스레드에서 update_batch로 반영
+    - SSE 구독자는 스레드가 아니라 asyncio 큐 하나씩만 차지한다
+    - 직접 처리하지 않는 경로는 SimpleWebApp(WSGI)에 넘긴다
+    """
+
+    def __init__(self, data_store, template_path=None, ingest_queue_size=10000,
+                 stream_queue_size=100, keepalive=15, archive=None):
+        self.data_store = data_store
+        # 나머지 라우트용 Flask 앱 - 요약도 같이 쓴다 (저장소 리스너를 두 번 걸지 않음)
+        self.fallback = SimpleWebApp(data_store, archive=archive, dashboard_path=template_path or DASHBOARD_PATH)
+        self.fallback_executor = ThreadPoolExecutor(max_workers=FALLBACK_THREADS, thread_name_prefix="wsgi")
+        self.template_path = template_path or DASHBOARD_PATH
+        self.ingest_queue_size = ingest_queue_size
+        self.stream_queue_size = stream_queue_size
+        self.keepalive = keepalive
+
+        self.response_cache = {}  # farm_id -> CachedJSON
+        self.subscribers = set()
+        self.dashboard = load_page(self.template_path)  # CachedJSON - 시작할 때 한 번 읽음
+        self.loop = None
+        self.ingest_queue = None
+        self.ingest_task = None
+        # 저장소 반영은 순서를 지키도록 스레드 하나에서만 한다
+        self.executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="ingest")
+        self.data_store.add_listener(self.publish_changes)
+        self.summary = self.fallback.summary
+
+        register_store_metrics(data_store)
+        REGISTRY.register_callback("smartfarm_stream_clients", "SSE 구독자 수", lambda: len(self.subscribers))
+        REGISTRY.register_callback("smartfarm_asgi_ingest_queue_depth", "수집 큐에 쌓인 읽기 수",
+                                   lambda: self.ingest_queue.qsize() if self.ingest_queue is not None else 0)
+
+    # --- 시작/종료 ---
+    def _ensure_started(self):
+        """lifespan을 보내지 않는 서버도 있으므로 첫 요청에서도 시작"""
+        if self.ingest_task is None:
+            self.loop = asyncio.get_running_loop()
+            self.ingest_queue = asyncio.Queue(maxsize=self.ingest_queue_size)
+            self.ingest_task = self.loop.create_task(self._ingest_worker())
+
+    async def _shutdown(self):
+        if self.ingest_task is not None:
+            await self.ingest_queue.join()
+            self.ingest_task.cancel()
+        self.executor.shutdown(wait=True)
+        self.fallback_executor.shutdown(wait=False)
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] == "lifespan":
+            while True:
+                message = await receive()
+                if message["type"] == "lifespan.startup":
+                    self._ensure_started()
+                    await send({"type": "lifespan.startup.complete"})
+                elif message["type"] == "lifespan.shutdown":
+                    await self._shutdown()
+                    await send({"type": "lifespan.shutdown.complete"})
+                    return
+        if scope["type"] != "http":
+            return
+
+        self._ensure_started()
+        path = scope["path"]
+        method = scope["method"]
+        if path not in ROUTES:
+            await self.handle_fallback(scope, receive, send)  # 응답 시간은 Flask 쪽에서 기록
+            return
+        started = time.perf_counter()
+        route = path if path in ROUTES else "unmatched"
+
+        async def timed_send(message):
+            # 응답 헤더가 나갈 때까지의 시간 (SSE도 스트림 시작까지)
+            if message["type"] == "http.response.start":
+                HTTP_REQUEST_SECONDS.observe(time.perf_counter() - started, method, route, str(message["status"]))
+            await send(message)
+
+        await self.route(scope, receive, timed_send, path, method)
+
+    async def route(self, scope, receive, send, path, method):
+        if path == "/" and method in ("GET", "HEAD"):
+            await self.handle_dashboard(scope, send)
+        elif path == "/api/data" and method in ("GET", "HEAD"):
+            await self.handle_data(scope, send)
+        elif path == "/api/farms/summary" and method in ("GET", "HEAD"):
+            await self.handle_summary(scope, send)
+        elif path == "/api/stream" and method == "GET":
+            await self.handle_stream(scope, receive, send)
+        elif path == "/api/external_data" and method == "POST":
+            await self.handle_ingest(scope, receive, send, batch=False)
+        elif path == "/api/external_data/batch" and method == "POST":
+            await self.handle_ingest(scope, receive, send, batch=True)
+        elif path == "/metrics" and method == "GET":
+            await send_response(send, 200, REGISTRY.render().encode("utf-8"), METRICS_CONTENT_TYPE)
+        elif path == "/api/profiler" and method in ("GET", "POST"):
+            await self.handle_profiler(scope, receive, send, method)
+        else:
+            await send_json(send, 404, {"status": "error", "message": "찾을 수 없는 경로입니다"})
+
+    # --- 라우트 ---
+    async def handle_fallback(self, scope, receive, send):
+        """직접 처리하지 않는 경로 - Flask 앱을 스레드 풀에서 호출 (응답은 통째로 모아서 보냄)"""
+        body = await read_body(receive)
+        if body is None:
+            await send_json(send, 413, {"status": "error", "message": "요청 본문이 너무 큽니다"})
+            return
+        status, headers, body = await self.loop.run_in_executor(
+            self.fallback_executor, call_wsgi, self.fallback.app, wsgi_environ(scope, body))
+        await send({"type": "http.response.start", "status": status, "headers": headers})
+        await send({"type": "http.response.body", "body": body})
+
+    async def handle_profiler(self, scope, receive, send, method):
+        """샘플링 프로파일러 (main.SimpleWebApp의 /api/profiler와 같은 형식)"""
+        if method == "POST":
+            body = await read_body(receive)
+            try:
+                options = json.loads(body) if body else {}
+            except ValueError:
+                options = {}
+            try:
+                reset, enabled, interval, log_level = parse_profiler_options(options)
+            except ValueError as e:
+                await send_json(send, 400, {"status": "error", "message": str(e)})
+                return
+            if reset:
+                PROFILER.reset()
+            if log_level is not None:
+                set_level(log_level)
+            if enabled is not None:
+                # 샘플러 정지는 스레드 join을 기다리므로 이벤트 루프 밖에서
+                action = PROFILER.start if enabled else PROFILER.stop
+                args = (interval,) if enabled else ()
+                await self.loop.run_in_executor(None, action, *args)
+        if query_param(scope, "format") == "collapsed":
+            await send_response(send, 200, PROFILER.collapsed().encode("utf-8"), "text/plain; charset=utf-8")
+            return
+        await send_json(send, 200, PROFILER.report())
+
+    async def handle_dashboard(self, scope, send):
+        """메인 대시보드 - 메모리에 둔 페이지 (ETag/304, gzip)"""
+        if self.dashboard is None:
+            await send_response(send, 500, f"템플릿 파일 오류: {self.template_path}".encode("utf-8"),
+                                "text/plain; charset=utf-8")
+            return
+        await send_cached(scope, send, self.dashboard, "text/html; charset=utf-8")
+
+    async def handle_data(self, scope, send):
+        """센서 데이터 API (?farm_id=) - ETag/304, gzip"""
+        farm_id = query_param(scope, "farm_id", DEFAULT_FARM_ID)
+        data = self.data_store.snapshot(farm_id)
+        if data is None:
+            await send_json(send, 404, {"status": "error", "message": "알 수 없는 농장입니다"})
+            return
+
+        cached = self.response_cache.get(farm_id)
+        if cached is None or cached.version != data["data_version"]:
+            cached = CachedJSON(data)
+            self.response_cache[farm_id] = cached
+        await send_cached(scope, send, cached)
+
+    async def handle_summary(self, scope, send):
+        """전체 농장 요약 (?fields=&since=) - main.SimpleWebApp의 /api/farms/summary와 같은 형식"""
+        fields = FarmSummary.parse_fields(query_param(scope, "fields"))
+        try:
+            since = int(query_param(scope, "since")) if query_param(scope, "since") else None
+        except ValueError:
+            await send_json(send, 400, {"status": "error", "message": "since는 정수여야 합니다"})
+            return
+        version, body = self.summary.render(fields, since)
+        tag = hashlib.blake2b(repr((fields, since)).encode("utf-8"), digest_size=4).hexdigest()
+        await send_cached(scope, send, CachedJSON.from_body(body, version, f"summary-{version}-{tag}"))
+
+    async def handle_ingest(self, scope, receive, send, batch):
+        """외부(라즈베리파이) 데이터 수신 - 해석 후 큐에 넣고 바로 응답"""
+        body = await read_body(receive)
+        if body is None:
+            await send_json(send, 413, {"status": "error", "message": "요청 본문이 너무 큽니다"})
+            return
+        content_type = header(scope, b"content-type")
+        try:
+            # 압축 해제/JSON 해석은 최대 10 MB라 이벤트 루프 밖(수집 스레드)에서 한다
+            readings = await self.loop.run_in_executor(
+                self.executor, parse_ingest_body, body, content_type, header(scope, b"content-encoding"), batch)
+        except ImportError:
+            await send_json(send, 415, {"status": "error", "message": "zstd 압축 해제를 지원하지 않습니다"})
+            return
+        except Exception as e:
+            logger.warning("❌ 외부 데이터 수신 오류: %s", e)
+            await send_json(send, 400, {"status": "error", "message": str(e)})
+            return
+
+        if self.ingest_queue.qsize() + len(readings) > self.ingest_queue_size:
+            await send_json(send, 503, {"status": "error", "message": "수신 대기열이 가득 찼습니다"},
+                            [(b"retry-after", b"1")])
+            return
+        for reading in readings:
+            reading["source"] = "raspberry_pi"
+            self.ingest_queue.put_nowait(reading)
+
+        result = {"status": "success"}
+        if batch:
+            result["count"] = len(readings)
+        await send_json(send, 200, result)
+
+    async def handle_stream(self, scope, receive, send):
+        """SSE 스트림 - 접속 시 전체 스냅샷, 이후 변경분만 전송 (?farm_id=)"""
+        farm_id = query_param(scope, "farm_id", DEFAULT_FARM_ID)
+        if self.data_store.snapshot(farm_id) is None:
+            await send_json(send, 404, {"status": "error", "message": "알 수 없는 농장입니다"})
+            return
+
+        subscriber = AsyncSubscriber(self.stream_queue_size, farm_id)
+        self.subscribers.add(subscriber)
+        data = self.data_store.snapshot(farm_id)
+        disconnected = asyncio.Event()
+
+        async def watch_disconnect():
+            while (await receive())["type"] != "http.disconnect":
+                pass
+            disconnected.set()
+            if not subscriber.queue.full():
+                subscriber.queue.put_nowait(None)  # 대기 중인 get()을 깨운다
+
+        watcher = asyncio.ensure_future(watch_disconnect())
+        try:
+            await send({
+                "type": "http.response.start",
+                "status": 200,
+                "headers": [(b"content-type", b"text/event-stream; charset=utf-8"),
+                            (b"cache-control", b"no-cache"), (b"x-accel-buffering", b"no")]
+            })
+            initial = "retry: 3000\n\n" + format_sse("snapshot", data, data["data_version"])
+            await send({"type": "http.response.body", "body": initial.encode("utf-8"), "more_body": True})
+            while not subscriber.dropped and not disconnected.is_set():
+                try:
+                    message = await asyncio.wait_for(subscriber.queue.get(), self.keepalive)
+                except asyncio.TimeoutError:
+                    message = ": keepalive\n\n"
+                if message is None:
+                    break
+                await send({"type": "http.response.body", "body": message.encode("utf-8"), "more_body": True})
+            if not disconnected.is_set():
+                await send({"type": "http.response.body", "body": b""})
+        finally:
+            self.subscribers.discard(subscriber)
+            watcher.cancel()
+
+    # --- 변경 전파 / 수집 작업자 ---
+    def publish_changes(self, changes, snapshot):
+        """저장소 리스너 (수집 스레드에서 호출) - 이벤트 루프로 넘겨서 전달"""
+        if self.loop is not None and self.subscribers:
+            self.loop.call_soon_threadsafe(self._fan_out, changes)
+
+    def _fan_out(self, changes):
+        farm_id = changes["farm_id"]
+        subscribers = [subscriber for subscriber in self.subscribers if subscriber.topic == farm_id]
+        if not subscribers:
+            return
+        message = format_sse("delta", changes, changes["data_version"])
+        for subscriber in subscribers:
+            try:
+                subscriber.queue.put_nowait(message)
+            except asyncio.QueueFull:
+                # 느린 클라이언트는 끊는다 - 재접속하면 스냅샷부터 다시 받음
+                subscriber.dropped = True
+                self.subscribers.discard(subscriber)
+
+    async def _ingest_worker(self):
+        """큐에 쌓인 읽기를 모아 저장소에 반영 (잠금/리스너는 작업 스레드에서)"""
+        while True:
+            readings = [await self.ingest_queue.get()]
+            while len(readings) < INGEST_BATCH_MAX and not self.ingest_queue.empty():
+                readings.append(self.ingest_queue.get_nowait())
+            try:
+                await self.loop.run_in_executor(self.executor, self.data_store.update_batch, readings)
+            except Exception as e:
+                logger.error("❌ 수집 반영 오류: %s", e)
+            finally:
+                for _ in readings:
+                    self.ingest_queue.task_done()
+
+
+def parse_ingest_body(body, content_type, content_encoding, batch):
+    """수집 요청 본문 → 검증한 읽기 목록 (단건 JSON, 배치, 압축 바이너리)"""
+    if batch or content_type.split(";")[0].strip() == PACKED_TYPE:
+        # 압축 바이너리는 단건도 읽기 목록으로 온다
+        return validate_readings(decode_batch(body, content_type, content_encoding))
+    return validate_readings([json.loads(body)])
+
+
+# =============================================================================
+# ASGI 헬퍼
+# =============================================================================
+
+def header(scope, name, default=""):
+    for key, value in scope["headers"]:
+        if key == name:
+            return value.decode("latin-1")
+    return default
+
+
+def query_param(scope, name, default=None):
+    values = parse_qs(scope.get("query_string", b"").decode("latin-1")).get(name)
+    return values[0] if values else default
+
+
+async def send_cached(scope, send, cached, content_type="application/json"):
+    """CachedJSON 응답 - ETag/If-None-Match(304)와 gzip 지원"""
+    use_gzip = accepts_gzip(scope)
+    etag = cached.etag + ("-gz" if use_gzip else "")
+    headers = [(b"etag", f'"{etag}"'.encode()), (b"vary", b"Accept-Encoding"),
+               (b"cache-control", b"no-cache")]
+    if etag_matches(header(scope, b"if-none-match"), etag):
+        await send_response(send, 304, b"", None, headers)
+        return
+    body = cached.body
+    if use_gzip:
+        body = cached.gzip_body
+        headers.append((b"content-encoding", b"gzip"))
+    await send_response(send, 200, body, content_type, headers)
+
+
+def accepts_gzip(scope):
+    return "gzip" in header(scope, b"accept-encoding")
+
+
+def etag_matches(if_none_match, etag):
+    """If-None-Match 헤더에 etag가 있는지 (약한 비교, * 허용)"""
+    for candidate in if_none_match.split(","):
+        candidate = candidate.strip()
+        if candidate.startswith("W/"):
+            candidate = candidate[2:]
+        if candidate == "*" or candidate.strip('"') == etag:
+            return True
+    return False
+
+
+async def read_body(receive, limit=MAX_BODY_BYTES):
+    """요청 본문 전체 읽기 - limit을 넘으면 None"""
+    chunks = []
+    size = 0
+    while True:
+        message = await receive()
+        if message["type"] == "http.disconnect":
+            break
+        chunk = message.get("body", b"")
+        size += len(chunk)
+        if size > limit:
+            return None
+        chunks.append(chunk)
+        if not message.get("more_body", False):
+            break
+    return b"".join(chunks)
+
+
+def wsgi_environ(scope, body):
+    """ASGI HTTP scope + 본문 → WSGI environ"""
+    server = scope.get("server") or ("localhost", 80)
+    environ = {
+        "REQUEST_METHOD": scope["method"],
+        "SCRIPT_NAME": scope.get("root_path", "").encode("utf-8").decode("latin-1"),
+        "PATH_INFO": scope["path"].encode("utf-8").decode("latin-1"),
+        "QUERY_STRING": scope.get("query_string", b"").decode("latin-1"),
+        "SERVER_NAME": server[0],
+        "SERVER_PORT": str(server[1]),
+        "SERVER_PROTOCOL": f"HTTP/{scope.get('http_version', '1.1')}",
+        "CONTENT_LENGTH": str(len(body)),
+        "wsgi.version": (1, 0),
+        "wsgi.url_scheme": scope.get("scheme", "http"),
+        "wsgi.input": io.BytesIO(body),
+        "wsgi.errors": sys.stderr,
+        "wsgi.multithread": True,
+        "wsgi.multiprocess": False,
+        "wsgi.run_once": False
+    }
+    if scope.get("client"):
+        environ["REMOTE_ADDR"] = scope["client"][0]
+    for name, value in scope["headers"]:
+        name = name.decode("latin-1")
+        value = value.decode("latin-1")
+        if name == "content-type":
+            environ["CONTENT_TYPE"] = value
+        elif name != "content-length":
+            key = "HTTP_" + name.upper().replace("-", "_")
+            environ[key] = f"{environ[key]},{value}" if key in environ else value
+    return environ
+
+
+def call_wsgi(app, environ):
+    """WSGI 앱 호출 → (상태 코드, ASGI 헤더 목록, 본문)"""
+    response = {}
+
+    def start_response(status, headers, exc_info=None):
+        response["status"] = int(status.split(" ", 1)[0])
+        response["headers"] = [(name.lower().encode("latin-1"), value.encode("latin-1"))
+                               for name, value in headers]
+
+    iterable = app(environ, start_response)
+    try:
+        body = b"".join(iterable)
+    finally:
+        if hasattr(iterable, "close"):
+            iterable.close()
+    return response["status"], response["headers"], body
+
+
+async def send_response(send, status, body, content_type, headers=()):
+    response_headers = list(headers)
+    if content_type:
+        response_headers.append((b"content-type", content_type.encode()))
+    if status != 304:
+        response_headers.append((b"content-length", str(len(body)).encode()))
+    await send({"type": "http.response.start", "status": status, "headers": response_headers})
+    await send({"type": "http.response.body", "body": body})
+
+
+async def send_json(send, status, data, headers=()):
+    body = json.dumps(data, ensure_ascii=False).encode("utf-8")
+    await send_response(send, status, body, "application/json", headers)
+
+
+# =============================================================================
+# 서버 실행 (uvicorn)
+# =============================================================================
+
+def serve(data_store, host="0.0.0.0", port=5000, keepalive_timeout=75, archive=None):
+    """uvicorn으로 ASGI 앱 실행 (전달받은 저장소를 그대로 쓰는 단일 프로세스)
+
+    워커를 여러 개 띄우면 워커마다 따로 만든 저장소가 WAL/SQLite 보관소에 기록되지 않고,
+    main()이 띄운 저장소/시뮬레이터/UDP 수신과도 끊어지므로 워커 수 옵션은 두지 않는다.
+    여러 프로세스가 필요하면 gunicorn + create_app()을 쓴다.
+    """
+    try:
+        import uvicorn  # 선택 의존성
+    except ImportError:
+        print("❌ ASGI 모드에는 uvicorn이 필요합니다: pip install uvicorn")
+        return
+
+    options = {
+        "host": host,
+        "port": port,
+        "timeout_keep_alive": keepalive_timeout,
+        "access_log": False,  # 요청마다 로그를 찍으면 수집 처리량이 크게 떨어짐
+        "log_level": "warning"
+    }
+    print(f"⚡ ASGI 서버 시작: http://localhost:{port} (keep-alive {keepalive_timeout}초)")
+    uvicorn.run(AsyncWebApp(data_store, archive=archive), **options)
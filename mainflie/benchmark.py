@@ -0,0 +1,358 @@
+import argparse
+import contextlib
+import gzip
+import heapq
+import json
+import logging
+import os
+import random
+import resource
+import shutil
+import sys
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from anomaly import AnomalyFilter
+from archive import SensorArchive
+from commands import CommandQueue
+from main import RULES_PATH, SimpleDataStore, SimpleWebApp
+from rules import RuleEngine
+from storage import PersistentStorage
+
+# =============================================================================
+# 스마트팜 서버 부하 테스트
+#
+# 수천 대의 가상 라즈베리파이(수집 요청)와 대시보드 독자(/api/data 조회)를
+# 지정한 속도로 섞어서 보내고, 처리량 / 지연시간(p50/p95/p99) / 메모리 변화를
+# JSON 리포트로 남긴다.
+#
+# 사용 방법:
+#   python benchmark.py --pis 1000 --rate 0.5 --readers 50 --duration 30
+#   python benchmark.py --mode socket --payload batch --batch-size 20
+# =============================================================================
+
+
+# =============================================================================
+# 1. 페이로드
+# =============================================================================
+
+def minimal_reading(rng, farm_id):
+    """RaspberryPiSensor.read_sensors와 같은 모양"""
+    return {
+        "farm_id": farm_id,
+        "temperature": round(rng.uniform(20.0, 30.0), 1),
+        "humidity": round(rng.uniform(50.0, 80.0), 1),
+        "soil_moisture": round(rng.uniform(30.0, 70.0), 1),
+        "light_intensity": rng.randint(200, 900),
+        "timestamp": time.time()
+    }
+
+
+def full_reading(rng, farm_id):
+    """smart_farm_data.json 수준의 센서/액추에이터 전체"""
+    reading = minimal_reading(rng, farm_id)
+    reading.update({
+        "water_level": round(rng.uniform(40.0, 90.0), 1),
+        "ph": round(rng.uniform(5.5, 7.5), 2),
+        "ec": round(rng.uniform(0.5, 2.0), 2),
+        "co2": rng.randint(350, 900),
+        "soil_temperature": round(rng.uniform(15.0, 25.0), 1),
+        "water_pump": rng.random() < 0.2,
+        "ventilation_fan": rng.random() < 0.3,
+        "led_lights": rng.random() < 0.5,
+        "heater": rng.random() < 0.1,
+        "humidifier": rng.random() < 0.1
+    })
+    return reading
+
+
+def build_request(payload, rng, farm_id, batch_size):
+    """(경로, 본문 바이트, 헤더) 생성"""
+    if payload == "batch":
+        readings = [minimal_reading(rng, farm_id) for _ in range(batch_size)]
+        body = gzip.compress("\n".join(json.dumps(reading) for reading in readings).encode("utf-8"))
+        headers = {"Content-Type": "application/x-ndjson", "Content-Encoding": "gzip"}
+        return "/api/external_data/batch", body, headers
+    reading = full_reading(rng, farm_id) if payload == "full" else minimal_reading(rng, farm_id)
+    return "/api/external_data", json.dumps(reading).encode("utf-8"), {"Content-Type": "application/json"}
+
+
+# =============================================================================
+# 2. 전송 방식 (테스트 클라이언트 / 실제 소켓)
+# =============================================================================
+
+class InProcessTransport:
+    """Flask 테스트 클라이언트 - 네트워크 없이 앱 코드만 측정"""
+
+    def __init__(self, app):
+        self.app = app
+        self.local = threading.local()
+
+    def _client(self):
+        client = getattr(self.local, "client", None)
+        if client is None:
+            client = self.app.test_client()
+            self.local.client = client
+        return client
+
+    def post(self, path, body, headers):
+        return self._client().post(path, data=body, headers=headers).status_code
+
+    def get(self, path, headers=None):
+        response = self._client().get(path, headers=headers or {})
+        return response.status_code, response.headers.get("ETag")
+
+    def close(self):
+        pass
+
+
+class SocketTransport:
+    """로컬 포트에 실제 werkzeug 서버를 띄우고 keep-alive 세션으로 요청"""
+
+    def __init__(self, app, port):
+        import requests
+        from werkzeug.serving import make_server
+        self.requests = requests
+        self.server = make_server("127.0.0.1", port, app, threaded=True)
+        self.base_url = f"http://127.0.0.1:{self.server.server_port}"
+        self.thread = threading.Thread(target=self.server.serve_forever, daemon=True)
+        self.thread.start()
+        self.local = threading.local()
+
+    def _session(self):
+        session = getattr(self.local, "session", None)
+        if session is None:
+            session = self.requests.Session()
+            self.local.session = session
+        return session
+
+    def post(self, path, body, headers):
+        return self._session().post(self.base_url + path, data=body, headers=headers, timeout=30).status_code
+
+    def get(self, path, headers=None):
+        response = self._session().get(self.base_url + path, headers=headers or {}, timeout=30)
+        return response.status_code, response.headers.get("ETag")
+
+    def close(self):
+        self.server.shutdown()
+
+
+# =============================================================================
+# 3. 측정
+# =============================================================================
+
+class Recorder:
+    """작업 종류별 지연시간/오류 기록"""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.latencies = {}
+        self.lags = {}
+        self.errors = {}
+        self.completed = 0
+
+    def add(self, kind, latency, lag, ok):
+        with self.lock:
+            self.latencies.setdefault(kind, []).append(latency)
+            self.lags.setdefault(kind, []).append(lag)
+            if not ok:
+                self.errors[kind] = self.errors.get(kind, 0) + 1
+            self.completed += 1
+
+
+def percentile(sorted_values, fraction):
+    if not sorted_values:
+        return None
+    index = min(len(sorted_values) - 1, int(fraction * len(sorted_values)))
+    return sorted_values[index]
+
+
+def current_rss_mb():
+    """현재 RSS (리눅스는 /proc, 그 외에는 최대 RSS로 대체)"""
+    try:
+        with open("/proc/self/statm") as f:
+            pages = int(f.read().split()[1])
+        return pages * os.sysconf("SC_PAGE_SIZE") / (1024 * 1024)
+    except (OSError, ValueError):
+        return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+
+def summarize(recorder, elapsed):
+    operations = {}
+    for kind, values in recorder.latencies.items():
+        values = sorted(values)
+        lags = sorted(recorder.lags[kind])
+        operations[kind] = {
+            "count": len(values),
+            "errors": recorder.errors.get(kind, 0),
+            "throughput_rps": round(len(values) / elapsed, 2),
+            "latency_ms": {
+                "p50": round(percentile(values, 0.50) * 1000, 3),
+                "p95": round(percentile(values, 0.95) * 1000, 3),
+                "p99": round(percentile(values, 0.99) * 1000, 3),
+                "max": round(values[-1] * 1000, 3)
+            },
+            # 예정 시각보다 늦게 출발한 정도 - 크면 부하 발생기 자체가 포화된 것
+            "schedule_lag_ms_p99": round(percentile(lags, 0.99) * 1000, 3)
+        }
+    return operations
+
+
+# =============================================================================
+# 4. 부하 발생
+# =============================================================================
+
+def build_store(data_dir):
+    """main()과 같은 구성의 저장소 → (저장소, WAL, 보관소)
+
+    규칙 엔진/이상치 필터/명령 큐와 WAL·SQLite 기록까지 붙여야 실제 수집 경로의 비용이
+    측정된다. 기록은 data_dir(임시 디렉터리)에 하므로 실제 data/와 섞이지 않는다.
+    """
+    data_store = SimpleDataStore(rule_engine=RuleEngine.load(RULES_PATH), anomaly_filter=AnomalyFilter(),
+                                 command_queue=CommandQueue())
+    storage = PersistentStorage(data_dir)
+    data_store.add_listener(storage.append)
+    storage.start()
+    archive = SensorArchive(os.path.join(data_dir, "archive.db"))
+    data_store.add_recorder(archive.record)
+    archive.start()
+    return data_store, storage, archive
+
+
+def run_benchmark(args):
+    data_dir = tempfile.mkdtemp(prefix="smartfarm-bench-")
+    data_store, storage, archive = build_store(data_dir)
+    web_app = SimpleWebApp(data_store, port=args.port, archive=archive)
+    if args.mode == "socket":
+        transport = SocketTransport(web_app.app, args.port)
+    else:
+        transport = InProcessTransport(web_app.app)
+
+    rng = random.Random(args.seed)
+    farm_ids = [f"FARM_{i:05d}" for i in range(args.pis)]
+    recorder = Recorder()
+    etags = {}  # 독자별 마지막 ETag (조건부 GET 재현)
+
+    def ingest(farm_id, scheduled):
+        path, body, headers = build_request(args.payload, rng, farm_id, args.batch_size)
+        started = time.perf_counter()
+        try:
+            ok = transport.post(path, body, headers) == 200
+        except Exception:
+            ok = False
+        recorder.add("ingest", time.perf_counter() - started, started - scheduled, ok)
+
+    def read(reader_id, scheduled):
+        farm_id = farm_ids[reader_id % len(farm_ids)]
+        headers = {"If-None-Match": etags[reader_id]} if args.conditional and reader_id in etags else {}
+        started = time.perf_counter()
+        try:
+            status, etag = transport.get(f"/api/data?farm_id={farm_id}", headers)
+            ok = status in (200, 304, 404)
+            if etag:
+                etags[reader_id] = etag
+        except Exception:
+            ok = False
+        recorder.add("read", time.perf_counter() - started, started - scheduled, ok)
+
+    # (다음 예정 시각, 종류, id) 힙 - 각 가상 장치의 시작 시점은 흩뿌린다
+    intervals = {"ingest": 1.0 / args.rate, "read": 1.0 / args.reader_rate}
+    begin = time.perf_counter()
+    schedule = [(begin + rng.uniform(0, intervals["ingest"]), "ingest", i) for i in range(args.pis)]
+    schedule += [(begin + rng.uniform(0, intervals["read"]), "read", i) for i in range(args.readers)]
+    heapq.heapify(schedule)
+
+    timeline = []
+    deadline = begin + args.duration
+    stop_sampler = threading.Event()
+
+    def sample_memory():
+        last_completed = 0
+        while not stop_sampler.wait(1.0):
+            completed = recorder.completed
+            timeline.append({
+                "t": round(time.perf_counter() - begin, 1),
+                "rss_mb": round(current_rss_mb(), 1),
+                "completed_per_s": completed - last_completed
+            })
+            last_completed = completed
+
+    sampler = threading.Thread(target=sample_memory, daemon=True)
+    sampler.start()
+
+    # 요청마다 찍히는 print/접속 로그는 측정을 왜곡하므로 끈다
+    logging.getLogger("werkzeug").setLevel(logging.ERROR)
+    with open(os.devnull, "w") as devnull, contextlib.redirect_stdout(devnull), \
+            ThreadPoolExecutor(max_workers=args.workers) as pool:
+        while schedule:
+            due, kind, device = schedule[0]
+            if due >= deadline:
+                break
+            wait = due - time.perf_counter()
+            if wait > 0:
+                time.sleep(wait)
+            if kind == "ingest":
+                pool.submit(ingest, farm_ids[device], due)
+            else:
+                pool.submit(read, device, due)
+            heapq.heapreplace(schedule, (due + intervals[kind], kind, device))
+
+    elapsed = time.perf_counter() - begin
+    stop_sampler.set()
+    transport.close()
+    storage.close()
+    archive.close()
+    shutil.rmtree(data_dir, ignore_errors=True)
+
+    return {
+        "config": vars(args),
+        "elapsed_s": round(elapsed, 2),
+        "farms": len(data_store.farm_ids()),
+        "operations": summarize(recorder, elapsed),
+        "peak_rss_mb": round(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024, 1),
+        "timeline": timeline
+    }
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="스마트팜 서버 수집/조회 부하 테스트")
+    parser.add_argument("--mode", choices=("inprocess", "socket"), default="inprocess",
+                        help="inprocess: Flask 테스트 클라이언트, socket: 로컬 포트의 실제 서버")
+    parser.add_argument("--pis", type=int, default=1000, help="가상 라즈베리파이 수")
+    parser.add_argument("--rate", type=float, default=0.5, help="Pi 한 대의 초당 전송 횟수")
+    parser.add_argument("--payload", choices=("minimal", "full", "batch"), default="minimal")
+    parser.add_argument("--batch-size", type=int, default=10, help="batch 페이로드의 읽기 수")
+    parser.add_argument("--readers", type=int, default=20, help="대시보드 독자 수")
+    parser.add_argument("--reader-rate", type=float, default=0.5, help="독자 한 명의 초당 조회 횟수")
+    parser.add_argument("--conditional", action="store_true", help="독자가 If-None-Match를 보냄")
+    parser.add_argument("--duration", type=float, default=30, help="측정 시간 (초)")
+    parser.add_argument("--workers", type=int, default=64, help="요청 스레드 수")
+    parser.add_argument("--port", type=int, default=0, help="socket 모드 포트 (0이면 자동)")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--report", default="bench_report.json", help="JSON 리포트 경로 (-면 표준출력)")
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    print(f"🏋️ 부하 테스트 시작: Pi {args.pis}대 x {args.rate}/s, 독자 {args.readers}명, {args.duration}초 ({args.mode})")
+    report = run_benchmark(args)
+
+    for kind, stats in report["operations"].items():
+        latency = stats["latency_ms"]
+        print(f"  {kind:>6}: {stats['throughput_rps']} req/s, 오류 {stats['errors']}, "
+              f"p50 {latency['p50']}ms / p95 {latency['p95']}ms / p99 {latency['p99']}ms")
+    print(f"  최대 메모리: {report['peak_rss_mb']} MB")
+
+    if args.report == "-":
+        json.dump(report, sys.stdout, indent=2)
+    else:
+        with open(args.report, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=2)
+        print(f"📄 리포트 저장: {args.report}")
+
+
+if __name__ == "__main__":
+    main()
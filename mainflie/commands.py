@@ -0,0 +1,122 @@
+import threading
+import time
+import uuid
+
+# =============================================================================
+# 서버 → 라즈베리파이 액추에이터 명령 채널
+#
+# 라즈베리파이는 GET /api/commands?after=<마지막 적용 seq>&epoch=..&wait=25 로
+# 롱폴링 연결을 계속 열어 두고, 명령이 들어오면 바로 받는다 (10초 전송 주기와 무관).
+#
+#   - 농장마다 seq가 1씩 증가하는 명령 큐
+#   - 라즈베리파이는 seq가 마지막 적용값보다 큰 명령만 적용하고, 적용한 seq를
+#     디스크에 남긴 뒤 POST /api/commands/ack 로 알린다 (누적 ack)
+#   - 재접속 시 after=<마지막 적용 seq>로 받아가므로 같은 명령을 두 번 적용하지 않고,
+#     ack 전에 끊겼던 명령은 다시 받는다. after보다 작거나 같은 seq는 ack로 본다
+#   - 서버가 재시작하면 seq가 처음부터 다시 시작하므로 epoch가 바뀐다. 라즈베리파이가
+#     다른 epoch를 보내면 after를 0으로 본다
+#   - 같은 액추에이터에 대한 아직 안 받아간 명령은 새 명령으로 대체한다 (최신 상태만 의미 있음)
+#   - 운영자 명령 뒤 override_seconds 동안은 규칙 엔진이 같은 액추에이터를 지시하지 않는다
+# =============================================================================
+
+ACTUATORS = ("water_pump", "led_lights", "ventilation_fan", "heater", "humidifier")
+
+
+class FarmCommands:
+    def __init__(self):
+        self.next_seq = 1
+        self.pending = []       # 아직 ack 안 된 명령 (seq 순)
+        self.acked_seq = 0
+        self.desired = {}       # 액추에이터 -> 마지막으로 지시한 상태 (규칙 중복 지시 방지)
+        self.override_until = {}  # 액추에이터 -> 운영자 명령이 우선하는 시각
+
+
+class CommandQueue:
+    def __init__(self, max_pending=100, override_seconds=600):
+        self.max_pending = max_pending
+        self.override_seconds = override_seconds
+        self.epoch = uuid.uuid4().hex[:12]
+        self.farms = {}
+        self.lock = threading.Lock()
+        self.changed = threading.Condition(self.lock)
+
+    def _farm(self, farm_id):
+        farm = self.farms.get(farm_id)
+        if farm is None:
+            farm = self.farms[farm_id] = FarmCommands()
+        return farm
+
+    def enqueue(self, farm_id, actuator, state, source="operator"):
+        """명령 추가 → 명령 dict (seq 포함)"""
+        if actuator not in ACTUATORS:
+            raise ValueError(f"알 수 없는 액추에이터: {actuator}")
+        if not isinstance(state, bool):
+            raise ValueError("state는 true/false여야 합니다")
+        with self.lock:
+            farm = self._farm(farm_id)
+            command = {
+                "seq": farm.next_seq,
+                "actuator": actuator,
+                "state": state,
+                "source": source,
+                "issued_at": time.time()
+            }
+            farm.next_seq += 1
+            farm.pending = [pending for pending in farm.pending if pending["actuator"] != actuator]
+            farm.pending.append(command)
+            del farm.pending[:-self.max_pending]
+            farm.desired[actuator] = state
+            if source == "operator":
+                farm.override_until[actuator] = time.time() + self.override_seconds
+            self.changed.notify_all()
+        return command
+
+    def command_if_changed(self, farm_id, actuator, state, source="rules"):
+        """규칙 엔진용 - 지시 상태가 바뀔 때만 명령 추가 (읽기마다 같은 지시를 쌓지 않음)"""
+        with self.lock:
+            farm = self.farms.get(farm_id)
+            if farm is not None and (farm.desired.get(actuator) == state
+                                     or time.time() < farm.override_until.get(actuator, 0)):
+                return None
+        return self.enqueue(farm_id, actuator, state, source)
+
+    def _acknowledge(self, farm, seq):
+        if seq > farm.acked_seq:
+            farm.acked_seq = min(seq, farm.next_seq - 1)
+            farm.pending = [command for command in farm.pending if command["seq"] > farm.acked_seq]
+
+    def wait(self, farm_id, after=0, epoch=None, timeout=25):
+        """after 이후의 명령을 기다림 (롱폴링) → (epoch, 명령 목록)"""
+        if epoch != self.epoch:
+            after = 0  # 서버가 재시작했거나 처음 접속 - 처음부터 다시 받는다
+        deadline = time.monotonic() + timeout
+        with self.lock:
+            farm = self._farm(farm_id)
+            self._acknowledge(farm, after)
+            while True:
+                commands = [command for command in farm.pending if command["seq"] > after]
+                remaining = deadline - time.monotonic()
+                if commands or remaining <= 0:
+                    return self.epoch, commands
+                self.changed.wait(remaining)
+
+    def ack(self, farm_id, seq, epoch=None):
+        """seq까지 적용 완료 (누적, 같은 ack를 여러 번 보내도 됨) → 남은 명령 수"""
+        if epoch is not None and epoch != self.epoch:
+            raise ValueError("다른 epoch의 ack입니다 (서버가 재시작됨)")
+        with self.lock:
+            farm = self._farm(farm_id)
+            self._acknowledge(farm, int(seq))
+            return len(farm.pending)
+
+    def status(self, farm_id):
+        with self.lock:
+            farm = self.farms.get(farm_id)
+            if farm is None:
+                return {"epoch": self.epoch, "last_seq": 0, "acked_seq": 0, "pending": []}
+            return {
+                "epoch": self.epoch,
+                "last_seq": farm.next_seq - 1,
+                "acked_seq": farm.acked_seq,
+                "pending": list(farm.pending)
+            }
@@ -0,0 +1,120 @@
+import threading
+from collections import OrderedDict
+
+import numpy as np
+
+# =============================================================================
+# 차트용 다운샘플링 (LTTB / 최소-최대 버킷)
+#
+# 일주일치 2초 간격 읽기를 그대로 보내면 차트 하나에 수 MB가 된다. 화면 너비(픽셀)
+# 만큼의 점으로 줄여서 보낸다.
+#
+#   - lttb: Largest-Triangle-Three-Buckets - 모양(꺾이는 점)을 잘 보존한다
+#   - minmax: 시간 버킷마다 최소/최대 두 점 - 스파이크를 절대 놓치지 않는다
+#
+# 히스토리 컬럼을 NumPy 배열로 받아서 계산하고, 결과는 (농장, 지표, 구간, 너비, 방법)
+# 단위로 캐시한다. 히스토리에 읽기가 추가되면 버전이 바뀌어 다시 계산하지만,
+# 이미 닫힌 과거 구간은 새 읽기가 들어와도 결과가 같으므로 그대로 쓴다.
+# =============================================================================
+
+METHODS = ("lttb", "minmax")
+
+
+def lttb(timestamps, values, threshold):
+    """Largest-Triangle-Three-Buckets → 고른 점의 인덱스 배열
+
+    첫/끝 점은 항상 포함. 버킷마다 (이전에 고른 점, 현재 버킷의 점, 다음 버킷 평균)이
+    이루는 삼각형 넓이가 가장 큰 점을 고른다. 다음 버킷 평균은 한 번에 벡터로 계산하고,
+    버킷 루프 안에서는 argmax만 한다 (루프 횟수 = 점 개수, 읽기 수와 무관).
+    """
+    n = len(values)
+    if threshold >= n or threshold < 3:
+        return np.arange(n)
+
+    # 가운데 점들을 threshold - 2개의 버킷으로 나눔
+    edges = np.linspace(1, n - 1, threshold - 1).astype(np.int64)
+    counts = np.diff(edges)
+    mean_ts = np.add.reduceat(timestamps[1:n - 1], edges[:-1] - 1) / counts
+    mean_values = np.add.reduceat(values[1:n - 1], edges[:-1] - 1) / counts
+    # 마지막 버킷의 "다음 버킷"은 끝 점
+    next_ts = np.append(mean_ts[1:], timestamps[-1])
+    next_values = np.append(mean_values[1:], values[-1])
+
+    selected = np.empty(threshold, dtype=np.int64)
+    selected[0] = 0
+    selected[-1] = n - 1
+    previous = 0
+    for bucket in range(threshold - 2):
+        begin, end = edges[bucket], edges[bucket + 1]
+        ts = timestamps[begin:end]
+        value = values[begin:end]
+        area = np.abs((timestamps[previous] - next_ts[bucket]) * (value - values[previous])
+                      - (timestamps[previous] - ts) * (next_values[bucket] - values[previous]))
+        previous = begin + int(np.argmax(area))
+        selected[bucket + 1] = previous
+    return selected
+
+
+def minmax(timestamps, values, threshold):
+    """같은 길이의 시간 버킷 threshold // 2개에서 최소/최대 점 → 인덱스 배열 (시간 순)"""
+    n = len(values)
+    buckets = max(1, threshold // 2)
+    if threshold >= n or n < 2:
+        return np.arange(n)
+
+    span = timestamps[-1] - timestamps[0]
+    if span <= 0:
+        bucket_ids = np.zeros(n, dtype=np.int64)
+    else:
+        bucket_ids = np.minimum(((timestamps - timestamps[0]) / span * buckets).astype(np.int64), buckets - 1)
+    # 버킷 → 값 순으로 정렬하면 버킷마다 첫 원소가 최소, 마지막 원소가 최대
+    order = np.lexsort((values, bucket_ids))
+    sorted_ids = bucket_ids[order]
+    starts = np.flatnonzero(np.r_[True, sorted_ids[1:] != sorted_ids[:-1]])
+    ends = np.r_[starts[1:], n] - 1
+    return np.unique(np.concatenate([order[starts], order[ends]]))
+
+
+def downsample(timestamps, values, width, method="lttb"):
+    """(타임스탬프 배열, 값 배열)을 최대 width개 점으로 줄임"""
+    if method not in METHODS:
+        raise ValueError(f"알 수 없는 다운샘플링 방법: {method}")
+    index = lttb(timestamps, values, width) if method == "lttb" else minmax(timestamps, values, width)
+    return timestamps[index], values[index]
+
+
+class SeriesCache:
+    """다운샘플링 결과 LRU 캐시
+
+    항목마다 계산할 때의 히스토리 버전과 최신 타임스탬프를 기억한다. 버전이 같거나,
+    구간 끝이 그때의 최신 타임스탬프보다 앞이고 구간 시작이 아직 보존 기간 안이면
+    (= 새 읽기/만료가 결과에 영향을 주지 않으면) 캐시를 그대로 쓴다.
+    """
+
+    def __init__(self, max_entries=256):
+        self.max_entries = max_entries
+        self.entries = OrderedDict()  # key -> (버전, 최신 타임스탬프, 결과)
+        self.lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key, start_ts, end_ts, oldest, version):
+        with self.lock:
+            entry = self.entries.get(key)
+            if entry is not None:
+                cached_version, newest, result = entry
+                closed = (end_ts is not None and newest is not None and end_ts < newest
+                          and start_ts is not None and oldest is not None and start_ts >= oldest)
+                if cached_version == version or closed:
+                    self.entries.move_to_end(key)
+                    self.hits += 1
+                    return result
+            self.misses += 1
+            return None
+
+    def put(self, key, version, newest, result):
+        with self.lock:
+            self.entries[key] = (version, newest, result)
+            self.entries.move_to_end(key)
+            while len(self.entries) > self.max_entries:
+                self.entries.popitem(last=False)
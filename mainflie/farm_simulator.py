@@ -0,0 +1,274 @@
+import argparse
+import gzip
+import json
+import logging
+import math
+import time
+
+import numpy as np
+
+from main import DEFAULT_FARM_ID, SimpleDataStore
+from wire_format import PACKED_TYPE, encode_readings
+
+# =============================================================================
+# 다농장 시뮬레이터 (NumPy 벡터 연산, 시드 고정)
+#
+# SimpleSimulator는 dict 하나를 5초마다 random.uniform으로 흔들 뿐이라 규칙/저장소를
+# 조율할 부하로 쓰기 어렵다. 여기서는 농장 수천 개의 상태를 배열로 들고 한 번에
+# 진행시킨다 (농장 수만큼 파이썬 루프를 돌지 않음).
+#
+#   - 온도: 일교차 (15시 최고) + 농장별 기준/진폭 + AR(1) 잡음
+#   - 조도: 낮 동안의 사인 곡선 x 구름(AR(1))
+#   - 습도: 온도와 반대로 움직임 + 잡음
+#   - 토양 수분: 온도/조도에 비례해 마르고, 기준 아래로 내려가면 펌프가 켜져
+#     목표치까지 채움 (water_pump 상태도 함께 보냄)
+#   - 센서 탈락: 농장 단위 통신 두절(일정 시간 동안 읽기 없음) + 지표 단위 누락
+#   - 선택: 스파이크 (이상치 필터 조율용)
+#
+# 같은 seed면 같은 시계열이 나온다. 서버에 실시간 또는 배속으로 재생할 수 있다.
+#
+# 사용 방법:
+#   python farm_simulator.py --farms 2000 --duration 3600              # 저장소에 직접, 최대 속도
+#   python farm_simulator.py --farms 500 --url http://localhost:5000 --speed 1   # 서버에 실시간 재생
+#   python farm_simulator.py --farms 100 --duration 86400 --out day.ndjson      # 파일로 저장
+# =============================================================================
+
+METRICS = ("temperature", "humidity", "soil_moisture", "light_intensity")
+
+
+class FarmSimulation:
+    """농장 farms개의 센서 상태 (step()마다 step_seconds만큼 진행)"""
+
+    def __init__(self, farms=1000, seed=42, start_ts=None, step_seconds=2.0, dropout_rate=0.0005,
+                 dropout_seconds=120, missing_rate=0.005, spike_rate=0.0, utc_offset_hours=9):
+        self.farms = farms
+        self.step_seconds = step_seconds
+        self.dropout_rate = dropout_rate        # 스텝마다 농장이 통신 두절에 들어갈 확률
+        self.dropout_steps = max(1, dropout_seconds / step_seconds)  # 두절 평균 길이 (스텝)
+        self.missing_rate = missing_rate        # 지표 하나가 빠질 확률
+        self.spike_rate = spike_rate            # 지표 하나가 튈 확률
+        self.utc_offset = utc_offset_hours * 3600
+        self.ts = time.time() if start_ts is None else start_ts
+        self.rng = np.random.default_rng(seed)
+        self.farm_ids = np.array([f"SIM_{i:05d}" for i in range(farms)], dtype=object)
+        if farms:
+            self.farm_ids[0] = DEFAULT_FARM_ID  # 대시보드 기본 농장에서도 바로 보이게
+
+        rng = self.rng
+        # 농장별 고정 특성
+        self.base_temp = rng.normal(23.0, 2.5, farms)
+        self.temp_amplitude = rng.uniform(3.0, 7.0, farms)
+        self.base_humidity = rng.uniform(55.0, 75.0, farms)
+        self.peak_light = rng.uniform(650.0, 1000.0, farms)
+        self.dry_rate = rng.uniform(0.8, 1.6, farms) / 3600     # 기준 건조 속도 (%/초)
+        self.irrigate_below = rng.uniform(32.0, 40.0, farms)
+        self.irrigate_until = rng.uniform(60.0, 72.0, farms)
+        self.irrigate_rate = rng.uniform(0.3, 0.6, farms)       # 펌프가 켜져 있을 때 (%/초)
+
+        # 변하는 상태
+        self.soil_moisture = rng.uniform(40.0, 65.0, farms)
+        self.pump = np.zeros(farms, dtype=bool)
+        self.cloud = np.ones(farms)
+        self.noise = np.zeros((3, farms))  # 온도/습도/토양 AR(1) 잡음
+        self.offline = np.zeros(farms)     # 남은 통신 두절 스텝 수
+
+    def _ar1(self, state, phi, sigma):
+        """AR(1) 잡음 한 스텝 (정상 분산 sigma^2)"""
+        state *= phi
+        state += self.rng.normal(0.0, sigma * math.sqrt(1 - phi * phi), state.shape)
+        return state
+
+    def step(self):
+        """한 스텝 진행 → (타임스탬프, {지표: 배열}, 보낼 농장 마스크, {지표: 지표 마스크})"""
+        self.ts += self.step_seconds
+        dt = self.step_seconds
+        hour = ((self.ts + self.utc_offset) % 86400) / 3600
+
+        # 조도: 6시~18시 사인 곡선, 구름은 0.3~1 사이에서 천천히 변함
+        daylight = max(0.0, math.sin(math.pi * (hour - 6) / 12))
+        self.cloud = np.clip(self.cloud + self.rng.normal(0.0, 0.02, self.farms), 0.3, 1.0)
+        light = self.peak_light * daylight * self.cloud
+
+        noise = self._ar1(self.noise, 0.98, 1.0)
+        temperature = (self.base_temp + self.temp_amplitude * math.cos(2 * math.pi * (hour - 15) / 24)
+                       + 0.4 * noise[0])
+        humidity = np.clip(self.base_humidity - 1.8 * (temperature - self.base_temp) + 2.0 * noise[1], 20, 100)
+
+        # 토양 수분: 덥고 밝을수록 빨리 마르고, 펌프가 켜지면 목표치까지 채운다
+        evaporation = self.dry_rate * (0.5 + np.maximum(temperature, 0) / 25 + light / 1000)
+        self.soil_moisture -= evaporation * dt
+        self.pump = np.where(self.pump, self.soil_moisture < self.irrigate_until,
+                             self.soil_moisture < self.irrigate_below)
+        watered = np.minimum(self.soil_moisture + self.irrigate_rate * dt, self.irrigate_until)
+        self.soil_moisture = np.clip(np.where(self.pump, watered, self.soil_moisture), 0, 100)
+        soil = self.soil_moisture + 0.3 * noise[2]
+
+        values = {
+            "temperature": np.round(temperature, 1),
+            "humidity": np.round(humidity, 1),
+            "soil_moisture": np.round(np.clip(soil, 0, 100), 1),
+            "light_intensity": np.rint(light).astype(np.int64),
+        }
+        if self.spike_rate:
+            for metric in ("temperature", "humidity", "soil_moisture"):
+                spikes = self.rng.random(self.farms) < self.spike_rate
+                values[metric] = np.where(spikes, values[metric] + self.rng.choice((-1, 1), self.farms) * 25,
+                                          values[metric])
+
+        # 통신 두절: 새로 끊기는 농장은 평균 dropout_steps 동안 읽기를 보내지 않음
+        starting = (self.offline <= 0) & (self.rng.random(self.farms) < self.dropout_rate)
+        self.offline[starting] = self.rng.exponential(self.dropout_steps, int(starting.sum())) + 1
+        online = self.offline <= 0
+        self.offline -= 1
+
+        present = {metric: self.rng.random(self.farms) >= self.missing_rate for metric in values}
+        return self.ts, values, online, present
+
+    def readings(self):
+        """한 스텝 진행하고 서버로 보낼 읽기 dict 목록으로 변환"""
+        ts, values, online, present = self.step()
+        rows = np.flatnonzero(online)
+        columns = {metric: array[rows].tolist() for metric, array in values.items()}
+        masks = {metric: mask[rows].tolist() for metric, mask in present.items()}
+        pump = self.pump[rows].tolist()
+        farm_ids = self.farm_ids[rows].tolist()
+
+        readings = []
+        for i, farm_id in enumerate(farm_ids):
+            reading = {"farm_id": farm_id, "source": "simulation", "timestamp": ts, "water_pump": pump[i]}
+            for metric, column in columns.items():
+                if masks[metric][i]:
+                    reading[metric] = column[i]
+            readings.append(reading)
+        return readings
+
+
+# =============================================================================
+# 재생 대상 (저장소 직접 / HTTP 배치 엔드포인트 / 파일)
+# =============================================================================
+
+class StoreTarget:
+    """같은 프로세스의 SimpleDataStore에 update_batch로 반영"""
+
+    def __init__(self, data_store):
+        self.data_store = data_store
+
+    def send(self, readings):
+        self.data_store.update_batch(readings)
+        return True
+
+
+class HttpTarget:
+    """/api/external_data/batch로 전송 (gzip NDJSON 또는 압축 바이너리)"""
+
+    def __init__(self, server_url, packed=False, timeout=30):
+        import requests
+        self.session = requests.Session()
+        self.url = f"{server_url.rstrip('/')}/api/external_data/batch"
+        self.packed = packed
+        self.timeout = timeout
+        self.errors = 0
+
+    def send(self, readings):
+        if self.packed:
+            body, content_type = encode_readings(readings), PACKED_TYPE
+        else:
+            body = "\n".join(json.dumps(reading) for reading in readings).encode("utf-8")
+            content_type = "application/x-ndjson"
+        try:
+            response = self.session.post(self.url, data=gzip.compress(body, compresslevel=5), timeout=self.timeout,
+                                         headers={"Content-Type": content_type, "Content-Encoding": "gzip"})
+            ok = response.status_code == 200
+        except Exception as e:
+            print(f"❌ 전송 오류: {e}")
+            ok = False
+        if not ok:
+            self.errors += 1
+        return ok
+
+
+class FileTarget:
+    """NDJSON 파일로 저장 (나중에 다시 보내거나 분석용)"""
+
+    def __init__(self, path):
+        self.file = open(path, "w", encoding="utf-8")
+
+    def send(self, readings):
+        self.file.writelines(json.dumps(reading) + "\n" for reading in readings)
+        return True
+
+    def close(self):
+        self.file.close()
+
+
+def replay(simulation, target, duration, speed=0.0, batch_size=1000):
+    """duration초 분량을 target에 재생 (speed: 1이면 실시간, 10이면 10배속, 0이면 최대 속도)
+
+    → {"steps", "readings", "elapsed_s", "readings_per_s"}
+    """
+    steps = int(duration / simulation.step_seconds)
+    begin = time.perf_counter()
+    sent = 0
+    for index in range(steps):
+        readings = simulation.readings()
+        for start in range(0, len(readings), batch_size):
+            target.send(readings[start:start + batch_size])
+        sent += len(readings)
+        if speed > 0:
+            # 밀린 만큼은 쉬지 않고 따라잡는다 (시뮬레이션 시각은 항상 step_seconds씩 진행)
+            wait = begin + (index + 1) * simulation.step_seconds / speed - time.perf_counter()
+            if wait > 0:
+                time.sleep(wait)
+    elapsed = time.perf_counter() - begin
+    return {
+        "steps": steps,
+        "readings": sent,
+        "elapsed_s": round(elapsed, 3),
+        "readings_per_s": round(sent / elapsed, 1) if elapsed else None
+    }
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="스마트팜 다농장 시뮬레이터")
+    parser.add_argument("--farms", type=int, default=1000, help="농장 수")
+    parser.add_argument("--duration", type=float, default=600, help="시뮬레이션 구간 (초)")
+    parser.add_argument("--step", type=float, default=2.0, help="읽기 간격 (초)")
+    parser.add_argument("--speed", type=float, default=0.0, help="재생 배속 (1: 실시간, 0: 최대 속도)")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--dropout-rate", type=float, default=0.0005, help="스텝당 농장 통신 두절 확률")
+    parser.add_argument("--missing-rate", type=float, default=0.005, help="지표 누락 확률")
+    parser.add_argument("--spike-rate", type=float, default=0.0, help="지표 스파이크 확률")
+    parser.add_argument("--batch-size", type=int, default=1000, help="요청 하나에 담을 읽기 수")
+    parser.add_argument("--url", help="서버 주소 (예: http://localhost:5000) - 없으면 저장소에 직접 반영")
+    parser.add_argument("--packed", action="store_true", help="압축 바이너리 형식으로 전송")
+    parser.add_argument("--out", help="서버 대신 NDJSON 파일로 저장")
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    # 실시간 재생은 지금부터, 빠른 재생은 지금까지의 과거 구간을 채운다
+    start_ts = time.time() if args.speed == 1 else time.time() - args.duration
+    simulation = FarmSimulation(args.farms, seed=args.seed, start_ts=start_ts, step_seconds=args.step,
+                                dropout_rate=args.dropout_rate, missing_rate=args.missing_rate,
+                                spike_rate=args.spike_rate)
+    if args.out:
+        target = FileTarget(args.out)
+    elif args.url:
+        target = HttpTarget(args.url, packed=args.packed)
+    else:
+        logging.getLogger("smartfarm").setLevel(logging.WARNING)
+        target = StoreTarget(SimpleDataStore())
+
+    print(f"🌾 시뮬레이션 시작: 농장 {args.farms}개, {args.duration}초 ({args.step}초 간격, "
+          f"{'최대 속도' if args.speed <= 0 else f'{args.speed}배속'})")
+    result = replay(simulation, target, args.duration, speed=args.speed, batch_size=args.batch_size)
+    if isinstance(target, FileTarget):
+        target.close()
+    if isinstance(target, HttpTarget) and target.errors:
+        result["errors"] = target.errors
+    print(f"✅ 완료: {result}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,100 @@
+import json
+import threading
+from collections import OrderedDict
+
+# =============================================================================
+# 전체 농장 요약 (관제 화면용 /api/farms/summary)
+#
+# 농장마다 /api/data를 부르면 요청마다 농장 수만큼 복사/직렬화를 한다. 여기서는
+# 저장소 리스너로 바뀐 농장의 스냅샷 참조만 갈아 끼우고, 농장별 JSON 조각을
+# 필드 목록(?fields=)마다 한 번만 만들어 둔다. 요청은 조각을 이어 붙이기만 한다.
+#
+#   - version: 요약 전체의 변경 번호 (저장소 변경마다 1 증가)
+#   - ?since=<version>: 그 뒤에 바뀐 농장만 (O(바뀐 농장 수))
+#   - 아무것도 바뀌지 않았으면 필드 목록별로 마지막 응답 본문을 그대로 재사용
+# =============================================================================
+
+
+class FarmEntry:
+    """농장 하나의 최신 스냅샷과 필드 목록별 JSON 조각"""
+
+    __slots__ = ("snapshot", "version", "fragments")
+
+    def __init__(self, snapshot, version):
+        self.snapshot = snapshot  # 저장소의 copy-on-write 스냅샷 (수정 금지)
+        self.version = version
+        self.fragments = {}
+
+    def fragment(self, fields):
+        """fields(None이면 전체) 투영의 JSON 조각 - 스냅샷이 바뀌지 않으므로 한 번만 만든다"""
+        fragment = self.fragments.get(fields)
+        if fragment is None:
+            snapshot = self.snapshot
+            if fields is not None:
+                snapshot = {field: snapshot[field] for field in fields if field in snapshot}
+            fragment = json.dumps(snapshot, ensure_ascii=False)
+            self.fragments[fields] = fragment
+        return fragment
+
+
+class FarmSummary:
+    """저장소 리스너로 갱신되는 전체 농장 요약"""
+
+    def __init__(self, max_projections=32):
+        self.max_projections = max_projections
+        self.lock = threading.Lock()
+        self.version = 0
+        self.farms = OrderedDict()  # farm_id -> FarmEntry (마지막으로 바뀐 순서)
+        self.bodies = {}            # fields -> (version, 응답 본문)
+
+    @staticmethod
+    def parse_fields(text):
+        """"temperature,alerts" → 정렬된 튜플 (비어 있으면 None = 전체 필드)"""
+        if not text:
+            return None
+        return tuple(sorted({field.strip() for field in text.split(",") if field.strip()})) or None
+
+    def seed(self, data_store):
+        """이미 저장소에 있는 농장으로 채움 (복구 직후 등)"""
+        for farm_id in data_store.farm_ids():
+            snapshot = data_store.snapshot(farm_id)
+            if snapshot is not None:
+                self.update({"farm_id": farm_id}, snapshot)
+
+    def update(self, changes, snapshot):
+        """저장소 리스너 - 바뀐 농장의 스냅샷 참조만 교체"""
+        farm_id = changes["farm_id"]
+        with self.lock:
+            current = self.farms.get(farm_id)
+            if current is not None and current.snapshot.get("data_version", 0) > snapshot.get("data_version", 0):
+                return  # restore/seed와 겹친 옛 스냅샷은 무시
+            self.version += 1
+            self.farms[farm_id] = FarmEntry(snapshot, self.version)
+            self.farms.move_to_end(farm_id)
+
+    def render(self, fields=None, since=None):
+        """요약 JSON 본문 → (version, bytes)"""
+        with self.lock:
+            version = self.version
+            if since is None:
+                cached = self.bodies.get(fields)
+                if cached is not None and cached[0] == version:
+                    return cached
+                entries = list(self.farms.items())
+            else:
+                # 최근에 바뀐 농장부터 거꾸로 보다가 since 이전에 바뀐 농장을 만나면 멈춤
+                entries = []
+                for farm_id in reversed(self.farms):
+                    entry = self.farms[farm_id]
+                    if entry.version <= since:
+                        break
+                    entries.append((farm_id, entry))
+
+        parts = [f"{json.dumps(farm_id, ensure_ascii=False)}: {entry.fragment(fields)}" for farm_id, entry in entries]
+        body = f'{{"version": {version}, "count": {len(parts)}, "farms": {{{", ".join(parts)}}}}}'.encode("utf-8")
+        if since is None:
+            with self.lock:
+                if fields not in self.bodies and len(self.bodies) >= self.max_projections:
+                    self.bodies.clear()
+                self.bodies[fields] = (version, body)
+        return version, body
@@ -0,0 +1,244 @@
+import math
+import threading
+import time
+from array import array
+from bisect import bisect_left, bisect_right
+
+# =============================================================================
+# 시계열 히스토리 (링 버퍼)
+# =============================================================================
+
+# 히스토리에 기록하지 않는 필드 (숫자지만 센서값이 아님)
+SKIP_FIELDS = ("timestamp", "data_version")
+
+
+def numeric_values(data):
+    """dict에서 히스토리에 기록할 숫자 필드만 float로 추출 (bool은 1.0/0.0)"""
+    values = {}
+    for key, value in data.items():
+        if key in SKIP_FIELDS:
+            continue
+        if isinstance(value, bool):
+            values[key] = 1.0 if value else 0.0
+        elif isinstance(value, (int, float)):
+            values[key] = float(value)
+    return values
+
+
+class _TimestampView:
+    """링 버퍼의 타임스탬프를 논리 순서(오래된 것 → 최신)로 보여주는 뷰 (bisect용)"""
+
+    def __init__(self, ring):
+        self.ring = ring
+
+    def __len__(self):
+        return self.ring.size
+
+    def __getitem__(self, i):
+        ring = self.ring
+        return ring.timestamps[(ring.start + i) % ring.allocated]
+
+
+class FarmHistory:
+    """농장 하나의 컬럼형 링 버퍼
+
+    타임스탬프 컬럼 하나와 메트릭별 array('d') 컬럼을 두고 head 위치에 덮어쓴다.
+    농장이 많아도 메모리가 부풀지 않도록 작게 시작해서 capacity까지 두 배씩 키운다.
+    추가는 (분할 상환) O(1), 시간 범위 검색은 이진 탐색으로 O(log n).
+    값이 없는 칸은 NaN으로 채운다.
+    """
+
+    INITIAL_SIZE = 64
+
+    def __init__(self, capacity, retention_seconds):
+        self.capacity = capacity
+        self.retention_seconds = retention_seconds
+        self.allocated = min(capacity, self.INITIAL_SIZE)
+        self.timestamps = array('d', bytes(8 * self.allocated))
+        self.columns = {}
+        self.start = 0  # 가장 오래된 항목의 물리 인덱스
+        self.size = 0
+        self.dropped = 0  # 순서가 뒤바뀌어 버린 읽기 수
+        self.appended = 0  # 추가된 읽기 수 (조회 결과 캐시의 버전으로 사용)
+
+    def _column(self, metric):
+        column = self.columns.get(metric)
+        if column is None:
+            column = array('d', [math.nan]) * self.allocated
+            self.columns[metric] = column
+        return column
+
+    def _grow(self):
+        """버퍼를 두 배로 키우면서 논리 순서대로 다시 펼친다"""
+        new_size = min(self.capacity, self.allocated * 2)
+        segments = self._segments(0, self.size)
+        padding = new_size - self.size
+
+        timestamps = array('d')
+        for begin, end in segments:
+            timestamps.extend(self.timestamps[begin:end])
+        timestamps.extend(array('d', bytes(8 * padding)))
+        self.timestamps = timestamps
+
+        for metric, column in self.columns.items():
+            grown = array('d')
+            for begin, end in segments:
+                grown.extend(column[begin:end])
+            grown.extend(array('d', [math.nan]) * padding)
+            self.columns[metric] = grown
+
+        self.start = 0
+        self.allocated = new_size
+
+    def _expire(self, now):
+        """보존 기간이 지난 항목을 앞에서부터 제거 (항목당 한 번이므로 분할 상환 O(1))"""
+        cutoff = now - self.retention_seconds
+        while self.size and self.timestamps[self.start] < cutoff:
+            self.start = (self.start + 1) % self.allocated
+            self.size -= 1
+
+    def newest_timestamp(self):
+        if not self.size:
+            return None
+        return self.timestamps[(self.start + self.size - 1) % self.allocated]
+
+    def append(self, ts, values):
+        """읽기 한 건 추가. 최신값보다 오래된 읽기는 정렬이 깨지므로 버린다"""
+        newest = self.newest_timestamp()
+        if newest is not None and ts < newest:
+            self.dropped += 1
+            return False
+
+        self._expire(ts)
+
+        if self.size == self.allocated:
+            if self.allocated < self.capacity:
+                self._grow()
+            else:
+                # 가득 차면 가장 오래된 칸을 덮어쓴다
+                self.start = (self.start + 1) % self.allocated
+                self.size -= 1
+
+        index = (self.start + self.size) % self.allocated
+        self.timestamps[index] = ts
+        for column in self.columns.values():
+            column[index] = math.nan
+        for metric, value in values.items():
+            self._column(metric)[index] = value
+        self.size += 1
+        self.appended += 1
+        return True
+
+    def _segments(self, lo, hi):
+        """논리 구간 [lo, hi)를 물리 구간 최대 2개로 변환"""
+        if lo >= hi:
+            return []
+        first = (self.start + lo) % self.allocated
+        count = hi - lo
+        if first + count <= self.allocated:
+            return [(first, first + count)]
+        return [(first, self.allocated), (0, first + count - self.allocated)]
+
+    def query(self, metric, start_ts=None, end_ts=None):
+        """[start_ts, end_ts] 구간의 (타임스탬프 목록, 값 목록) 반환"""
+        column = self.columns.get(metric)
+        if column is None or not self.size:
+            return [], []
+
+        view = _TimestampView(self)
+        lo = 0 if start_ts is None else bisect_left(view, start_ts)
+        hi = self.size if end_ts is None else bisect_right(view, end_ts)
+
+        timestamps = []
+        values = []
+        ts_buffer = memoryview(self.timestamps)
+        value_buffer = memoryview(column)
+        for begin, end in self._segments(lo, hi):
+            for ts, value in zip(ts_buffer[begin:end], value_buffer[begin:end]):
+                if value == value:  # NaN 건너뛰기
+                    timestamps.append(ts)
+                    values.append(value)
+        return timestamps, values
+
+    def query_arrays(self, metric, start_ts=None, end_ts=None):
+        """query와 같은 구간을 NumPy 배열 (타임스탬프, 값)로 반환 - 버퍼를 복사 없이 보고 구간만 복사"""
+        import numpy as np
+
+        column = self.columns.get(metric)
+        if column is None or not self.size:
+            return np.empty(0), np.empty(0)
+
+        view = _TimestampView(self)
+        lo = 0 if start_ts is None else bisect_left(view, start_ts)
+        hi = self.size if end_ts is None else bisect_right(view, end_ts)
+        segments = self._segments(lo, hi)
+        if not segments:
+            return np.empty(0), np.empty(0)
+
+        ts_buffer = np.frombuffer(self.timestamps, dtype=np.float64)
+        value_buffer = np.frombuffer(column, dtype=np.float64)
+        timestamps = np.concatenate([ts_buffer[begin:end] for begin, end in segments])
+        values = np.concatenate([value_buffer[begin:end] for begin, end in segments])
+        del ts_buffer, value_buffer  # 버퍼 참조를 바로 놓아야 array가 다시 커질 수 있다
+        keep = ~np.isnan(values)
+        return timestamps[keep], values[keep]
+
+
+class TimeSeriesHistory:
+    """농장별 시계열 히스토리 모음"""
+
+    def __init__(self, retention_hours=24, max_points=50000):
+        self.retention_seconds = retention_hours * 3600
+        self.max_points = max_points
+        self.farms = {}
+        self.lock = threading.Lock()
+
+    def record(self, farm_id, data, ts=None):
+        """스냅샷/업데이트 dict에서 숫자 필드만 골라 기록"""
+        if ts is None:
+            ts = data.get("timestamp") or time.time()
+        return self.append(farm_id, ts, numeric_values(data))
+
+    def append(self, farm_id, ts, values):
+        """이미 추출한 메트릭 값 기록"""
+        if not values:
+            return False
+
+        with self.lock:
+            farm = self.farms.get(farm_id)
+            if farm is None:
+                farm = FarmHistory(self.max_points, self.retention_seconds)
+                self.farms[farm_id] = farm
+            return farm.append(float(ts), values)
+
+    def query(self, farm_id, metric, start_ts=None, end_ts=None):
+        """농장/메트릭의 시간 범위 조회"""
+        with self.lock:
+            farm = self.farms.get(farm_id)
+            if farm is None:
+                return [], []
+            return farm.query(metric, start_ts, end_ts)
+
+    def query_arrays(self, farm_id, metric, start_ts=None, end_ts=None):
+        """농장/메트릭의 시간 범위를 NumPy 배열로 조회 → (타임스탬프, 값, 버전)"""
+        with self.lock:
+            farm = self.farms.get(farm_id)
+            if farm is None:
+                import numpy as np
+                return np.empty(0), np.empty(0), 0
+            timestamps, values = farm.query_arrays(metric, start_ts, end_ts)
+            return timestamps, values, farm.appended
+
+    def bounds(self, farm_id):
+        """(가장 오래된 타임스탬프, 최신 타임스탬프, 버전) - 캐시한 조회 결과가 아직 맞는지 확인용"""
+        with self.lock:
+            farm = self.farms.get(farm_id)
+            if farm is None or not farm.size:
+                return None, None, 0
+            return farm.timestamps[farm.start], farm.newest_timestamp(), farm.appended
+
+    def metrics(self, farm_id):
+        """농장에 기록된 메트릭 이름 목록"""
+        with self.lock:
+            farm = self.farms.get(farm_id)
+            return sorted(farm.columns) if farm else []
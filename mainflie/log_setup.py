@@ -0,0 +1,72 @@
+import atexit
+import logging
+import logging.handlers
+import os
+import queue
+
+# =============================================================================
+# 비동기 로깅 설정
+#
+# 요청 스레드는 QueueHandler로 레코드를 큐에 넣기만 하고, 실제 stdout 쓰기는
+# QueueListener 스레드가 한다 (요청마다 동기 print I/O를 하지 않음).
+# 레벨은 SMARTFARM_LOG_LEVEL 환경 변수(기본 INFO)로 정한다 - 읽기마다 찍던
+# "데이터 업데이트" 로그는 DEBUG에서만 보인다.
+# =============================================================================
+
+LOG_LEVEL_ENV = "SMARTFARM_LOG_LEVEL"
+LOG_FORMAT = "%(asctime)s %(levelname)s %(name)s: %(message)s"
+
+_listener = None
+
+
+def setup_logging(level=None):
+    """루트 로거를 큐 핸들러로 바꾼다 (여러 번 불러도 리스너는 하나)"""
+    global _listener
+    set_level(level or os.environ.get(LOG_LEVEL_ENV, "INFO"))
+    if _listener is not None:
+        return _listener
+
+    log_queue = queue.SimpleQueue()
+    handler = logging.StreamHandler()
+    handler.setFormatter(logging.Formatter(LOG_FORMAT))
+    _listener = logging.handlers.QueueListener(log_queue, handler, respect_handler_level=True)
+    logging.getLogger().handlers = [logging.handlers.QueueHandler(log_queue)]
+    _listener.start()
+    atexit.register(_stop_listener)  # 종료 시 큐에 남은 로그를 마저 쓴다
+    # fork된 워커(gunicorn --preload)에는 리스너 스레드가 없으므로 자식에서 새로 만든다
+    os.register_at_fork(after_in_child=_restart_in_child)
+    return _listener
+
+
+def _restart_in_child():
+    """물려받은 리스너는 이미 start된 객체라 다시 start할 수 없다 - 새 큐/리스너를 만든다
+
+    fork 시점에 큐에 남아 있던 레코드는 부모가 쓰므로 자식은 빈 큐로 시작한다 (중복 출력 방지).
+    """
+    global _listener
+    inherited = _listener
+    log_queue = queue.SimpleQueue()
+    for handler in logging.getLogger().handlers:
+        if isinstance(handler, logging.handlers.QueueHandler) and handler.queue is inherited.queue:
+            handler.queue = log_queue
+    _listener = logging.handlers.QueueListener(log_queue, *inherited.handlers,
+                                               respect_handler_level=inherited.respect_handler_level)
+    _listener.start()
+
+
+def _stop_listener():
+    if _listener is not None:
+        _listener.stop()
+
+
+def parse_level(level):
+    """로그 레벨 이름 → 숫자 ("debug", "INFO" ...) - 모르는 이름이면 ValueError"""
+    value = logging.getLevelName(str(level).upper())
+    if not isinstance(value, int):
+        raise ValueError(f"알 수 없는 로그 레벨: {level}")
+    return value
+
+
+def set_level(level):
+    """실행 중 로그 레벨 변경 ("DEBUG", "INFO", "WARNING" ...)"""
+    logging.getLogger().setLevel(parse_level(level))
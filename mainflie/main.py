@@ -4,38 +4,207 @@ import json
 import time
 import threading
 import os
+import gzip
+import hashlib
+import logging
+import random
+import socket
 from datetime import datetime
-from flask import Flask, jsonify, request, render_template
+from urllib.parse import urlparse
+from flask import Flask, Response, g, jsonify, request
+
+from history import TimeSeriesHistory, numeric_values
+from stream import EventBroker, format_sse
+from storage import PersistentStorage
+from archive import SensorArchive
+from rules import RuleEngine
+from anomaly import AnomalyFilter
+from farm_summary import FarmSummary
+from commands import CommandQueue
+from wire_format import PACKED_TYPE, decode_readings, encode_readings
+from metrics import REGISTRY, CONTENT_TYPE as METRICS_CONTENT_TYPE
+from profiler import PROFILER, parse_options as parse_profiler_options
+from log_setup import setup_logging, set_level
+from udp_ingest import MAX_CLOCK_SKEW, validate_reading
+
+DEFAULT_FARM_ID = "FARM_001"
+RULES_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "rules.json")
+DASHBOARD_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "templates", "dashboard.html")
+UDP_PORT = 5005  # 라즈베리파이 UDP 수신 포트
+READ_DURATION_FIELD = "sensor_read_ms"  # 라즈베리파이가 읽기에 실어 보내는 센서 읽기 시간
+
+logger = logging.getLogger("smartfarm")
+
+# --- 지표 (/metrics) ---
+READINGS_TOTAL = REGISTRY.counter("smartfarm_ingest_readings_total", "저장소에 반영한 읽기 수", ("source",))
+REJECTED_TOTAL = REGISTRY.counter("smartfarm_anomaly_rejected_total", "이상치로 거부한 값 수", ("metric",))
+STORE_UPDATE_SECONDS = REGISTRY.histogram("smartfarm_store_update_seconds",
+                                          "저장소 반영 시간 (잠금 대기 포함)", ("mode",))
+HTTP_REQUEST_SECONDS = REGISTRY.histogram("smartfarm_http_request_seconds", "라우트별 응답 시간",
+                                          ("method", "route", "status"))
+SENSOR_READ_SECONDS = REGISTRY.histogram("smartfarm_sensor_read_seconds", "라즈베리파이 센서 읽기 시간",
+                                         buckets=(0.01, 0.05, 0.1, 0.25, 0.5, 1.0, 2.0, 3.0, 5.0, 10.0))
 
 # =============================================================================
 # 1. 데이터 저장소
 # =============================================================================
 
 class SimpleDataStore:
-    """간단한 메모리 데이터 저장소"""
-    
-    def __init__(self):
-        self.data = {
-            "temperature": 25.0,
-            "humidity": 60.0,
-            "soil_moisture": 45.0,
-            "light_intensity": 500,
-            "water_pump": False,
-            "led_lights": False,
-            "alerts": [],
-            "last_updated": datetime.now().isoformat(),
-            "source": "simulation"
+    """농장별 메모리 데이터 저장소
+
+    farm_id별 상태는 copy-on-write 스냅샷으로 보관한다. 쓰기는 농장마다 정해진
+    분할 잠금(lock stripe) 안에서 새 dict를 만들어 참조만 바꿔 끼우므로,
+    읽기는 잠금 없이 현재 스냅샷을 가져가고 다른 농장의 쓰기와도 경합하지 않는다.
+    """
+    
+    def __init__(self, retention_hours=24, lock_stripes=16, rule_engine=None, anomaly_filter=None,
+                 command_queue=None):
+        self.history = TimeSeriesHistory(retention_hours=retention_hours)
+        self.rule_engine = rule_engine  # 읽기마다 알림/액추에이터 지시를 계산
+        self.anomaly_filter = anomaly_filter  # 규칙/히스토리보다 먼저 이상치를 걸러냄
+        self.command_queue = command_queue  # 규칙의 액추에이터 지시를 라즈베리파이 명령으로 보냄
+        self.farms = {
+            DEFAULT_FARM_ID: {
+                "farm_id": DEFAULT_FARM_ID,
+                "temperature": 25.0,
+                "humidity": 60.0,
+                "soil_moisture": 45.0,
+                "light_intensity": 500,
+                "water_pump": False,
+                "led_lights": False,
+                "alerts": [],
+                "last_updated": datetime.now().isoformat(),
+                "source": "simulation",
+                "data_version": 0
+            }
         }
+        self.locks = [threading.Lock() for _ in range(lock_stripes)]
+        self.listeners = []
+        self.recorders = []
+    
+    def add_listener(self, listener):
+        """변경 리스너 등록 - listener(changes, snapshot) 형태로 호출됨 (snapshot은 수정 금지)
+        
+        농장 잠금 안에서 호출되므로 같은 농장의 변경은 data_version 순서대로 도착한다.
+        큐에 넣는 정도의 가벼운 작업만 해야 한다.
+        """
+        self.listeners.append(listener)
+    
+    def add_recorder(self, recorder):
+        """읽기 기록기 등록 - 읽기 한 건마다 recorder(farm_id, ts, values) 호출
+        
+        농장 잠금 안에서 호출되므로 큐에 넣는 정도의 가벼운 작업만 해야 한다.
+        """
+        self.recorders.append(recorder)
+    
+    def _lock_for(self, farm_id):
+        return self.locks[hash(farm_id) % len(self.locks)]
+    
+    def _apply(self, farm_id, readings):
+        """한 농장의 읽기 목록을 반영하고 (변경분, 새 스냅샷) 반환 - 해당 농장 잠금 안에서 호출"""
+        current = self.farms.get(farm_id) or {"farm_id": farm_id, "alerts": [], "data_version": 0}
+        merged = {}
+        for reading in readings:
+            READINGS_TOTAL.inc(str(reading.get("source", "unknown")))
+            if READ_DURATION_FIELD in reading:
+                # 센서 값이 아니라 측정 정보 - 지표로만 남기고 상태/히스토리에는 넣지 않는다
+                reading = dict(reading)
+                read_ms = reading.pop(READ_DURATION_FIELD)
+                if isinstance(read_ms, (int, float)) and not isinstance(read_ms, bool):
+                    SENSOR_READ_SECONDS.observe(read_ms / 1000)
+            if self.anomaly_filter is not None:
+                flagged, rejected = self.anomaly_filter.check(farm_id, reading)
+                if rejected:
+                    for metric in rejected:
+                        REJECTED_TOTAL.inc(metric)
+                    logger.warning("⚠️ 이상치 거부 (%s): %s", farm_id,
+                                   ", ".join(f"{m}={reading[m]}" for m in rejected))
+                    reading = {key: value for key, value in reading.items() if key not in rejected}
+                anomalies = {metric: "flagged" for metric in flagged}
+                anomalies.update((metric, "rejected") for metric in rejected)
+                merged["anomalies"] = anomalies
+            now = time.time()
+            ts = reading.get("timestamp") or now
+            if ts > now + MAX_CLOCK_SKEW:
+                # 미래 시각이 히스토리에 들어가면 그 뒤 읽기가 모두 "오래된 값"으로 버려진다
+                ts = now
+                reading = dict(reading, timestamp=now)
+            merged.update(reading)
+            values = numeric_values(reading)
+            if values:
+                self.history.append(farm_id, ts, values)
+                for recorder in self.recorders:
+                    recorder(farm_id, ts, values)
+                if self.rule_engine is not None and self.rule_engine.rules:
+                    alerts, actuators = self.rule_engine.evaluate(farm_id, ts, values)
+                    merged["alerts"] = alerts
+                    for actuator, state in actuators.items():
+                        if actuator not in reading:  # 장치가 직접 보고한 상태가 우선
+                            merged[actuator] = state
+                        if self.command_queue is not None:
+                            self.command_queue.command_if_changed(farm_id, actuator, state)
+        merged["farm_id"] = farm_id
+        
+        changes = {key: value for key, value in merged.items() if current.get(key) != value}
+        snapshot = dict(current)
+        snapshot.update(merged)
+        snapshot["last_updated"] = datetime.now().isoformat()
+        snapshot["data_version"] = current["data_version"] + 1
+        changes["farm_id"] = farm_id
+        changes["last_updated"] = snapshot["last_updated"]
+        changes["data_version"] = snapshot["data_version"]
+        
+        self.farms[farm_id] = snapshot  # 참조 교체 - 읽는 쪽은 이전/새 스냅샷 중 하나를 온전히 본다
+        return changes, snapshot
+    
+    def _notify(self, changes, snapshot):
+        for listener in self.listeners:
+            listener(changes, snapshot)
     
     def update_data(self, new_data):
         """데이터 업데이트"""
-        self.data.update(new_data)
-        self.data["last_updated"] = datetime.now().isoformat()
-        print(f"📊 데이터 업데이트: {new_data}")
+        farm_id = str(new_data.get("farm_id", DEFAULT_FARM_ID))
+        started = time.perf_counter()
+        with self._lock_for(farm_id):
+            changes, snapshot = self._apply(farm_id, [new_data])
+            self._notify(changes, snapshot)  # 잠금 안 - 잠금 밖이면 다음 버전이 먼저 나갈 수 있음
+        STORE_UPDATE_SECONDS.observe(time.perf_counter() - started, "single")
+        logger.debug("📊 데이터 업데이트: %s", new_data)
+    
+    def update_batch(self, readings):
+        """여러 읽기를 타임스탬프 순으로 반영 (농장마다 잠금 1회, 버전 1 증가)"""
+        by_farm = {}
+        for reading in sorted(readings, key=lambda reading: reading.get("timestamp", 0)):
+            by_farm.setdefault(str(reading.get("farm_id", DEFAULT_FARM_ID)), []).append(reading)
+        
+        for farm_id, farm_readings in by_farm.items():
+            started = time.perf_counter()
+            with self._lock_for(farm_id):
+                changes, snapshot = self._apply(farm_id, farm_readings)
+                self._notify(changes, snapshot)
+            STORE_UPDATE_SECONDS.observe(time.perf_counter() - started, "batch")
+        if readings:
+            logger.debug("📦 배치 업데이트: %d건 (%d개 농장)", len(readings), len(by_farm))
+    
+    def restore(self, states):
+        """영속 저장소에서 복구한 농장 상태로 교체 (서버 시작 시)"""
+        for farm_id, state in states.items():
+            self.farms[farm_id] = state
     
-    def get_data(self):
-        """현재 데이터 반환"""
-        return self.data.copy()
+    def snapshot(self, farm_id=DEFAULT_FARM_ID):
+        """농장의 현재 스냅샷 (복사 없음, 수정 금지) - 없으면 None"""
+        return self.farms.get(farm_id)
+    
+    def get_data(self, farm_id=DEFAULT_FARM_ID):
+        """현재 데이터 반환 (호출한 쪽이 수정해도 되는 복사본)"""
+        snapshot = self.farms.get(farm_id)
+        if snapshot is None:
+            return None
+        return dict(snapshot, alerts=list(snapshot.get("alerts", [])))
+    
+    def farm_ids(self):
+        """등록된 농장 목록"""
+        return sorted(self.farms)
 
 # =============================================================================
 # 2. 시뮬레이터 (테스트용)
@@ -49,16 +218,15 @@ class SimpleSimulator:
         self.running = False
     
     def generate_data(self):
-        """랜덤 센서 데이터 생성"""
-        import random
-        
-        data = self.data_store.get_data()
+        """랜덤 센서 데이터 생성 (알림/자동 제어는 저장소의 규칙 엔진이 계산)"""
+        current = self.data_store.snapshot()
+        data = {"source": "simulation"}
         
         # 센서값 약간씩 변경
-        data["temperature"] += random.uniform(-1, 1)
-        data["humidity"] += random.uniform(-2, 2)
-        data["soil_moisture"] += random.uniform(-1, 1)
-        data["light_intensity"] += random.randint(-50, 50)
+        data["temperature"] = current.get("temperature", 25.0) + random.uniform(-1, 1)
+        data["humidity"] = current.get("humidity", 60.0) + random.uniform(-2, 2)
+        data["soil_moisture"] = current.get("soil_moisture", 45.0) + random.uniform(-1, 1)
+        data["light_intensity"] = current.get("light_intensity", 500) + random.randint(-50, 50)
         
         # 범위 제한
         data["temperature"] = max(20, min(35, data["temperature"]))
@@ -66,18 +234,6 @@ class SimpleSimulator:
         data["soil_moisture"] = max(30, min(80, data["soil_moisture"]))
         data["light_intensity"] = max(0, min(1000, data["light_intensity"]))
         
-        # 자동 제어
-        data["water_pump"] = data["soil_moisture"] < 35
-        data["led_lights"] = data["light_intensity"] < 200
-        
-        # 간단한 알림
-        alerts = []
-        if data["temperature"] > 30:
-            alerts.append("온도 높음")
-        if data["soil_moisture"] < 35:
-            alerts.append("토양 건조")
-        data["alerts"] = alerts
-        
         return data
     
     def start(self):
@@ -97,33 +253,199 @@ class SimpleSimulator:
 # 3. 간단한 웹 애플리케이션 (템플릿 분리)
 # =============================================================================
 
+NDJSON_TYPES = ("application/x-ndjson", "application/ndjson")
+
+class CachedJSON:
+    """data_version 하나에 대한 직렬화 결과 캐시 (JSON 바이트, gzip 바이트, ETag)"""
+    
+    def __init__(self, data):
+        self.version = data.get("data_version")
+        self.body = json.dumps(data, ensure_ascii=False).encode("utf-8")
+        self.etag = hashlib.blake2b(self.body, digest_size=8).hexdigest()
+        self._gzip_body = None
+    
+    @classmethod
+    def from_body(cls, body, version, etag):
+        """이미 직렬화된 JSON 바이트로 만들기 (ETag는 호출한 쪽이 정함)"""
+        cached = cls.__new__(cls)
+        cached.version = version
+        cached.body = body
+        cached.etag = etag
+        cached._gzip_body = None
+        return cached
+    
+    @property
+    def gzip_body(self):
+        if self._gzip_body is None:
+            self._gzip_body = gzip.compress(self.body, compresslevel=5)
+        return self._gzip_body
+
+def load_page(path):
+    """정적 페이지를 한 번 읽어 CachedJSON으로 (파일이 없으면 None)
+    
+    대시보드에는 템플릿 변수가 없으므로 Jinja로 렌더링하지 않고 바이트 그대로 보낸다.
+    """
+    try:
+        with open(path, "rb") as f:
+            body = f.read()
+    except OSError as e:
+        logger.warning("⚠️ 템플릿 파일을 읽을 수 없습니다: %s", e)
+        return None
+    return CachedJSON.from_body(body, None, hashlib.blake2b(body, digest_size=8).hexdigest())
+
+def conditional_json(cached, mimetype="application/json"):
+    """ETag/If-None-Match(304)와 gzip을 지원하는 응답 (CachedJSON)"""
+    use_gzip = "gzip" in request.headers.get("Accept-Encoding", "")
+    etag = cached.etag + ("-gz" if use_gzip else "")
+    headers = {"ETag": f'"{etag}"', "Vary": "Accept-Encoding", "Cache-Control": "no-cache"}
+    if request.if_none_match.contains(etag):
+        return Response(status=304, headers=headers)
+    if use_gzip:
+        headers["Content-Encoding"] = "gzip"
+        return Response(cached.gzip_body, mimetype=mimetype, headers=headers)
+    return Response(cached.body, mimetype=mimetype, headers=headers)
+
+def decode_batch(body, content_type, content_encoding):
+    """배치 요청 본문 해석 (gzip/zstd 압축, NDJSON·JSON 배열·압축 바이너리)"""
+    if content_encoding == "gzip":
+        body = gzip.decompress(body)
+    elif content_encoding == "zstd":
+        import zstandard  # 선택 의존성 - 없으면 ImportError
+        body = zstandard.ZstdDecompressor().decompressobj().decompress(body)
+    elif content_encoding not in ("", "identity"):
+        raise ValueError(f"지원하지 않는 Content-Encoding: {content_encoding}")
+    
+    mimetype = content_type.split(";")[0].strip()
+    if mimetype == PACKED_TYPE:
+        return decode_readings(body)
+    text = body.decode("utf-8")
+    if mimetype in NDJSON_TYPES:
+        readings = [json.loads(line) for line in text.splitlines() if line.strip()]
+    else:
+        readings = json.loads(text)
+    
+    if not isinstance(readings, list) or not all(isinstance(reading, dict) for reading in readings):
+        raise ValueError("읽기 객체의 배열이어야 합니다")
+    return readings
+
+def validate_readings(readings):
+    """수집한 읽기 목록을 저장소에 넣기 전에 모두 검증 (UDP 수집과 같은 규칙)
+    
+    하나라도 잘못되면 ValueError - 배치 일부만 반영되는 일이 없도록 반영 전에 호출한다.
+    """
+    now = time.time()
+    return [validate_reading(reading, now) for reading in readings]
+
+def register_store_metrics(data_store):
+    """저장소 크기 지표 등록 (긁어갈 때 계산)"""
+    REGISTRY.register_callback("smartfarm_store_farms", "저장소의 농장 수", lambda: len(data_store.farms))
+    REGISTRY.register_callback(
+        "smartfarm_history_points", "메모리 히스토리에 보관 중인 읽기 수",
+        lambda: sum(farm.size for farm in list(data_store.history.farms.values()))
+    )
+
 class SimpleWebApp:
     """간단한 웹 애플리케이션"""
     
-    def __init__(self, data_store, port=5000):
-        self.app = Flask(__name__, template_folder='templates')
+    def __init__(self, data_store, port=5000, archive=None, shared_state=None, dashboard_path=DASHBOARD_PATH):
+        self.app = Flask(__name__)
         self.data_store = data_store
+        self.archive = archive
+        self.shared_state = shared_state  # 여러 워커 프로세스가 최신값을 공유할 때
+        self.response_cache = {}  # farm_id -> CachedJSON
+        self.series_cache = None  # 다운샘플링 결과 캐시 (numpy가 있을 때 첫 요청에서 생성)
+        self.summary = FarmSummary()  # 전체 농장 요약 (변경된 농장만 갱신)
+        self.summary.seed(data_store)
+        self.summary_responses = {}  # fields -> CachedJSON (gzip 결과 재사용)
         self.port = port
+        self.broker = EventBroker()
+        self.data_store.add_listener(self.publish_changes)
+        self.data_store.add_listener(self.summary.update)
+        register_store_metrics(data_store)
+        REGISTRY.register_callback("smartfarm_stream_clients", "SSE 구독자 수", self.broker.client_count)
+        # 대시보드는 시작할 때 한 번 읽어 메모리에 둔다 (pre-fork 워커는 그대로 물려받음)
+        self.dashboard = load_page(dashboard_path)
         self.setup_routes()
-        self.ensure_templates()
     
+    def publish_changes(self, changes, snapshot):
+        """저장소 변경분을 SSE 구독자에게 전달"""
+        self.broker.publish("delta", changes, changes["data_version"], topic=changes["farm_id"])
     
+    def latest(self, farm_id):
+        """농장의 최신 상태 - 공유 메모리 테이블이 있으면 그쪽 값을 우선"""
+        if self.shared_state is not None:
+            state = self.shared_state.read(farm_id)
+            if state is not None:
+                return state
+        return self.data_store.snapshot(farm_id)
+    
+    def cached_data(self, farm_id, snapshot):
+        """농장 스냅샷의 직렬화 결과를 data_version 단위로 캐시
+        
+        공유 메모리 테이블에서 읽은 값의 data_version은 슬롯 버전이라 워커와 상관없이
+        같은 번호면 같은 내용이다 (ETag도 워커 간에 맞음).
+        """
+        cached = self.response_cache.get(farm_id)
+        if cached is None or cached.version != snapshot["data_version"]:
+            cached = CachedJSON(snapshot)
+            self.response_cache[farm_id] = cached
+        return cached
     
     def setup_routes(self):
         """라우트 설정"""
         
+        @self.app.before_request
+        def start_timer():
+            g.started = time.perf_counter()
+        
+        @self.app.after_request
+        def observe_latency(response):
+            """라우트별 응답 시간 기록 (SSE는 스트림 시작까지)"""
+            started = g.pop('started', None)
+            if started is not None:
+                route = request.url_rule.rule if request.url_rule else "unmatched"
+                HTTP_REQUEST_SECONDS.observe(time.perf_counter() - started,
+                                             request.method, route, str(response.status_code))
+            return response
+        
+        @self.app.route('/metrics')
+        def metrics():
+            """Prometheus 지표"""
+            return Response(REGISTRY.render(), mimetype=METRICS_CONTENT_TYPE)
+        
+        @self.app.route('/api/profiler', methods=['GET', 'POST'])
+        def profiler():
+            """샘플링 프로파일러 상태/결과 (?format=collapsed), POST로 켜고 끔
+            
+            POST 본문: {"enabled": true, "interval": 0.005, "reset": false, "log_level": "DEBUG"}
+            """
+            if request.method == 'POST':
+                try:
+                    reset, enabled, interval, log_level = parse_profiler_options(request.get_json(silent=True) or {})
+                except ValueError as e:
+                    return jsonify({"status": "error", "message": str(e)}), 400
+                if reset:
+                    PROFILER.reset()
+                if log_level is not None:
+                    set_level(log_level)
+                if enabled:
+                    PROFILER.start(interval)
+                elif enabled is not None:
+                    PROFILER.stop()
+            if request.args.get('format') == 'collapsed':
+                return Response(PROFILER.collapsed(), mimetype='text/plain')
+            return jsonify(PROFILER.report(request.args.get('limit', 20, type=int)))
+        
         @self.app.route('/')
         def dashboard():
-            """메인 대시보드 - 템플릿 파일 사용"""
-            try:
-                return render_template('dashboard.html')
-            except Exception as e:
-                print(f"❌ 템플릿 렌더링 오류: {e}")
-                return f"""
+            """메인 대시보드 - 메모리에 둔 페이지 (ETag/304, gzip)"""
+            if self.dashboard is not None:
+                return conditional_json(self.dashboard, "text/html")
+            return f"""
                 <html>
                 <body>
                     <h1>스마트팜 대시보드</h1>
-                    <p>템플릿 파일 오류: {e}</p>
+                    <p>템플릿 파일 오류: {DASHBOARD_PATH}를 읽을 수 없습니다</p>
                     <p><a href="/api/data">API 데이터 보기</a></p>
                 </body>
                 </html>
@@ -131,20 +453,263 @@ class SimpleWebApp:
         
         @self.app.route('/api/data')
         def get_data():
-            """센서 데이터 API"""
-            return jsonify(self.data_store.get_data())
+            """센서 데이터 API (?farm_id=)"""
+            farm_id = request.args.get('farm_id', DEFAULT_FARM_ID)
+            data = self.latest(farm_id)
+            if data is None:
+                return jsonify({"status": "error", "message": "알 수 없는 농장입니다"}), 404
+            return conditional_json(self.cached_data(farm_id, data))
+        
+        @self.app.route('/api/farms')
+        def get_farms():
+            """등록된 농장 목록"""
+            farm_ids = set(self.data_store.farm_ids())
+            if self.shared_state is not None:
+                farm_ids.update(self.shared_state.farm_ids())
+            return jsonify({"farms": sorted(farm_ids)})
+        
+        @self.app.route('/api/farms/summary')
+        def get_farms_summary():
+            """전체 농장의 최신값/알림/액추에이터 요약 (?fields=temperature,alerts&since=버전)
+            
+            since를 주면 그 버전 이후에 바뀐 농장만 보낸다 (응답의 version을 다음 since로 사용).
+            이 프로세스가 수집한 농장 기준이다 (여러 워커로 띄우면 워커별).
+            """
+            fields = FarmSummary.parse_fields(request.args.get('fields'))
+            since = request.args.get('since', type=int)
+            version, body = self.summary.render(fields, since)
+            if since is not None:
+                return conditional_json(CachedJSON.from_body(body, version, f"summary-{version}-since-{since}"))
+            
+            cached = self.summary_responses.get(fields)
+            if cached is None or cached.version != version:
+                tag = hashlib.blake2b(repr(fields).encode("utf-8"), digest_size=4).hexdigest()
+                cached = CachedJSON.from_body(body, version, f"summary-{version}-{tag}")
+                if fields not in self.summary_responses and len(self.summary_responses) >= 32:
+                    self.summary_responses.clear()
+                self.summary_responses[fields] = cached
+            return conditional_json(cached)
+        
+        @self.app.route('/api/stream')
+        def stream():
+            """SSE 스트림 - 접속 시 전체 스냅샷, 이후 변경분만 전송 (?farm_id=)"""
+            farm_id = request.args.get('farm_id', DEFAULT_FARM_ID)
+            data = self.data_store.snapshot(farm_id)
+            if data is None:
+                return jsonify({"status": "error", "message": "알 수 없는 농장입니다"}), 404
+            subscriber = self.broker.subscribe(farm_id)
+            data = self.data_store.snapshot(farm_id)
+            initial = format_sse("snapshot", data, data["data_version"])
+            return Response(
+                self.broker.stream(subscriber, initial),
+                mimetype='text/event-stream',
+                headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+            )
+        
+        @self.app.route('/api/history')
+        def get_history():
+            """시계열 히스토리 API (?metric=&from=&to=&farm_id=)"""
+            metric = request.args.get('metric')
+            if not metric:
+                return jsonify({"status": "error", "message": "metric 파라미터가 필요합니다"}), 400
+            farm_id = request.args.get('farm_id', DEFAULT_FARM_ID)
+            start_ts = request.args.get('from', type=float)
+            end_ts = request.args.get('to', type=float)
+            
+            timestamps, values = self.data_store.history.query(farm_id, metric, start_ts, end_ts)
+            return jsonify({
+                "farm_id": farm_id,
+                "metric": metric,
+                "timestamps": timestamps,
+                "values": values
+            })
+        
+        @self.app.route('/api/history/downsampled')
+        def get_downsampled_history():
+            """차트용 히스토리 (?metric=&from=&to=&farm_id=&width=&method=lttb|minmax)
+            
+            구간을 width개 이하의 점으로 줄여서 반환 (NumPy 벡터 연산, 결과 캐시)
+            """
+            metric = request.args.get('metric')
+            if not metric:
+                return jsonify({"status": "error", "message": "metric 파라미터가 필요합니다"}), 400
+            farm_id = request.args.get('farm_id', DEFAULT_FARM_ID)
+            start_ts = request.args.get('from', type=float)
+            end_ts = request.args.get('to', type=float)
+            width = min(10000, max(3, request.args.get('width', 800, type=int)))
+            method = request.args.get('method', 'lttb')
+            try:
+                from downsample import METHODS, SeriesCache, downsample
+            except ImportError:
+                return jsonify({"status": "error", "message": "다운샘플링에는 numpy가 필요합니다"}), 501
+            if method not in METHODS:
+                return jsonify({"status": "error", "message": f"method는 {', '.join(METHODS)} 중 하나여야 합니다"}), 400
+            if self.series_cache is None:
+                self.series_cache = SeriesCache()
+            
+            history = self.data_store.history
+            key = (farm_id, metric, start_ts, end_ts, width, method)
+            oldest, newest, version = history.bounds(farm_id)
+            result = self.series_cache.get(key, start_ts, end_ts, oldest, version)
+            if result is None:
+                timestamps, values, version = history.query_arrays(farm_id, metric, start_ts, end_ts)
+                sampled_ts, sampled_values = downsample(timestamps, values, width, method)
+                result = {
+                    "farm_id": farm_id,
+                    "metric": metric,
+                    "method": method,
+                    "raw_points": int(len(timestamps)),
+                    "timestamps": sampled_ts.tolist(),
+                    "values": sampled_values.tolist()
+                }
+                self.series_cache.put(key, version, newest, result)
+            return jsonify(result)
+        
+        @self.app.route('/api/archive')
+        def get_archive():
+            """장기 히스토리 API (?metric=&from=&to=&points=&farm_id=) - 해상도 자동 선택"""
+            if self.archive is None:
+                return jsonify({"status": "error", "message": "보관소가 설정되지 않았습니다"}), 503
+            metric = request.args.get('metric')
+            if not metric:
+                return jsonify({"status": "error", "message": "metric 파라미터가 필요합니다"}), 400
+            farm_id = request.args.get('farm_id', DEFAULT_FARM_ID)
+            end_ts = request.args.get('to', time.time(), type=float)
+            start_ts = request.args.get('from', end_ts - 86400, type=float)
+            max_points = max(1, request.args.get('points', 500, type=int))
+            
+            result = self.archive.query(farm_id, metric, start_ts, end_ts, max_points)
+            result.update({"farm_id": farm_id, "metric": metric})
+            return jsonify(result)
+        
+        @self.app.route('/api/stats')
+        def get_stats():
+            """지표별 실시간 통계 (?farm_id=&metric=) - 평균/분산, EWMA, 이동 중앙값, 이상치 수"""
+            if self.data_store.anomaly_filter is None:
+                return jsonify({"status": "error", "message": "이상치 필터가 설정되지 않았습니다"}), 503
+            farm_id = request.args.get('farm_id', DEFAULT_FARM_ID)
+            metric = request.args.get('metric')
+            return jsonify({
+                "farm_id": farm_id,
+                "stats": self.data_store.anomaly_filter.snapshot(farm_id, metric)
+            })
+        
+        @self.app.route('/api/rules')
+        def get_rules():
+            """규칙 목록과 농장별로 현재 켜져 있는 규칙 (?farm_id=)"""
+            engine = self.data_store.rule_engine
+            if engine is None:
+                return jsonify({"rules": [], "active": []})
+            farm_id = request.args.get('farm_id', DEFAULT_FARM_ID)
+            return jsonify({
+                "rules": [rule.spec for rule in engine.rules],
+                "active": sorted(engine.active.get(farm_id, {}))
+            })
+        
+        @self.app.route('/api/rules/evaluate')
+        def evaluate_rules():
+            """히스토리 구간에 규칙을 일괄 적용 (?farm_id=&from=&to=) - NumPy 벡터 연산"""
+            engine = self.data_store.rule_engine
+            if engine is None:
+                return jsonify({"status": "error", "message": "규칙 엔진이 설정되지 않았습니다"}), 503
+            farm_id = request.args.get('farm_id', DEFAULT_FARM_ID)
+            start_ts = request.args.get('from', type=float)
+            end_ts = request.args.get('to', type=float)
+            try:
+                results = engine.evaluate_history(self.data_store.history, farm_id, start_ts, end_ts)
+            except ImportError:
+                return jsonify({"status": "error", "message": "일괄 평가에는 numpy가 필요합니다"}), 501
+            return jsonify({"farm_id": farm_id, "rules": results})
+        
+        @self.app.route('/api/commands', methods=['POST'])
+        def send_command():
+            """액추에이터 명령 보내기 {"farm_id", "actuator", "state"} - 라즈베리파이가 롱폴링으로 즉시 받음"""
+            commands = self.data_store.command_queue
+            if commands is None:
+                return jsonify({"status": "error", "message": "명령 채널이 설정되지 않았습니다"}), 503
+            data = request.get_json(silent=True) or {}
+            try:
+                command = commands.enqueue(str(data.get("farm_id", DEFAULT_FARM_ID)), data.get("actuator"),
+                                           data.get("state"))
+            except ValueError as e:
+                return jsonify({"status": "error", "message": str(e)}), 400
+            logger.info("🎛️ 명령 (%s): %s", data.get("farm_id", DEFAULT_FARM_ID), command)
+            return jsonify({"status": "success", "command": command})
+        
+        @self.app.route('/api/commands')
+        def poll_commands():
+            """라즈베리파이용 명령 롱폴링 (?farm_id=&after=마지막 적용 seq&epoch=&wait=초)"""
+            commands = self.data_store.command_queue
+            if commands is None:
+                return jsonify({"status": "error", "message": "명령 채널이 설정되지 않았습니다"}), 503
+            farm_id = request.args.get('farm_id', DEFAULT_FARM_ID)
+            after = request.args.get('after', 0, type=int)
+            wait = min(30.0, max(0.0, request.args.get('wait', 25, type=float)))
+            epoch, pending = commands.wait(farm_id, after, request.args.get('epoch'), wait)
+            return jsonify({"epoch": epoch, "commands": pending})
+        
+        @self.app.route('/api/commands/ack', methods=['POST'])
+        def ack_commands():
+            """명령 적용 완료 알림 {"farm_id", "seq", "epoch"} (seq까지 누적)"""
+            commands = self.data_store.command_queue
+            if commands is None:
+                return jsonify({"status": "error", "message": "명령 채널이 설정되지 않았습니다"}), 503
+            data = request.get_json(silent=True) or {}
+            try:
+                remaining = commands.ack(str(data.get("farm_id", DEFAULT_FARM_ID)), int(data.get("seq", 0)),
+                                         data.get("epoch"))
+            except (TypeError, ValueError) as e:
+                return jsonify({"status": "error", "message": str(e)}), 409
+            return jsonify({"status": "success", "pending": remaining})
+        
+        @self.app.route('/api/commands/status')
+        def command_status():
+            """농장의 명령 큐 상태 (?farm_id=)"""
+            commands = self.data_store.command_queue
+            if commands is None:
+                return jsonify({"status": "error", "message": "명령 채널이 설정되지 않았습니다"}), 503
+            return jsonify(commands.status(request.args.get('farm_id', DEFAULT_FARM_ID)))
         
         @self.app.route('/api/external_data', methods=['POST'])
         def receive_external_data():
-            """외부(라즈베리파이)에서 데이터 받기"""
+            """외부(라즈베리파이)에서 데이터 받기 (JSON 또는 압축 바이너리)"""
+            try:
+                if request.mimetype == PACKED_TYPE:
+                    readings = decode_readings(request.get_data())
+                else:
+                    readings = [request.get_json()]
+                readings = validate_readings(readings)
+            except Exception as e:
+                logger.warning("❌ 외부 데이터 수신 오류: %s", e)
+                return jsonify({"status": "error", "message": str(e)}), 400
+            
+            for reading in readings:
+                reading["source"] = "raspberry_pi"
+            if len(readings) == 1:
+                self.data_store.update_data(readings[0])
+            else:
+                self.data_store.update_batch(readings)
+            return jsonify({"status": "success"})
+        
+        @self.app.route('/api/external_data/batch', methods=['POST'])
+        def receive_external_batch():
+            """외부 데이터 일괄 수신 (NDJSON/JSON 배열, gzip·zstd 압축)"""
             try:
-                data = request.get_json()
-                data["source"] = "raspberry_pi"
-                self.data_store.update_data(data)
-                return jsonify({"status": "success"})
+                readings = validate_readings(decode_batch(
+                    request.get_data(),
+                    request.content_type or "",
+                    request.headers.get("Content-Encoding", "")
+                ))
+            except ImportError:
+                return jsonify({"status": "error", "message": "zstd 압축 해제를 지원하지 않습니다"}), 415
             except Exception as e:
-                print(f"❌ 외부 데이터 수신 오류: {e}")
+                logger.warning("❌ 배치 데이터 수신 오류: %s", e)
                 return jsonify({"status": "error", "message": str(e)}), 400
+            
+            for reading in readings:
+                reading["source"] = "raspberry_pi"
+            self.data_store.update_batch(readings)
+            return jsonify({"status": "success", "count": len(readings)})
     
     def start(self):
         """웹 서버 시작"""
@@ -159,12 +724,40 @@ class SimpleWebApp:
 class RaspberryPiSensor:
     """라즈베리파이 센서 클래스 (간소화)"""
     
-    def __init__(self, server_url="http://192.168.1.100:5000"):
+    def __init__(self, server_url="http://192.168.1.100:5000", batch_size=0, max_batch_age=60, packed=False,
+                 udp_port=None, farm_id=DEFAULT_FARM_ID, command_wait=25):
+        self.farm_id = farm_id
         self.server_url = f"{server_url}/api/external_data"
+        self.commands_url = f"{server_url}/api/commands"
+        self.command_wait = command_wait  # 명령 롱폴링 대기 시간 (초)
+        self.actuators = {}               # 서버 명령으로 적용한 액추에이터 상태
+        self.command_epoch = None
+        self.command_seq = 0              # 마지막으로 적용한 명령 seq
+        self.command_stop = threading.Event()
+        self.command_thread = None
+        self.batch_url = f"{server_url}/api/external_data/batch"
+        self.batch_size = batch_size  # 0이면 읽기마다 바로 전송
+        self.packed = packed  # True면 JSON 대신 압축 바이너리 형식 (셀룰러 회선용)
+        # udp_port를 주면 HTTP 대신 UDP 데이터그램으로 보낸다 (응답 없음, 유실 허용)
+        self.udp_address = (urlparse(server_url).hostname, udp_port) if udp_port else None
+        self.udp_socket = None
+        self.max_batch_age = max_batch_age
+        self.pending = []
+        self.batch_started = 0
+        self.max_pending = 5000  # 오프라인 중 보관할 최대 읽기 수
+        self.backoff = 2
+        self.retry_at = 0
+        self.session = None
+    
+    def http(self):
+        """keep-alive 세션 - requests는 처음 보낼 때 불러온다 (서버 기동 경로에서 빠짐)"""
+        if self.session is None:
+            import requests
+            self.session = requests.Session()
+        return self.session
     
     def read_sensors(self):
         """센서 데이터 읽기 (시뮬레이션)"""
-        import random
         return {
             "temperature": round(random.uniform(20.0, 30.0), 1),
             "humidity": round(random.uniform(50.0, 80.0), 1),
@@ -172,23 +765,168 @@ class RaspberryPiSensor:
             "light_intensity": random.randint(200, 900)
         }
     
+    def queue_reading(self, data):
+        """배치 모드: 읽기를 모아두고 크기/시간 조건이 되면 전송"""
+        data.setdefault("timestamp", time.time())
+        if not self.pending:
+            self.batch_started = data["timestamp"]
+        self.pending.append(data)
+        
+        if time.time() < self.retry_at:
+            return  # 서버 장애 중 - 백오프가 끝날 때까지 모아두기만 한다
+        if len(self.pending) >= self.batch_size or time.time() - self.batch_started >= self.max_batch_age:
+            self.flush_batch()
+    
+    def retry_later(self, readings):
+        """전송 실패한 읽기를 보관하고 다음 재시도까지 백오프"""
+        self.pending = (readings + self.pending)[-self.max_pending:]
+        self.batch_started = self.pending[0]["timestamp"]
+        self.retry_at = time.time() + self.backoff
+        self.backoff = min(self.backoff * 2, 300)
+    
+    def flush_batch(self):
+        """모아둔 읽기를 gzip NDJSON 요청 한 번으로 전송"""
+        if not self.pending:
+            return
+        readings, self.pending = self.pending, []
+        if self.packed:
+            body = gzip.compress(encode_readings(readings))
+            content_type = PACKED_TYPE
+        else:
+            body = gzip.compress("\n".join(json.dumps(reading) for reading in readings).encode("utf-8"))
+            content_type = "application/x-ndjson"
+        try:
+            response = self.http().post(
+                self.batch_url,
+                data=body,
+                headers={"Content-Type": content_type, "Content-Encoding": "gzip"},
+                timeout=5
+            )
+            
+            if response.status_code >= 500:
+                print(f"❌ 배치 전송 실패: {response.status_code}")
+                self.retry_later(readings)
+                return
+            if response.status_code == 200:
+                print(f"✅ 배치 전송 성공: {len(readings)}건")
+            else:
+                print(f"❌ 배치 전송 실패: {response.status_code}")
+            self.backoff = 2
+        except Exception as e:
+            print(f"❌ 배치 전송 오류: {e}")
+            self.retry_later(readings)
+    
     def send_data(self):
         """데이터 서버로 전송"""
+        started = time.perf_counter()
+        data = self.read_sensors()
+        data["sensor_read_ms"] = round((time.perf_counter() - started) * 1000, 1)  # 서버 /metrics용
+        data["timestamp"] = time.time()
+        data["farm_id"] = self.farm_id
+        if self.udp_address:
+            self.send_datagram(data)
+            return
+        if self.batch_size or self.pending:
+            # 배치 모드이거나 못 보낸 읽기가 남아 있으면 순서대로 함께 보낸다
+            self.queue_reading(data)
+            return
+        
         try:
-            import requests
-            data = self.read_sensors()
-            response = requests.post(self.server_url, json=data, timeout=5)
+            if self.packed:
+                response = self.http().post(self.server_url, data=encode_readings([data]),
+                                            headers={"Content-Type": PACKED_TYPE}, timeout=5)
+            else:
+                response = self.http().post(self.server_url, json=data, timeout=5)
             
             if response.status_code == 200:
                 print(f"✅ 전송 성공: {data}")
             else:
                 print(f"❌ 전송 실패: {response.status_code}")
+                if response.status_code >= 500:
+                    self.retry_later([data])
         except Exception as e:
             print(f"❌ 전송 오류: {e}")
+            self.retry_later([data])
+    
+    def send_datagram(self, data):
+        """UDP로 한 번 보내고 끝 (재시도 없음)"""
+        if self.udp_socket is None:
+            self.udp_socket = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+        payload = encode_readings([data]) if self.packed else json.dumps(data).encode("utf-8")
+        try:
+            self.udp_socket.sendto(payload, self.udp_address)
+            print(f"✅ UDP 전송: {data}")
+        except OSError as e:
+            print(f"❌ UDP 전송 오류: {e}")
+    
+    def apply_command(self, command):
+        """서버 명령 적용 (시뮬레이션 - 실제 장치는 realMainfile/sensor.py)"""
+        self.actuators[command["actuator"]] = command["state"]
+        print(f"🎛️ 명령 #{command['seq']}: {command['actuator']} → {'ON' if command['state'] else 'OFF'}"
+              f" ({command.get('source')})")
+    
+    def poll_commands(self, session, stop=None):
+        """명령 롱폴링 한 번 → 새로 적용한 명령 수
+        
+        seq가 마지막 적용값보다 큰 명령만 적용하고 누적 ack를 보낸다. 서버 epoch가 바뀌면
+        (서버 재시작) seq를 처음부터 다시 센다. ack가 실패해도 다음 요청의 after가 대신한다.
+        """
+        response = session.get(self.commands_url, timeout=self.command_wait + 5, params={
+            "farm_id": self.farm_id, "after": self.command_seq,
+            "epoch": self.command_epoch or "", "wait": self.command_wait
+        })
+        response.raise_for_status()
+        body = response.json()
+        if stop is not None and stop.is_set():
+            return 0  # 기다리는 동안 멈춤 - 새로 시작한 스레드가 다시 받는다
+        if body["epoch"] != self.command_epoch:
+            self.command_epoch, self.command_seq = body["epoch"], 0
+        applied = 0
+        for command in body["commands"]:
+            if command["seq"] <= self.command_seq:
+                continue  # 이미 적용한 명령 (재전송)
+            self.apply_command(command)
+            self.command_seq = command["seq"]
+            applied += 1
+        if applied:
+            try:
+                session.post(f"{self.commands_url}/ack", timeout=5, json={
+                    "farm_id": self.farm_id, "seq": self.command_seq, "epoch": self.command_epoch
+                })
+            except Exception as e:
+                print(f"⚠️ 명령 ack 실패 (다음 요청에서 다시 알림): {e}")
+        return applied
+    
+    def start_commands(self):
+        """명령 수신 스레드 시작 (전송과 별도 세션, 연결 오류는 지수 백오프)"""
+        if self.command_thread is not None and self.command_thread.is_alive() and not self.command_stop.is_set():
+            return
+        import requests
+        stop = self.command_stop = threading.Event()  # 실행마다 따로 - 멈추는 중인 이전 스레드와 섞이지 않음
+        
+        def run():
+            session = requests.Session()
+            backoff = 1
+            while not stop.is_set():
+                try:
+                    self.poll_commands(session, stop)
+                    backoff = 1
+                except (requests.exceptions.RequestException, ValueError, KeyError, TypeError) as e:
+                    print(f"❌ 명령 수신 실패 - {backoff}초 뒤 재접속: {e}")
+                    stop.wait(backoff)
+                    backoff = min(backoff * 2, 60)
+            session.close()
+        
+        self.command_thread = threading.Thread(target=run, daemon=True)
+        self.command_thread.start()
+    
+    def stop_commands(self):
+        self.command_stop.set()
     
     def start_sending(self):
-        """데이터 전송 시작"""
+        """데이터 전송 시작 (명령 수신도 함께)"""
         print(f"📡 라즈베리파이 센서 시작: {self.server_url}")
+        self.start_commands()
         while True:
             self.send_data()
             time.sleep(10)  # 10초마다 전송
@@ -197,30 +935,89 @@ class RaspberryPiSensor:
 # 5. 메인 실행
 # =============================================================================
 
-def main():
-    """메인 실행 함수"""
+def main(server="flask"):
+    """메인 실행 함수 (server: "flask" 또는 "asgi")"""
+    setup_logging()
     print("🌱 간단 스마트팜 시스템 시작 (템플릿 분리)")
     print("=" * 50)
     
-    # 데이터 저장소 생성
-    data_store = SimpleDataStore()
+    # 데이터 저장소 생성 (스냅샷 + WAL에서 복구, 규칙 엔진 적용)
+    data_store = SimpleDataStore(rule_engine=RuleEngine.load(RULES_PATH), anomaly_filter=AnomalyFilter(),
+                                 command_queue=CommandQueue())
+    storage = PersistentStorage("data")
+    data_store.restore(storage.load())
+    data_store.add_listener(storage.append)
+    storage.start()
+    
+    # 장기 보관소 (SQLite)
+    archive = SensorArchive("data/archive.db")
+    data_store.add_recorder(archive.record)
+    archive.start()
+    
+    # UDP 수집 리스너 (HTTP와 같은 저장소로 반영) - asyncio는 여기서만 필요
+    from udp_ingest import UdpIngestListener
+    udp_listener = UdpIngestListener(data_store, port=UDP_PORT)
+    udp_listener.start()
+    
+    # 백그라운드 큐 깊이 / UDP 수신 지표
+    REGISTRY.register_callback(
+        "smartfarm_queue_depth", "백그라운드 기록 큐에 쌓인 항목 수",
+        lambda: {("storage",): storage.queue.qsize(), ("archive",): archive.queue.qsize()}, ("queue",)
+    )
+    REGISTRY.register_callback(
+        "smartfarm_udp_datagrams_total", "UDP로 받은 데이터그램 수",
+        lambda: {("received",): udp_listener.received, ("rejected",): udp_listener.rejected}, ("result",), "counter"
+    )
     
     # 시뮬레이터 시작 (테스트용)
     simulator = SimpleSimulator(data_store)
     simulator.start()
     
     # 웹 애플리케이션 시작
-    web_app = SimpleWebApp(data_store, port=5000)
+    if server == "asgi":
+        from asgi_app import serve
+        start_server = lambda: serve(data_store, port=5000, archive=archive)
+    else:
+        web_app = SimpleWebApp(data_store, port=5000, archive=archive)
+        start_server = web_app.start
     
     print("📊 대시보드: http://localhost:5000")
     print("📡 API: http://localhost:5000/api/data")
+    print("📺 실시간 스트림: http://localhost:5000/api/stream")
+    print("📈 히스토리: http://localhost:5000/api/history?metric=temperature")
+    print("🗄️ 장기 히스토리: http://localhost:5000/api/archive?metric=temperature")
+    print("📐 규칙: http://localhost:5000/api/rules")
+    print("📉 실시간 통계: http://localhost:5000/api/stats")
+    print("📟 지표 (Prometheus): http://localhost:5000/metrics")
     print("🔗 라즈베리파이 수신: http://localhost:5000/api/external_data")
+    print("🎛️ 액추에이터 명령: POST http://localhost:5000/api/commands")
+    print(f"📨 라즈베리파이 UDP 수신: udp://localhost:{UDP_PORT}")
     print("=" * 50)
     
     try:
-        web_app.start()
+        start_server()
     except KeyboardInterrupt:
         print("\n✅ 시스템 종료")
+    finally:
+        udp_listener.close()
+        storage.close()
+        archive.close()
+
+def create_app():
+    """멀티 프로세스 서버용 Flask 앱 팩토리 (예: gunicorn -w 4 --preload 'main:create_app()')
+    
+    워커마다 자기 SimpleDataStore를 갖지만 수집한 값은 공유 메모리 테이블에 쓰고
+    /api/data는 그 테이블에서 읽으므로 어느 워커가 응답해도 같은 최신값을 준다.
+    --preload로 마스터에서 한 번 만들면 불러온 모듈, 규칙, 대시보드 페이지를
+    워커들이 fork로 그대로 물려받는다 (로그 리스너는 워커마다 다시 시작됨).
+    """
+    from shared_state import SharedStateTable
+    setup_logging()
+    data_store = SimpleDataStore(rule_engine=RuleEngine.load(RULES_PATH), anomaly_filter=AnomalyFilter(),
+                                 command_queue=CommandQueue())
+    shared_state = SharedStateTable()  # 없으면 만들고, 있으면 붙기만 함
+    data_store.add_listener(shared_state.publish)
+    return SimpleWebApp(data_store, shared_state=shared_state).app
 
 def test_raspberry_pi():
     """라즈베리파이 센서 테스트"""
@@ -243,6 +1040,12 @@ if __name__ == "__main__":
     
     if len(sys.argv) > 1 and sys.argv[1] == "test":
         test_raspberry_pi()
+    elif len(sys.argv) > 1 and sys.argv[1] == "asgi":
+        if len(sys.argv) > 2:
+            # 예전의 "asgi <워커 수>" - 조용히 단일 프로세스로 돌리지 않고 거부한다
+            print("❌ ASGI 모드는 단일 프로세스만 지원합니다 (여러 프로세스: gunicorn 'main:create_app()')")
+            sys.exit(2)
+        main(server="asgi")
     else:
         main()
 
@@ -251,10 +1054,11 @@ if __name__ == "__main__":
 # project/
 # ├── simple_smart_farm.py    # 메인 실행 파일
 # └── templates/
-#     └── dashboard.html       # 대시보드 HTML (자동 생성)
+#     └── dashboard.html       # 대시보드 HTML (시작할 때 한 번 읽음)
 #
 # 사용 방법:
 # 1. python simple_smart_farm.py      # 전체 시스템 실행
 # 2. python simple_smart_farm.py test # 라즈베리파이 센서 테스트
+#    python simple_smart_farm.py asgi    # asyncio(uvicorn) 서버로 실행
 # 3. 브라우저에서 http://localhost:5000 접속
 # =============================================================================
\ No newline at end of file
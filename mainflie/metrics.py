@@ -0,0 +1,167 @@
+import bisect
+import threading
+
+# =============================================================================
+# Prometheus 텍스트 형식 지표 (/metrics)
+#
+#   REQUESTS = REGISTRY.counter("smartfarm_x_total", "설명", ("route",))
+#   REQUESTS.inc("/api/data")
+#   LATENCY.observe(0.012, "/api/data")
+#   REGISTRY.register_callback("smartfarm_queue_depth", "설명", lambda: q.qsize())
+#
+# 지표마다 잠금 하나로 값만 더하므로 요청 경로에서 써도 부담이 작다.
+# 값은 프로세스별이다 - 워커 여러 개로 띄우면 워커마다 따로 센다.
+# =============================================================================
+
+LATENCY_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+
+def format_labels(names, values, extra=()):
+    pairs = list(zip(names, values)) + list(extra)
+    if not pairs:
+        return ""
+    escaped = (str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n") for _, value in pairs)
+    return "{" + ",".join(f'{name}="{value}"' for (name, _), value in zip(pairs, escaped)) + "}"
+
+
+def format_value(value):
+    if value == float("inf"):
+        return "+Inf"
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class Counter:
+    """증가만 하는 값 (라벨 값 조합별)"""
+    type = "counter"
+
+    def __init__(self, name, documentation, labelnames=()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self.values = {}
+        self.lock = threading.Lock()
+
+    def inc(self, *labels, amount=1):
+        with self.lock:
+            self.values[labels] = self.values.get(labels, 0) + amount
+
+    def samples(self):
+        with self.lock:
+            items = list(self.values.items())
+        return [(self.name, labels, (), value) for labels, value in items]
+
+
+class Gauge(Counter):
+    """오르내리는 현재 값"""
+    type = "gauge"
+
+    def set(self, value, *labels):
+        with self.lock:
+            self.values[labels] = value
+
+    def dec(self, *labels, amount=1):
+        self.inc(*labels, amount=-amount)
+
+
+class Histogram:
+    """관측값 분포 (누적 버킷 + 합계 + 개수)"""
+    type = "histogram"
+
+    def __init__(self, name, documentation, labelnames=(), buckets=LATENCY_BUCKETS):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self.buckets = tuple(sorted(buckets))
+        self.values = {}  # 라벨 -> [버킷별 개수..., +Inf 개수, 합계]
+        self.lock = threading.Lock()
+
+    def observe(self, value, *labels):
+        index = bisect.bisect_left(self.buckets, value)
+        with self.lock:
+            counts = self.values.get(labels)
+            if counts is None:
+                counts = self.values[labels] = [0] * (len(self.buckets) + 1) + [0.0]
+            counts[index] += 1
+            counts[-1] += value
+
+    def samples(self):
+        with self.lock:
+            items = [(labels, list(counts)) for labels, counts in self.values.items()]
+        samples = []
+        for labels, counts in items:
+            cumulative = 0
+            for bound, count in zip(self.buckets + (float("inf"),), counts):
+                cumulative += count
+                samples.append((self.name + "_bucket", labels, (("le", format_value(bound)),), cumulative))
+            samples.append((self.name + "_sum", labels, (), counts[-1]))
+            samples.append((self.name + "_count", labels, (), cumulative))
+        return samples
+
+
+class CallbackMetric:
+    """긁어갈 때 함수를 불러 값을 얻는 지표 (큐 깊이, 저장소 크기 등)
+
+    func는 숫자 하나, 또는 {라벨 값 튜플: 숫자} dict를 돌려준다.
+    """
+
+    def __init__(self, name, documentation, func, labelnames=(), type="gauge"):
+        self.name = name
+        self.documentation = documentation
+        self.func = func
+        self.labelnames = tuple(labelnames)
+        self.type = type
+
+    def samples(self):
+        value = self.func()
+        if isinstance(value, dict):
+            return [(self.name, tuple(labels), (), item) for labels, item in value.items()]
+        return [(self.name, (), (), value)]
+
+
+class Registry:
+    """지표 모음 - 같은 이름으로 다시 만들면 기존 지표를 돌려준다"""
+
+    def __init__(self):
+        self.metrics = {}
+        self.lock = threading.Lock()
+
+    def _register(self, metric):
+        with self.lock:
+            return self.metrics.setdefault(metric.name, metric)
+
+    def counter(self, name, documentation, labelnames=()):
+        return self._register(Counter(name, documentation, labelnames))
+
+    def gauge(self, name, documentation, labelnames=()):
+        return self._register(Gauge(name, documentation, labelnames))
+
+    def histogram(self, name, documentation, labelnames=(), buckets=LATENCY_BUCKETS):
+        return self._register(Histogram(name, documentation, labelnames, buckets))
+
+    def register_callback(self, name, documentation, func, labelnames=(), type="gauge"):
+        """콜백 지표 등록 (같은 이름이면 함수를 바꿔 끼운다)"""
+        metric = CallbackMetric(name, documentation, func, labelnames, type)
+        with self.lock:
+            self.metrics[name] = metric
+        return metric
+
+    def render(self):
+        """Prometheus 텍스트 노출 형식 (version 0.0.4)"""
+        with self.lock:
+            metrics = list(self.metrics.values())
+        lines = []
+        for metric in metrics:
+            try:
+                samples = metric.samples()
+            except Exception as e:
+                lines.append(f"# {metric.name} 수집 실패: {e}")
+                continue
+            lines.append(f"# HELP {metric.name} {metric.documentation}")
+            lines.append(f"# TYPE {metric.name} {metric.type}")
+            for name, labels, extra, value in samples:
+                lines.append(f"{name}{format_labels(metric.labelnames, labels, extra)} {format_value(value)}")
+        return "\n".join(lines) + "\n"
+
+
+REGISTRY = Registry()
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
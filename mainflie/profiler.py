@@ -0,0 +1,136 @@
+import math
+import os
+import sys
+import threading
+import time
+from collections import Counter
+
+from log_setup import parse_level
+
+# =============================================================================
+# 샘플링 프로파일러 (실행 중 켜고 끔)
+#
+# 켜져 있는 동안 interval마다 모든 스레드의 호출 스택을 찍어서 센다.
+# 요청 경로에는 아무것도 끼워 넣지 않으므로 꺼져 있을 때 비용은 0이고,
+# 켜져 있을 때도 비용은 샘플링 스레드 하나뿐이다.
+#
+#   - report(): 함수별 self/total 샘플 수 상위 목록
+#   - collapsed(): "a;b;c 개수" 형식 (flamegraph.pl / speedscope에 바로 넣을 수 있음)
+# =============================================================================
+
+
+def parse_options(options):
+    """/api/profiler POST 본문 검증 → (reset, enabled, interval, log_level)
+
+    하나라도 잘못되면 아무것도 바꾸기 전에 ValueError. enabled/interval/log_level은 없으면 None.
+    """
+    if not isinstance(options, dict):
+        raise ValueError("JSON 객체여야 합니다")
+    enabled = options.get("enabled")
+    if enabled is not None and not isinstance(enabled, bool):
+        raise ValueError("enabled는 true/false여야 합니다")
+    interval = options.get("interval")
+    if interval is not None and (isinstance(interval, bool) or not isinstance(interval, (int, float))
+                                 or not math.isfinite(interval) or interval <= 0):
+        raise ValueError("interval은 0보다 큰 숫자(초)여야 합니다")
+    log_level = options.get("log_level")
+    if log_level is not None:
+        parse_level(log_level)
+    return bool(options.get("reset")), enabled, interval, log_level
+
+
+def frame_label(code):
+    return f"{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})"
+
+
+class SamplingProfiler:
+    def __init__(self, interval=0.005, max_depth=40):
+        self.interval = interval
+        self.max_depth = max_depth
+        self.stacks = Counter()
+        self.samples = 0
+        self.started_at = None
+        self.elapsed = 0.0
+        self.lock = threading.Lock()  # stacks/samples (샘플링 스레드와 공유)
+        self.control_lock = threading.Lock()  # start/stop끼리 - stop이 join하는 동안 샘플러가 self.lock을 씀
+        self.stop_event = threading.Event()
+        self.thread = None
+
+    @property
+    def running(self):
+        return self.thread is not None and self.thread.is_alive()
+
+    def start(self, interval=None):
+        with self.control_lock:
+            if interval:
+                self.interval = max(0.001, float(interval))
+            if self.running:
+                return
+            self.stop_event.clear()
+            with self.lock:
+                self.started_at = time.time()
+            self.thread = threading.Thread(target=self._run, daemon=True)
+            self.thread.start()
+
+    def stop(self):
+        with self.control_lock:
+            if not self.running:
+                return
+            self.stop_event.set()
+            self.thread.join()
+            with self.lock:
+                self.elapsed += time.time() - self.started_at
+                self.started_at = None
+
+    def reset(self):
+        with self.lock:
+            self.stacks.clear()
+            self.samples = 0
+            self.elapsed = 0.0
+            if self.started_at is not None:
+                self.started_at = time.time()
+
+    def _run(self):
+        own_id = threading.get_ident()
+        while not self.stop_event.wait(self.interval):
+            stacks = []
+            for thread_id, frame in sys._current_frames().items():
+                if thread_id == own_id:
+                    continue
+                labels = []
+                while frame is not None and len(labels) < self.max_depth:
+                    labels.append(frame_label(frame.f_code))
+                    frame = frame.f_back
+                stacks.append(";".join(reversed(labels)))
+            with self.lock:
+                self.stacks.update(stacks)
+                self.samples += 1
+
+    def report(self, limit=20):
+        """함수별 샘플 수 (self: 스택 맨 위, total: 스택 어딘가에 있음)"""
+        with self.lock:
+            stacks = list(self.stacks.items())
+            samples = self.samples
+        own = Counter()
+        total = Counter()
+        for stack, count in stacks:
+            frames = stack.split(";")
+            own[frames[-1]] += count
+            for label in set(frames):
+                total[label] += count
+        elapsed = self.elapsed + (time.time() - self.started_at if self.started_at else 0.0)
+        return {
+            "running": self.running,
+            "interval": self.interval,
+            "samples": samples,
+            "seconds": round(elapsed, 3),
+            "top_self": [{"function": label, "samples": count} for label, count in own.most_common(limit)],
+            "top_total": [{"function": label, "samples": count} for label, count in total.most_common(limit)]
+        }
+
+    def collapsed(self):
+        with self.lock:
+            return "".join(f"{stack} {count}\n" for stack, count in self.stacks.most_common())
+
+
+PROFILER = SamplingProfiler()
@@ -0,0 +1,208 @@
+import json
+import operator
+import os
+from collections import deque
+
+# =============================================================================
+# 선언형 규칙 엔진 (알림 / 액추에이터 자동 제어)
+#
+# 규칙 파일(rules.json) 예:
+#   {"rules": [
+#     {"id": "temp_high", "metric": "temperature", "type": "threshold",
+#      "op": ">", "value": 30, "hysteresis": 0.5, "alert": "온도 높음"},
+#     {"id": "temp_rising", "metric": "temperature", "type": "rate",
+#      "op": ">", "value": 0.05, "window": 60, "alert": "온도 급상승"},
+#     {"id": "humidity_low", "metric": "humidity", "type": "duration",
+#      "op": "<", "value": 45, "for": 300, "alert": "습도 낮음 지속"}
+#   ]}
+#
+# - threshold: 값이 기준을 넘으면 켜지고, hysteresis만큼 되돌아와야 꺼진다
+# - rate: window초 동안의 초당 변화율이 기준을 넘으면 켜진다
+#   (구간 길이가 min_span초(기본 window/4) 미만이면 몰려 들어온 읽기로 보고 평가하지 않음)
+# - duration: 조건이 for초 이상 계속되면 켜진다
+# - alert가 있으면 켜져 있는 동안 알림, actuator가 있으면 켜짐/꺼짐을 그대로 지시
+# - farms가 있으면 해당 농장에만 적용
+#
+# 규칙은 로드할 때 한 번 평가 함수(클로저)로 컴파일되고 지표별로 색인된다.
+# 읽기마다 그 읽기에 들어 있는 지표의 규칙만 실행한다.
+# =============================================================================
+
+OPERATORS = {">": operator.gt, ">=": operator.ge, "<": operator.lt, "<=": operator.le}
+RULE_TYPES = ("threshold", "rate", "duration")
+
+
+class Rule:
+    """컴파일된 규칙 하나 (evaluate(farm_id, ts, value) -> 켜짐 여부)"""
+
+    def __init__(self, spec, evaluate):
+        self.id = spec["id"]
+        self.metric = spec["metric"]
+        self.type = spec["type"]
+        self.spec = spec
+        self.alert = spec.get("alert")
+        self.actuator = spec.get("actuator")
+        self.farms = frozenset(spec["farms"]) if spec.get("farms") else None
+        self.evaluate = evaluate
+
+
+def compile_rule(spec):
+    """규칙 dict를 검증하고 평가 클로저로 컴파일 (농장별 상태는 클로저 안에 보관)"""
+    for key in ("id", "metric", "type", "op", "value"):
+        if key not in spec:
+            raise ValueError(f"규칙에 {key}가 없습니다: {spec}")
+    if spec["type"] not in RULE_TYPES:
+        raise ValueError(f"알 수 없는 규칙 종류: {spec['type']}")
+    if spec["op"] not in OPERATORS:
+        raise ValueError(f"알 수 없는 비교 연산자: {spec['op']}")
+
+    compare = OPERATORS[spec["op"]]
+    limit = float(spec["value"])
+
+    if spec["type"] == "threshold":
+        hysteresis = float(spec.get("hysteresis", 0))
+        # 켜진 뒤에는 기준을 hysteresis만큼 반대쪽으로 옮겨서 비교
+        release = limit - hysteresis if spec["op"] in (">", ">=") else limit + hysteresis
+        active = {}
+
+        def evaluate(farm_id, ts, value):
+            state = compare(value, release if active.get(farm_id) else limit)
+            active[farm_id] = state
+            return state
+
+    elif spec["type"] == "rate":
+        window = float(spec.get("window", 60))
+        min_span = float(spec.get("min_span", window / 4))
+        samples = {}
+
+        def evaluate(farm_id, ts, value):
+            recent = samples.get(farm_id)
+            if recent is None:
+                recent = samples[farm_id] = deque()
+            recent.append((ts, value))
+            while recent and recent[0][0] < ts - window:
+                recent.popleft()
+            first_ts, first_value = recent[0]
+            if ts - first_ts < min_span or ts <= first_ts:
+                return False
+            return compare((value - first_value) / (ts - first_ts), limit)
+
+    else:
+        hold = float(spec.get("for", 60))
+        since = {}
+
+        def evaluate(farm_id, ts, value):
+            if not compare(value, limit):
+                since.pop(farm_id, None)
+                return False
+            started = since.setdefault(farm_id, ts)
+            return ts - started >= hold
+
+    return Rule(spec, evaluate)
+
+
+class RuleEngine:
+    """컴파일된 규칙 묶음 - 저장소가 읽기마다 evaluate를 호출한다
+
+    농장별 켜진 규칙 상태를 들고 있으며, 저장소는 같은 농장의 읽기를 항상 같은
+    잠금 안에서 넘기므로 따로 잠그지 않는다.
+    """
+
+    def __init__(self, specs=()):
+        self.rules = [compile_rule(spec) for spec in specs]
+        self.by_metric = {}
+        for rule in self.rules:
+            self.by_metric.setdefault(rule.metric, []).append(rule)
+        self.active = {}  # farm_id -> {rule_id: Rule} (켜져 있는 규칙)
+
+    @classmethod
+    def load(cls, path):
+        """규칙 파일 로드 (없으면 규칙 없는 엔진)"""
+        if not os.path.exists(path):
+            print(f"⚠️ 규칙 파일이 없습니다: {path}")
+            return cls()
+        with open(path, encoding="utf-8") as f:
+            specs = json.load(f).get("rules", [])
+        engine = cls(specs)
+        print(f"📐 규칙 {len(engine.rules)}개 로드: {path}")
+        return engine
+
+    def evaluate(self, farm_id, ts, values):
+        """읽기 한 건 평가 → (현재 알림 목록, 액추에이터 지시 dict)"""
+        active = self.active.setdefault(farm_id, {})
+        actuators = {}
+        for metric, value in values.items():
+            for rule in self.by_metric.get(metric, ()):
+                if rule.farms is not None and farm_id not in rule.farms:
+                    continue
+                if rule.evaluate(farm_id, ts, value):
+                    active[rule.id] = rule
+                else:
+                    active.pop(rule.id, None)
+                if rule.actuator:
+                    # 같은 액추에이터를 지시하는 규칙이 여럿이면 하나라도 켜져 있으면 켠다
+                    actuators[rule.actuator] = actuators.get(rule.actuator, False) or rule.id in active
+        alerts = [rule.alert for rule in active.values() if rule.alert]
+        return alerts, actuators
+
+    def evaluate_history(self, history, farm_id, start_ts=None, end_ts=None):
+        """히스토리 구간 전체를 NumPy 배열로 한 번에 평가 (규칙별 켜짐 비율/전환 시각)"""
+        import numpy as np
+
+        results = []
+        for rule in self.rules:
+            if rule.farms is not None and farm_id not in rule.farms:
+                continue
+            timestamps, values = history.query(farm_id, rule.metric, start_ts, end_ts)
+            ts = np.asarray(timestamps, dtype=np.float64)
+            value = np.asarray(values, dtype=np.float64)
+            active = evaluate_array(rule.spec, ts, value)
+            changes = np.flatnonzero(np.diff(active.astype(np.int8)))
+            results.append({
+                "id": rule.id,
+                "metric": rule.metric,
+                "samples": int(len(ts)),
+                "active_ratio": float(active.mean()) if len(ts) else 0.0,
+                "active_now": bool(active[-1]) if len(ts) else False,
+                "transitions": [
+                    {"ts": float(ts[i + 1]), "active": bool(active[i + 1])} for i in changes
+                ]
+            })
+        return results
+
+
+def evaluate_array(spec, ts, value):
+    """규칙 하나를 시계열 배열 전체에 대해 벡터 연산으로 평가 → bool 배열"""
+    import numpy as np
+
+    compare = OPERATORS[spec["op"]]
+    limit = float(spec["value"])
+    n = len(ts)
+    if n == 0:
+        return np.zeros(0, dtype=bool)
+    index = np.arange(n)
+
+    if spec["type"] == "threshold":
+        hysteresis = float(spec.get("hysteresis", 0))
+        release = limit - hysteresis if spec["op"] in (">", ">=") else limit + hysteresis
+        turn_on = compare(value, limit)
+        turn_off = ~compare(value, release)
+        # 마지막으로 켜진/꺼진 위치를 앞으로 채워서 히스테리시스 상태를 재현
+        last_on = np.maximum.accumulate(np.where(turn_on, index, -1))
+        last_off = np.maximum.accumulate(np.where(turn_off, index, -1))
+        return last_on > last_off
+
+    if spec["type"] == "rate":
+        window = float(spec.get("window", 60))
+        min_span = float(spec.get("min_span", window / 4))
+        first = np.searchsorted(ts, ts - window, side="left")
+        elapsed = ts - ts[first]
+        with np.errstate(divide="ignore", invalid="ignore"):
+            rate = (value - value[first]) / elapsed
+        return (elapsed > 0) & (elapsed >= min_span) & compare(np.nan_to_num(rate), limit)
+
+    hold = float(spec.get("for", 60))
+    condition = compare(value, limit)
+    # 조건이 마지막으로 거짓이었던 위치 다음부터가 현재 연속 구간의 시작
+    last_false = np.maximum.accumulate(np.where(condition, -1, index))
+    run_start = ts[np.minimum(last_false + 1, n - 1)]
+    return condition & (ts - run_start >= hold)
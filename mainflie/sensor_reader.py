@@ -1,10 +1,37 @@
 import requests
+import threading
 import time
 import random
+import json
+import gzip
+import socket
+from urllib.parse import urlparse
+from wire_format import PACKED_TYPE, encode_readings
 
 class RaspberryPiSensor:
-    def __init__(self, server_url="http://192.168.1.100:5000"):  # PC IP 주소
+    def __init__(self, server_url="http://192.168.1.100:5000", batch_size=0, max_batch_age=60, packed=False, udp_port=None,
+                 farm_id="FARM_001", command_wait=25):  # PC IP 주소
+        self.farm_id = farm_id
         self.server_url = f"{server_url}/api/external_data"
+        self.commands_url = f"{server_url}/api/commands"
+        self.command_wait = command_wait  # 명령 롱폴링 대기 시간 (초)
+        self.actuators = {}               # 서버 명령으로 적용한 액추에이터 상태
+        self.command_epoch = None
+        self.command_seq = 0              # 마지막으로 적용한 명령 seq
+        self.command_stop = threading.Event()
+        self.command_thread = None
+        self.batch_url = f"{server_url}/api/external_data/batch"
+        self.batch_size = batch_size  # 0이면 읽기마다 바로 전송
+        self.packed = packed  # True면 JSON 대신 압축 바이너리 형식 (셀룰러 회선용)
+        # udp_port(서버 기본 5005)를 주면 HTTP 대신 UDP 데이터그램으로 보낸다 (응답 없음, 유실 허용)
+        self.udp_address = (urlparse(server_url).hostname, udp_port) if udp_port else None
+        self.udp_socket = None
+        self.max_batch_age = max_batch_age
+        self.pending = []
+        self.batch_started = 0
+        self.max_pending = 5000  # 오프라인 중 보관할 최대 읽기 수
+        self.backoff = 2
+        self.retry_at = 0
         
     def read_sensors(self):
         # 실제 GPIO 핀에서 센서 데이터 읽기
@@ -18,21 +45,164 @@ class RaspberryPiSensor:
             "source": "RaspberryPi"
         }
     
+    def queue_reading(self, data):
+        # 배치 모드: 읽기를 모아두고 크기/시간 조건이 되면 전송
+        data.setdefault("timestamp", time.time())
+        if not self.pending:
+            self.batch_started = data["timestamp"]
+        self.pending.append(data)
+        
+        if time.time() < self.retry_at:
+            return  # 서버 장애 중 - 백오프가 끝날 때까지 모아두기만 한다
+        if len(self.pending) >= self.batch_size or time.time() - self.batch_started >= self.max_batch_age:
+            self.flush_batch()
+    
+    def retry_later(self, readings):
+        # 전송 실패한 읽기를 보관하고 다음 재시도까지 백오프
+        self.pending = (readings + self.pending)[-self.max_pending:]
+        self.batch_started = self.pending[0]["timestamp"]
+        self.retry_at = time.time() + self.backoff
+        self.backoff = min(self.backoff * 2, 300)
+    
+    def flush_batch(self):
+        # 모아둔 읽기를 gzip 요청 한 번으로 전송 (NDJSON 또는 압축 바이너리)
+        if not self.pending:
+            return
+        readings, self.pending = self.pending, []
+        if self.packed:
+            body = gzip.compress(encode_readings(readings))
+            content_type = PACKED_TYPE
+        else:
+            body = gzip.compress("\n".join(json.dumps(reading) for reading in readings).encode("utf-8"))
+            content_type = "application/x-ndjson"
+        try:
+            response = requests.post(
+                self.batch_url,
+                data=body,
+                headers={"Content-Type": content_type, "Content-Encoding": "gzip"},
+                timeout=5
+            )
+            
+            if response.status_code >= 500:
+                print(f"❌ 배치 전송 실패: {response.status_code}")
+                self.retry_later(readings)
+                return
+            if response.status_code == 200:
+                print(f"✅ 배치 전송 성공: {len(readings)}건")
+            else:
+                print(f"❌ 배치 전송 실패: {response.status_code}")
+            self.backoff = 2
+                
+        except Exception as e:
+            print(f"❌ 배치 전송 오류: {e}")
+            self.retry_later(readings)
+    
     def send_data(self):
+        started = time.perf_counter()
+        data = self.read_sensors()
+        data["sensor_read_ms"] = round((time.perf_counter() - started) * 1000, 1)  # 서버 /metrics용
+        data["timestamp"] = time.time()
+        data["farm_id"] = self.farm_id
+        if self.udp_address:
+            self.send_datagram(data)
+            return
+        if self.batch_size or self.pending:
+            # 배치 모드이거나 못 보낸 읽기가 남아 있으면 순서대로 함께 보낸다
+            self.queue_reading(data)
+            return
+        
         try:
-            data = self.read_sensors()
-            response = requests.post(self.server_url, json=data, timeout=5)
+            if self.packed:
+                response = requests.post(self.server_url, data=encode_readings([data]),
+                                         headers={"Content-Type": PACKED_TYPE}, timeout=5)
+            else:
+                response = requests.post(self.server_url, json=data, timeout=5)
             
             if response.status_code == 200:
                 print(f"✅ 데이터 전송 성공: {data}")
             else:
                 print(f"❌ 전송 실패: {response.status_code}")
+                if response.status_code >= 500:
+                    self.retry_later([data])
                 
         except Exception as e:
             print(f"❌ 전송 오류: {e}")
+            self.retry_later([data])
+    
+    def send_datagram(self, data):
+        # UDP로 한 번 보내고 끝 (재시도 없음)
+        if self.udp_socket is None:
+            self.udp_socket = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+        payload = encode_readings([data]) if self.packed else json.dumps(data).encode("utf-8")
+        try:
+            self.udp_socket.sendto(payload, self.udp_address)
+            print(f"✅ UDP 전송: {data}")
+        except OSError as e:
+            print(f"❌ UDP 전송 오류: {e}")
+    
+    def apply_command(self, command):
+        # 서버 명령 적용 (실제 사용시 여기서 GPIO 릴레이/LED 제어)
+        self.actuators[command["actuator"]] = command["state"]
+        print(f"🎛️ 명령 #{command['seq']}: {command['actuator']} → {'ON' if command['state'] else 'OFF'}"
+              f" ({command.get('source')})")
+    
+    def poll_commands(self, session, stop=None):
+        # 명령 롱폴링 한 번 - seq가 마지막 적용값보다 큰 명령만 적용하고 누적 ack
+        # 서버 epoch가 바뀌면(서버 재시작) seq를 처음부터 다시 센다. ack가 실패해도 다음 요청의 after가 대신한다
+        response = session.get(self.commands_url, timeout=self.command_wait + 5, params={
+            "farm_id": self.farm_id, "after": self.command_seq,
+            "epoch": self.command_epoch or "", "wait": self.command_wait
+        })
+        response.raise_for_status()
+        body = response.json()
+        if stop is not None and stop.is_set():
+            return 0  # 기다리는 동안 멈춤 - 새로 시작한 스레드가 다시 받는다
+        if body["epoch"] != self.command_epoch:
+            self.command_epoch, self.command_seq = body["epoch"], 0
+        applied = 0
+        for command in body["commands"]:
+            if command["seq"] <= self.command_seq:
+                continue  # 이미 적용한 명령 (재전송)
+            self.apply_command(command)
+            self.command_seq = command["seq"]
+            applied += 1
+        if applied:
+            try:
+                session.post(f"{self.commands_url}/ack", timeout=5, json={
+                    "farm_id": self.farm_id, "seq": self.command_seq, "epoch": self.command_epoch
+                })
+            except requests.exceptions.RequestException as e:
+                print(f"⚠️ 명령 ack 실패 (다음 요청에서 다시 알림): {e}")
+        return applied
+    
+    def start_commands(self):
+        # 명령 수신 스레드 시작 (전송과 별도 세션, 연결 오류는 지수 백오프)
+        if self.command_thread is not None and self.command_thread.is_alive() and not self.command_stop.is_set():
+            return
+        stop = self.command_stop = threading.Event()  # 실행마다 따로 - 멈추는 중인 이전 스레드와 섞이지 않음
+        
+        def run():
+            session = requests.Session()
+            backoff = 1
+            while not stop.is_set():
+                try:
+                    self.poll_commands(session, stop)
+                    backoff = 1
+                except (requests.exceptions.RequestException, ValueError, KeyError) as e:
+                    print(f"❌ 명령 수신 실패 - {backoff}초 뒤 재접속: {e}")
+                    stop.wait(backoff)
+                    backoff = min(backoff * 2, 60)
+            session.close()
+        
+        self.command_thread = threading.Thread(target=run, daemon=True)
+        self.command_thread.start()
+    
+    def stop_commands(self):
+        self.command_stop.set()
     
     def start_sending(self):
         print(f"📡 서버로 데이터 전송 시작: {self.server_url}")
+        self.start_commands()
         while True:
             self.send_data()
             time.sleep(10)  # 10초마다 전송
@@ -0,0 +1,328 @@
+import json
+import logging
+import math
+import os
+import struct
+import tempfile
+import threading
+import time
+import zlib
+from datetime import datetime
+from multiprocessing import shared_memory
+
+from storage import ACTUATOR_KEYS
+
+logger = logging.getLogger("smartfarm.shm")
+
+# =============================================================================
+# 공유 메모리 최신값 테이블
+#
+# gunicorn/uvicorn 워커처럼 프로세스가 여러 개면 SimpleDataStore도 프로세스마다
+# 따로 생긴다. 농장별 최신값만 고정 레이아웃으로 공유 메모리에 써 두면 어느
+# 프로세스가 수집했든 모든 워커가 IPC 없이 같은 값을 읽을 수 있다.
+#
+# 레이아웃:
+#   헤더 64바이트 (매직, 최대 농장 수, 지표 수, 슬롯 크기)
+#   슬롯 x max_farms - [seq][ts][farm_id][extra 길이][지표 double x N][extra JSON]
+#
+# extra JSON에는 고정 위치가 없는 나머지 필드(alerts, anomalies, 사전에 없는 지표,
+# last_updated, source 등)를 그대로 담는다.
+#
+# 워커마다 저장소가 따로라 워커의 스냅샷은 그 워커가 받은 값만 최신이다. 그래서
+# 스냅샷 전체가 아니라 바뀐 필드만 슬롯 잠금 안에서 현재 슬롯 값에 합치고,
+# 버전은 워커별 data_version 대신 슬롯의 seq로 매긴다 (seq // 2 - 쓸 때마다 1씩 증가).
+# 어느 워커가 읽어도 같은 버전 = 같은 내용이므로 응답 캐시/ETag에 그대로 쓴다.
+#
+# 쓰기는 슬롯별 파일 잠금(fcntl.lockf 바이트 범위)으로 프로세스 간 직렬화하고,
+# 읽기는 잠금 없이 seqlock으로 찢어진 값을 걸러낸다 (seq가 홀수면 쓰는 중).
+# =============================================================================
+
+MAGIC = b"FARMSHM2"
+HEADER = struct.Struct("<8sIII")
+HEADER_SIZE = 64
+
+# 슬롯에 고정 위치를 갖는 지표 (순서가 곧 레이아웃 - 바꾸면 MAGIC도 올릴 것)
+SHARED_METRICS = (
+    "temperature", "humidity", "soil_moisture", "light_intensity",
+    "water_level", "ph", "ec", "co2", "soil_temperature",
+    "water_pump", "ventilation_fan", "led_lights", "heater", "humidifier"
+)
+FARM_ID_BYTES = 48
+EXTRA_BYTES = 1024  # 고정 위치가 없는 필드 (JSON, 넘치면 alerts부터 줄임)
+INT_METRICS_KEY = "_ints"  # extra 안에서 정수였던 지표 이름 목록 (double에서 int로 되돌림)
+ESSENTIAL_EXTRA = ("last_updated", "source")
+SLOT_OWNED = ("farm_id", "data_version")  # 슬롯이 직접 관리 - 저장소 값으로 덮어쓰지 않음
+
+SEQ = struct.Struct("<Q")
+BODY = struct.Struct(f"<d{FARM_ID_BYTES}sH6x{len(SHARED_METRICS)}d{EXTRA_BYTES}s")
+SLOT_SIZE = SEQ.size + BODY.size
+FARM_ID_OFFSET = SEQ.size + 8
+
+
+def _probe_start(farm_id, max_farms):
+    # hash()는 프로세스마다 달라지므로 고정 해시 사용
+    return zlib.crc32(farm_id.encode("utf-8")) % max_farms
+
+
+class SharedStateTable:
+    """농장별 최신값을 담는 공유 메모리 테이블
+
+    owner=True인 프로세스(보통 main)가 닫을 때 세그먼트를 지운다. 워커는 같은 이름으로
+    붙기만 하며, 세그먼트가 아직 없으면 만들되 지우지는 않는다.
+    농장 슬롯은 farm_id 해시로 찾는 열린 주소법이며 삭제는 없다.
+    """
+
+    def __init__(self, name="smart_farm_state", max_farms=1024, owner=False):
+        self.name = name
+        self.max_farms = max_farms
+        self.owner = owner
+        self.slots = {}  # farm_id -> 슬롯 번호 (프로세스 내 캐시)
+        self.thread_lock = threading.Lock()
+
+        # 먼저 시작한 프로세스가 만들고 헤더를 쓴다. 나머지는 붙기만 한다.
+        # 이전 버전이 남긴 다른 형식의 세그먼트는 지우고 새로 만든다 (워커는 지우지 않고 떠나므로).
+        for _ in range(3):
+            try:
+                self._create()
+                break
+            except FileExistsError:
+                if self._attach():
+                    break
+                logger.warning("⚠️ 공유 메모리 %s의 형식이 달라 새로 만듭니다 (이전 버전이 남긴 세그먼트)", name)
+                self.shm.close()
+                try:
+                    self.shm.unlink()
+                except FileNotFoundError:
+                    pass  # 다른 워커가 먼저 지움
+        else:
+            raise RuntimeError(f"공유 메모리 {name}을 만들 수 없습니다")
+
+        lock_path = os.path.join(tempfile.gettempdir(), f"{name}.lock")
+        self.lock_fd = os.open(lock_path, os.O_RDWR | os.O_CREAT, 0o600)
+
+    def _untrack(self):
+        """이 프로세스가 종료해도 세그먼트가 지워지지 않도록 resource_tracker에서 제외"""
+        try:
+            from multiprocessing import resource_tracker
+            resource_tracker.unregister(self.shm._name, "shared_memory")
+        except Exception:
+            pass
+
+    def _create(self):
+        self.shm = shared_memory.SharedMemory(
+            name=self.name, create=True, size=HEADER_SIZE + SLOT_SIZE * self.max_farms)
+        HEADER.pack_into(self.shm.buf, 0, MAGIC, self.max_farms, len(SHARED_METRICS), SLOT_SIZE)
+        if not self.owner:
+            self._untrack()
+
+    def _attach(self):
+        """기존 세그먼트에 붙기 → 형식이 같으면 True (다르면 False, 세그먼트는 열어 둔 채)"""
+        self.shm = shared_memory.SharedMemory(name=self.name)
+        self._untrack()
+        for _ in range(50):  # 만든 쪽이 헤더를 쓰는 중일 수 있음 (아직 0)
+            magic, max_farms, metric_count, slot_size = HEADER.unpack_from(self.shm.buf, 0)
+            if magic != bytes(len(MAGIC)):
+                break
+            time.sleep(0.01)
+        if magic != MAGIC or metric_count != len(SHARED_METRICS) or slot_size != SLOT_SIZE:
+            return False
+        self.max_farms = max_farms
+        return True
+
+    # --- 잠금 (슬롯 번호 = 잠금 파일의 바이트 위치, max_farms 위치는 슬롯 할당용) ---
+    def _lock(self, index):
+        import fcntl
+        self.thread_lock.acquire()  # 같은 프로세스의 스레드끼리는 파일 잠금이 걸리지 않음
+        fcntl.lockf(self.lock_fd, fcntl.LOCK_EX, 1, index)
+
+    def _unlock(self, index):
+        import fcntl
+        fcntl.lockf(self.lock_fd, fcntl.LOCK_UN, 1, index)
+        self.thread_lock.release()
+
+    # --- 슬롯 찾기 ---
+    def _offset(self, index):
+        return HEADER_SIZE + SLOT_SIZE * index
+
+    def _slot_farm_id(self, index):
+        offset = self._offset(index) + FARM_ID_OFFSET
+        return bytes(self.shm.buf[offset:offset + FARM_ID_BYTES]).rstrip(b"\0")
+
+    def _find(self, farm_id, allocate=False):
+        """farm_id의 슬롯 번호 (없으면 None, allocate면 새로 할당)"""
+        index = self.slots.get(farm_id)
+        if index is not None:
+            return index
+        key = farm_id.encode("utf-8")[:FARM_ID_BYTES]
+        start = _probe_start(farm_id, self.max_farms)
+        for step in range(self.max_farms):
+            index = (start + step) % self.max_farms
+            current = self._slot_farm_id(index)
+            if current == key:
+                self.slots[farm_id] = index
+                return index
+            if not current:
+                break
+        if not allocate:
+            return None
+
+        self._lock(self.max_farms)
+        try:
+            # 잠금을 기다리는 동안 다른 프로세스가 할당했을 수 있으므로 다시 탐색
+            for step in range(self.max_farms):
+                index = (start + step) % self.max_farms
+                current = self._slot_farm_id(index)
+                if current == key:
+                    break
+                if not current:
+                    offset = self._offset(index) + FARM_ID_OFFSET
+                    self.shm.buf[offset:offset + len(key)] = key
+                    break
+            else:
+                raise RuntimeError(f"공유 메모리 슬롯이 가득 찼습니다 (최대 {self.max_farms}개 농장)")
+        finally:
+            self._unlock(self.max_farms)
+        self.slots[farm_id] = index
+        return index
+
+    # --- 쓰기 ---
+    def publish(self, changes, snapshot):
+        """저장소 리스너 - 이 워커에서 바뀐 필드만 슬롯에 합침"""
+        self.merge(changes["farm_id"], changes)
+
+    def merge(self, farm_id, changes):
+        """바뀐 필드만 현재 슬롯 값에 합쳐 기록 → 새 슬롯 버전
+
+        읽기-합치기-쓰기 전체를 슬롯 잠금 안에서 하므로 다른 워커가 그사이 쓴 필드를
+        예전 값으로 되돌리지 않는다.
+        """
+        index = self._find(farm_id, allocate=True)
+        offset = self._offset(index)
+        self._lock(index)
+        try:
+            seq = SEQ.unpack_from(self.shm.buf, offset)[0]
+            state = _decode(BODY.unpack_from(self.shm.buf, offset + SEQ.size)) if seq else {}
+            state.update((key, value) for key, value in changes.items() if key not in SLOT_OWNED)
+            self._store(offset, seq, farm_id, state)
+        finally:
+            self._unlock(index)
+        return seq // 2 + 1
+
+    def write(self, state):
+        """농장 상태 전체로 슬롯을 교체 (초기값 기록용) → 새 슬롯 버전"""
+        farm_id = state["farm_id"]
+        index = self._find(farm_id, allocate=True)
+        offset = self._offset(index)
+        self._lock(index)
+        try:
+            seq = SEQ.unpack_from(self.shm.buf, offset)[0]
+            self._store(offset, seq, farm_id, state)
+        finally:
+            self._unlock(index)
+        return seq // 2 + 1
+
+    def _store(self, offset, seq, farm_id, state):
+        """슬롯 잠금 안에서 호출 - seq를 홀수로 올리고 본문을 쓴 뒤 다시 짝수로"""
+        metrics = []
+        for metric in SHARED_METRICS:
+            value = state.get(metric)
+            metrics.append(float(value) if isinstance(value, (int, float)) else math.nan)
+        extra = _encode_extra(state)
+        SEQ.pack_into(self.shm.buf, offset, seq + 1)  # 홀수: 쓰는 중
+        BODY.pack_into(self.shm.buf, offset + SEQ.size, time.time(),
+                       farm_id.encode("utf-8")[:FARM_ID_BYTES], len(extra), *metrics, extra)
+        SEQ.pack_into(self.shm.buf, offset, seq + 2)
+
+    # --- 읽기 ---
+    def read(self, farm_id):
+        """농장의 최신 상태 dict (없으면 None) - 잠금 없이 seqlock으로 일관된 값만 반환"""
+        index = self._find(farm_id)
+        if index is None:
+            return None
+        offset = self._offset(index)
+        for _ in range(1000):
+            before = SEQ.unpack_from(self.shm.buf, offset)[0]
+            if before & 1:
+                continue
+            fields = BODY.unpack_from(self.shm.buf, offset + SEQ.size)
+            if SEQ.unpack_from(self.shm.buf, offset)[0] == before:
+                break
+        else:
+            return None
+        if before == 0:
+            return None  # 할당만 되고 아직 기록 전
+
+        state = _decode(fields)
+        state["farm_id"] = farm_id
+        state["data_version"] = before // 2  # 슬롯 버전 - 모든 워커에서 같고 줄어들지 않음
+        state.setdefault("last_updated", datetime.fromtimestamp(fields[0]).isoformat())
+        state.setdefault("alerts", [])
+        return state
+
+    def farm_ids(self):
+        """기록된 적이 있는 농장 목록"""
+        farm_ids = []
+        for index in range(self.max_farms):
+            farm_id = self._slot_farm_id(index)
+            if farm_id and SEQ.unpack_from(self.shm.buf, self._offset(index))[0]:
+                farm_ids.append(farm_id.decode("utf-8", "replace"))
+        return sorted(farm_ids)
+
+    def close(self):
+        os.close(self.lock_fd)
+        self.shm.close()
+        if self.owner:
+            # fork된 워커가 같은 resource_tracker에서 등록을 지웠을 수 있으므로 다시 등록 후 삭제
+            try:
+                from multiprocessing import resource_tracker
+                resource_tracker.register(self.shm._name, "shared_memory")
+            except Exception:
+                pass
+            self.shm.unlink()
+
+
+def _decode(fields):
+    """슬롯 본문(BODY.unpack 결과) → 상태 dict (farm_id/data_version 제외)"""
+    _, _, extra_len, *metrics = fields[:-1]
+    state = json.loads(fields[-1][:extra_len].decode("utf-8")) if extra_len else {}
+    ints = set(state.pop(INT_METRICS_KEY, ()))
+    for metric, value in zip(SHARED_METRICS, metrics):
+        if not math.isnan(value):
+            if metric in ACTUATOR_KEYS:
+                value = bool(value)
+            elif metric in ints:
+                value = int(value)
+            state[metric] = value
+    return state
+
+
+def _encode_extra(state):
+    """고정 위치가 없는 필드를 EXTRA_BYTES 안에 들어가는 JSON으로
+
+    넘치면 오래된 alerts부터 버리고, 그래도 넘치면 last_updated/source만 남긴다.
+    """
+    extra = {}
+    ints = []
+    for key, value in state.items():
+        if key in SLOT_OWNED:
+            continue
+        if key in SHARED_METRICS and isinstance(value, (int, float)):
+            if isinstance(value, int) and not isinstance(value, bool):
+                ints.append(key)
+            continue  # 슬롯의 고정 위치에 들어감
+        extra[key] = value
+    if ints:
+        extra[INT_METRICS_KEY] = ints
+    alerts = list(extra.get("alerts", []))
+    while True:
+        encoded = json.dumps(extra, ensure_ascii=False, default=str).encode("utf-8")
+        if len(encoded) <= EXTRA_BYTES:
+            return encoded
+        if alerts:
+            alerts.pop(0)
+            extra["alerts"] = alerts
+        elif set(extra) - {"alerts", INT_METRICS_KEY, *ESSENTIAL_EXTRA}:
+            extra = {key: extra[key] for key in ESSENTIAL_EXTRA + (INT_METRICS_KEY,) if key in extra}
+            extra["alerts"] = []
+        else:
+            extra = {"alerts": []}
@@ -0,0 +1,180 @@
+import json
+import os
+import queue
+import threading
+import time
+
+# =============================================================================
+# 영속 저장소 (write-ahead log + 주기적 스냅샷)
+# =============================================================================
+
+# smart_farm_data.json 스키마에서 actuators로 분류되는 필드
+ACTUATOR_KEYS = ("water_pump", "ventilation_fan", "led_lights", "heater", "humidifier")
+# sensors/actuators 밖(최상위)에 두는 필드
+TOP_LEVEL_KEYS = ("farm_id", "location", "alerts", "timestamp", "last_updated", "data_version")
+
+
+def to_schema(state):
+    """평면 상태 dict → smart_farm_data.json 스키마"""
+    document = {"farm_id": state.get("farm_id"), "sensors": {}, "actuators": {}, "alerts": []}
+    for key, value in state.items():
+        if key in TOP_LEVEL_KEYS:
+            document[key] = value
+        elif key in ACTUATOR_KEYS or isinstance(value, bool):
+            document["actuators"][key] = value
+        elif isinstance(value, (int, float)):
+            document["sensors"][key] = value
+        else:
+            document[key] = value  # source, led_status 등 기타 필드
+    document.setdefault("timestamp", time.time())
+    return document
+
+
+def snapshot_filename(farm_id):
+    """farm_id를 안전한 파일 이름으로 변환"""
+    return "".join(c if c.isalnum() or c in "-_" else "_" for c in farm_id) + ".json"
+
+
+def from_schema(document):
+    """smart_farm_data.json 스키마 → 평면 상태 dict"""
+    state = {key: value for key, value in document.items() if key not in ("sensors", "actuators")}
+    state.update(document.get("sensors", {}))
+    state.update(document.get("actuators", {}))
+    state.setdefault("alerts", [])
+    state.setdefault("data_version", 0)
+    return state
+
+
+class PersistentStorage:
+    """저장소 변경을 디스크에 남기는 영속 계층
+
+    - 요청 스레드는 큐에 넣기만 한다 (fsync 대기 없음)
+    - 기록 스레드가 쌓인 레코드를 한 번에 써서 fsync 한 번으로 커밋 (group commit)
+    - 일정 간격마다 바뀐 농장만 스냅샷 파일로 압축하고 WAL을 비운다
+    - 시작 시 스냅샷을 읽고 WAL 꼬리를 재생해 복구
+    """
+
+    def __init__(self, directory="data", snapshot_interval=60, snapshot_every=5000):
+        self.directory = directory
+        self.snapshot_dir = os.path.join(directory, "snapshots")
+        self.wal_path = os.path.join(directory, "wal.ndjson")
+        self.snapshot_interval = snapshot_interval
+        self.snapshot_every = snapshot_every
+
+        self.queue = queue.Queue()
+        self.latest = {}   # 농장별로 WAL에 마지막으로 쓴 상태
+        self.dirty = set()  # 마지막 스냅샷 이후 바뀐 농장
+        self.records_since_snapshot = 0
+        self.last_snapshot = time.time()
+        self.wal = None
+        self.thread = None
+        self.running = False
+
+        os.makedirs(self.snapshot_dir, exist_ok=True)
+
+    # --- 복구 ---
+    def load(self):
+        """스냅샷 + WAL 재생으로 농장별 최신 상태 복구"""
+        states = {}
+        for name in os.listdir(self.snapshot_dir):
+            if not name.endswith(".json"):
+                continue
+            with open(os.path.join(self.snapshot_dir, name), encoding="utf-8") as f:
+                state = from_schema(json.load(f))
+            states[state["farm_id"]] = state
+
+        replayed = 0
+        if os.path.exists(self.wal_path):
+            with open(self.wal_path, encoding="utf-8") as f:
+                for line in f:
+                    try:
+                        record = json.loads(line)
+                    except ValueError:
+                        break  # 마지막 그룹 커밋 도중 잘린 줄
+                    current = states.get(record["farm_id"])
+                    if current is None or record["data_version"] > current["data_version"]:
+                        states[record["farm_id"]] = record["state"]
+                        replayed += 1
+
+        self.latest = dict(states)
+        print(f"💾 저장소 복구: 농장 {len(states)}개 (WAL 재생 {replayed}건)")
+        return states
+
+    # --- 기록 ---
+    def append(self, changes, snapshot):
+        """저장소 리스너 - 큐에 넣기만 하므로 요청 처리 지연이 없다"""
+        self.queue.put(snapshot)
+
+    def start(self):
+        self.wal = open(self.wal_path, "a", encoding="utf-8")
+        self.running = True
+        self.thread = threading.Thread(target=self._run, daemon=True)
+        self.thread.start()
+
+    def _run(self):
+        while self.running or not self.queue.empty():
+            try:
+                batch = [self.queue.get(timeout=1)]
+            except queue.Empty:
+                batch = []
+            while True:
+                try:
+                    batch.append(self.queue.get_nowait())
+                except queue.Empty:
+                    break
+            if batch:
+                self._commit(batch)
+            if self.dirty and (self.records_since_snapshot >= self.snapshot_every
+                               or time.time() - self.last_snapshot >= self.snapshot_interval):
+                self._snapshot()
+
+    def _commit(self, batch):
+        """쌓인 레코드를 한 번에 쓰고 fsync 한 번 (group commit)"""
+        lines = []
+        for state in batch:
+            farm_id = state["farm_id"]
+            current = self.latest.get(farm_id)
+            if current is not None and state["data_version"] <= current["data_version"]:
+                continue  # 리스너 호출 순서가 뒤바뀐 오래된 상태
+            self.latest[farm_id] = state
+            self.dirty.add(farm_id)
+            lines.append(json.dumps(
+                {"farm_id": farm_id, "data_version": state["data_version"], "state": state},
+                ensure_ascii=False
+            ))
+        if not lines:
+            return
+        self.wal.write("\n".join(lines) + "\n")
+        self.wal.flush()
+        os.fsync(self.wal.fileno())
+        self.records_since_snapshot += len(lines)
+
+    def _snapshot(self):
+        """바뀐 농장만 스냅샷 파일로 쓰고 WAL을 비운다"""
+        for farm_id in self.dirty:
+            path = os.path.join(self.snapshot_dir, snapshot_filename(farm_id))
+            temp_path = path + ".tmp"
+            with open(temp_path, "w", encoding="utf-8") as f:
+                json.dump(to_schema(self.latest[farm_id]), f, ensure_ascii=False, indent=2)
+                f.flush()
+                os.fsync(f.fileno())
+            os.replace(temp_path, path)
+
+        # 지금까지 WAL에 쓴 내용은 모두 스냅샷에 반영됨
+        self.wal.truncate(0)
+        self.wal.seek(0)
+        os.fsync(self.wal.fileno())
+        print(f"💾 스냅샷 저장: 농장 {len(self.dirty)}개")
+        self.dirty.clear()
+        self.records_since_snapshot = 0
+        self.last_snapshot = time.time()
+
+    def close(self):
+        """남은 레코드를 기록하고 마지막 스냅샷을 남긴 뒤 종료"""
+        self.running = False
+        if self.thread is not None:
+            self.thread.join()
+        if self.wal is not None:
+            if self.dirty:
+                self._snapshot()
+            self.wal.close()
@@ -0,0 +1,85 @@
+import json
+import queue
+import threading
+
+# =============================================================================
+# Server-Sent Events 브로커
+# =============================================================================
+
+
+class StreamSubscriber:
+    """SSE 구독자 한 명 (클라이언트별 제한 큐, topic이 None이면 전체 구독)"""
+
+    def __init__(self, max_queue, topic=None):
+        self.queue = queue.Queue(maxsize=max_queue)
+        self.topic = topic
+        self.dropped = False
+
+
+class EventBroker:
+    """데이터 변경(delta)을 구독자들에게 밀어주는 브로커
+
+    publish는 절대 블로킹하지 않는다. 큐가 가득 찬 느린 클라이언트는 끊어 버리고,
+    EventSource가 재접속하면 전체 스냅샷부터 다시 받는다.
+    """
+
+    def __init__(self, max_queue=100, keepalive=15):
+        self.max_queue = max_queue
+        self.keepalive = keepalive
+        self.subscribers = set()
+        self.lock = threading.Lock()
+        self.dropped_count = 0
+
+    def subscribe(self, topic=None):
+        subscriber = StreamSubscriber(self.max_queue, topic)
+        with self.lock:
+            self.subscribers.add(subscriber)
+        return subscriber
+
+    def unsubscribe(self, subscriber):
+        with self.lock:
+            self.subscribers.discard(subscriber)
+
+    def publish(self, event, data, event_id=None, topic=None):
+        """topic을 구독 중인 클라이언트에게 이벤트 전달 (SSE 포맷으로 한 번만 직렬화)"""
+        with self.lock:
+            subscribers = [subscriber for subscriber in self.subscribers
+                           if subscriber.topic is None or subscriber.topic == topic]
+        if not subscribers:
+            return
+        message = format_sse(event, data, event_id)
+        for subscriber in subscribers:
+            try:
+                subscriber.queue.put_nowait(message)
+            except queue.Full:
+                subscriber.dropped = True
+                self.unsubscribe(subscriber)
+                self.dropped_count += 1
+
+    def client_count(self):
+        with self.lock:
+            return len(self.subscribers)
+
+    def stream(self, subscriber, initial=None):
+        """구독자용 SSE 제너레이터 (Flask Response에 그대로 전달)"""
+        try:
+            yield "retry: 3000\n\n"
+            if initial is not None:
+                yield initial
+            while not subscriber.dropped:
+                try:
+                    yield subscriber.queue.get(timeout=self.keepalive)
+                except queue.Empty:
+                    yield ": keepalive\n\n"
+        finally:
+            self.unsubscribe(subscriber)
+
+
+def format_sse(event, data, event_id=None):
+    """SSE 메시지 문자열 생성"""
+    lines = []
+    if event_id is not None:
+        lines.append(f"id: {event_id}")
+    lines.append(f"event: {event}")
+    lines.append(f"data: {json.dumps(data, ensure_ascii=False)}")
+    return "\n".join(lines) + "\n\n"
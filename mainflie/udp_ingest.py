@@ -0,0 +1,182 @@
+import asyncio
+import json
+import logging
+import math
+import threading
+import time
+
+from wire_format import MAGIC, decode_readings
+
+logger = logging.getLogger("smartfarm.udp")
+
+# =============================================================================
+# UDP 수집 리스너 (HTTP 옆에서 함께 동작)
+#
+# 읽기마다 TCP 연결 + HTTP 요청 + Flask 라우팅을 거치는 대신, 라즈베리파이가
+# 데이터그램 하나를 보내고 끝낸다 (응답 없음, 유실 허용). 자주 보내는 텔레메트리용.
+#
+#   - 데이터그램 하나 = JSON 객체, JSON 배열, NDJSON 또는 압축 바이너리(wire_format)
+#   - 검증을 통과한 읽기만 저장소에 넣고, 잘못된 데이터그램은 세고 버린다
+#   - 같은 이벤트 루프 차례에 도착한 데이터그램은 모아서 update_batch 한 번으로 반영
+#     (HTTP 수신과 같은 저장소/히스토리 경로)
+#
+# 전용 스레드의 asyncio 루프에서 돈다. Flask/ASGI 어느 모드에서도 그대로 쓴다.
+# =============================================================================
+
+MAX_DATAGRAM = 8192          # 이보다 큰 데이터그램은 버린다
+MAX_READINGS = 500           # 데이터그램 하나에 담을 수 있는 최대 읽기 수
+MAX_CLOCK_SKEW = 300         # 현재보다 이만큼(초) 앞선 타임스탬프는 서버 시각으로 바꾼다
+
+
+def parse_datagram(data):
+    """데이터그램 → 읽기 dict 목록 (형식이 잘못되면 ValueError)"""
+    if data[:len(MAGIC)] == MAGIC:
+        return decode_readings(data)
+    text = data.decode("utf-8").strip()
+    if text.startswith("["):
+        readings = json.loads(text)
+    else:
+        readings = [json.loads(line) for line in text.splitlines() if line.strip()]
+    if not isinstance(readings, list):
+        raise ValueError("읽기 객체 또는 그 배열이어야 합니다")
+    return readings
+
+
+def validate_reading(reading, now):
+    """읽기 하나 검증 - 평면 dict이고 값이 숫자/bool/문자열/None이어야 한다"""
+    if not isinstance(reading, dict) or not reading:
+        raise ValueError("읽기 객체여야 합니다")
+    for key, value in reading.items():
+        if not isinstance(key, str):
+            raise ValueError(f"필드 이름이 문자열이 아닙니다: {key!r}")
+        if value is not None and not isinstance(value, (bool, int, float, str)):
+            raise ValueError(f"지원하지 않는 값: {key}")
+        if isinstance(value, float) and not math.isfinite(value):
+            raise ValueError(f"유한한 숫자가 아닙니다: {key}")
+
+    farm_id = reading.get("farm_id")
+    if farm_id is not None and not isinstance(farm_id, str):
+        raise ValueError("farm_id는 문자열이어야 합니다")
+    ts = reading.get("timestamp")
+    if ts is not None and (isinstance(ts, bool) or not isinstance(ts, (int, float))):
+        raise ValueError("timestamp는 숫자(epoch 초)여야 합니다")
+    if ts is None or ts > now + MAX_CLOCK_SKEW:
+        reading["timestamp"] = now
+    return reading
+
+
+class IngestProtocol(asyncio.DatagramProtocol):
+    """받은 데이터그램을 검증해 모아 두었다가 루프 차례가 끝나면 한 번에 반영"""
+
+    def __init__(self, listener):
+        self.listener = listener
+        self.pending = []
+        self.flush_scheduled = False
+
+    def datagram_received(self, data, addr):
+        listener = self.listener
+        listener.received += 1
+        if len(data) > listener.max_datagram:
+            listener.rejected += 1
+            return
+        now = time.time()
+        try:
+            readings = parse_datagram(data)
+            if len(readings) > MAX_READINGS:
+                raise ValueError(f"읽기가 너무 많습니다 ({len(readings)}건)")
+            readings = [validate_reading(reading, now) for reading in readings]
+        except (ValueError, UnicodeDecodeError) as e:
+            listener.rejected += 1
+            listener.last_error = f"{addr[0]}: {e}"
+            return
+
+        for reading in readings:
+            reading["source"] = listener.source
+        self.pending.extend(readings)
+        listener.accepted += len(readings)
+        if not self.flush_scheduled:
+            self.flush_scheduled = True
+            asyncio.get_running_loop().call_soon(self.flush)
+
+    def flush(self):
+        readings, self.pending = self.pending, []
+        self.flush_scheduled = False
+        if not readings:
+            return
+        try:
+            if len(readings) == 1:
+                self.listener.data_store.update_data(readings[0])
+            else:
+                self.listener.data_store.update_batch(readings)
+        except Exception as e:
+            logger.error("❌ UDP 데이터 반영 오류: %s", e)
+
+    def error_received(self, exc):
+        self.listener.last_error = str(exc)
+
+
+class UdpIngestListener:
+    """UDP 수집 리스너 (start()로 전용 스레드에서 시작, close()로 정지)"""
+
+    def __init__(self, data_store, host="0.0.0.0", port=5005, source="raspberry_pi_udp",
+                 max_datagram=MAX_DATAGRAM):
+        self.data_store = data_store
+        self.host = host
+        self.port = port
+        self.source = source
+        self.max_datagram = max_datagram
+
+        self.received = 0
+        self.accepted = 0
+        self.rejected = 0
+        self.last_error = None
+
+        self.loop = None
+        self.transport = None
+        self.ready = threading.Event()
+        self.thread = None
+
+    def start(self):
+        self.thread = threading.Thread(target=self._run, daemon=True)
+        self.thread.start()
+        self.ready.wait(5)
+        if self.transport is None:
+            print(f"⚠️ UDP 수신을 시작하지 못했습니다: {self.last_error}")
+            return False
+        print(f"📨 UDP 수신 시작: udp://{self.host}:{self.port}")
+        return True
+
+    def _run(self):
+        self.loop = asyncio.new_event_loop()
+        asyncio.set_event_loop(self.loop)
+        try:
+            self.transport, _ = self.loop.run_until_complete(
+                self.loop.create_datagram_endpoint(lambda: IngestProtocol(self), local_addr=(self.host, self.port))
+            )
+        except OSError as e:
+            self.last_error = str(e)
+            self.ready.set()
+            self.loop.close()
+            return
+        self.ready.set()
+        try:
+            self.loop.run_forever()
+        finally:
+            self.transport.close()
+            self.loop.run_until_complete(asyncio.sleep(0))  # 남은 flush 처리
+            self.loop.close()
+
+    def stats(self):
+        return {
+            "address": f"{self.host}:{self.port}",
+            "received": self.received,
+            "accepted": self.accepted,
+            "rejected": self.rejected,
+            "last_error": self.last_error
+        }
+
+    def close(self):
+        if self.loop is not None and self.loop.is_running():
+            self.loop.call_soon_threadsafe(self.loop.stop)
+        if self.thread is not None:
+            self.thread.join(timeout=5)
@@ -0,0 +1,189 @@
+import math
+import struct
+
+# =============================================================================
+# 압축 바이너리 전송 형식 (Content-Type: application/x-farm-packed)
+#
+# JSON은 읽기마다 "soil_moisture", "light_intensity" 같은 키 이름이 반복되어
+# 바이트 대부분이 키다. 셀룰러 회선의 라즈베리파이용으로 아래처럼 압축한다.
+#
+#   헤더:   b"FP" | 버전(u8) | 읽기 수(varint) | 기준 타임스탬프(f64)
+#   읽기:   (필드 수 << 1 | 타임스탬프 있음)(varint)
+#           [이전 읽기 대비 타임스탬프 차이(ms, zigzag varint)]
+#           필드 x N: 지표 ID(u8, 사전에 없으면 0xFF + 이름) | 값 태그(u8) | 값
+#
+# 값은 정확히 표현되는 가장 작은 형태로 보낸다 (bool은 태그만, 정수/소수 1~2자리는
+# 배율 정수 varint, 나머지는 f64, 문자열은 길이 + UTF-8).
+# 타임스탬프는 ms 단위로 반올림된다. METRIC_IDS는 뒤에 추가만 할 것 - 순서를
+# 바꾸거나 지우려면 VERSION을 올린다.
+# =============================================================================
+
+PACKED_TYPE = "application/x-farm-packed"
+MAGIC = b"FP"
+VERSION = 1
+
+METRIC_IDS = (
+    "farm_id", "temperature", "humidity", "soil_moisture", "light_intensity",
+    "water_pump", "led_lights", "led_status", "water_level", "ph", "ec", "co2",
+    "soil_temperature", "ventilation_fan", "heater", "humidifier", "source",
+    "sensor_read_ms",
+)
+METRIC_INDEX = {name: index for index, name in enumerate(METRIC_IDS)}
+INLINE_NAME = 0xFF
+
+TAG_FALSE, TAG_TRUE, TAG_NONE, TAG_INT, TAG_DECI, TAG_CENTI, TAG_FLOAT, TAG_STR = range(8)
+DOUBLE = struct.Struct("<d")
+
+
+def _write_varint(out, value):
+    while value >= 0x80:
+        out.append((value & 0x7F) | 0x80)
+        value >>= 7
+    out.append(value)
+
+
+def _write_signed(out, value):
+    _write_varint(out, value << 1 if value >= 0 else ((-value) << 1) - 1)  # zigzag
+
+
+def _read_varint(data, pos):
+    result = shift = 0
+    while True:
+        byte = data[pos]
+        pos += 1
+        result |= (byte & 0x7F) << shift
+        if byte < 0x80:
+            return result, pos
+        shift += 7
+
+
+def _read_signed(data, pos):
+    value, pos = _read_varint(data, pos)
+    return (value >> 1) ^ -(value & 1), pos
+
+
+def _write_value(out, value):
+    if value is None:
+        out.append(TAG_NONE)
+    elif isinstance(value, bool):
+        out.append(TAG_TRUE if value else TAG_FALSE)
+    elif isinstance(value, int) and -(1 << 62) < value < (1 << 62):
+        out.append(TAG_INT)
+        _write_signed(out, value)
+    elif isinstance(value, float):
+        if not math.isfinite(value):
+            raise ValueError(f"유한한 숫자가 아닙니다: {value!r}")
+        # 센서값은 대부분 소수 1~2자리 - 배율 정수로 보내고 받는 쪽에서 같은 float로 복원
+        for tag, scale in ((TAG_DECI, 10), (TAG_CENTI, 100)):
+            scaled = round(value * scale)
+            if abs(scaled) < (1 << 53) and scaled / scale == value:
+                out.append(tag)
+                _write_signed(out, scaled)
+                return
+        out.append(TAG_FLOAT)
+        out += DOUBLE.pack(value)
+    elif isinstance(value, str):
+        encoded = value.encode("utf-8")
+        out.append(TAG_STR)
+        _write_varint(out, len(encoded))
+        out += encoded
+    else:
+        raise ValueError(f"압축 형식으로 보낼 수 없는 값: {value!r}")
+
+
+def _millis(ts):
+    if not math.isfinite(ts):
+        raise ValueError(f"유한한 타임스탬프가 아닙니다: {ts!r}")
+    return round(ts * 1000)
+
+
+def encode_readings(readings):
+    """읽기 dict 목록 → 압축 바이트 (필드 값은 bool/int/float/str/None만)"""
+    out = bytearray(MAGIC)
+    out.append(VERSION)
+    _write_varint(out, len(readings))
+    stamps = [reading["timestamp"] for reading in readings if reading.get("timestamp") is not None]
+    base_ms = _millis(stamps[0]) if stamps else 0
+    out += DOUBLE.pack(base_ms / 1000)
+
+    previous_ms = base_ms
+    for reading in readings:
+        ts = reading.get("timestamp")
+        fields = [(key, value) for key, value in reading.items() if key != "timestamp"]
+        _write_varint(out, len(fields) << 1 | (ts is not None))
+        if ts is not None:
+            ts_ms = _millis(ts)
+            _write_signed(out, ts_ms - previous_ms)
+            previous_ms = ts_ms
+        for key, value in fields:
+            index = METRIC_INDEX.get(key)
+            if index is None:
+                encoded = key.encode("utf-8")
+                out.append(INLINE_NAME)
+                _write_varint(out, len(encoded))
+                out += encoded
+            else:
+                out.append(index)
+            _write_value(out, value)
+    return bytes(out)
+
+
+def decode_readings(data):
+    """압축 바이트 → 읽기 dict 목록 (형식이 잘못되면 ValueError)"""
+    data = memoryview(data)
+    if len(data) < 3 or bytes(data[:2]) != MAGIC:
+        raise ValueError("압축 형식이 아닙니다")
+    if data[2] != VERSION:
+        raise ValueError(f"지원하지 않는 압축 형식 버전: {data[2]}")
+    try:
+        count, pos = _read_varint(data, 3)
+        previous_ms = round(DOUBLE.unpack_from(data, pos)[0] * 1000)
+        pos += DOUBLE.size
+
+        readings = []
+        for _ in range(count):
+            header, pos = _read_varint(data, pos)
+            reading = {}
+            if header & 1:
+                delta, pos = _read_signed(data, pos)
+                previous_ms += delta
+                reading["timestamp"] = previous_ms / 1000
+            for _ in range(header >> 1):
+                index = data[pos]
+                pos += 1
+                if index == INLINE_NAME:
+                    length, pos = _read_varint(data, pos)
+                    key = bytes(data[pos:pos + length]).decode("utf-8")
+                    pos += length
+                elif index < len(METRIC_IDS):
+                    key = METRIC_IDS[index]
+                else:
+                    raise ValueError(f"알 수 없는 지표 ID: {index}")
+
+                tag = data[pos]
+                pos += 1
+                if tag == TAG_FALSE or tag == TAG_TRUE:
+                    value = tag == TAG_TRUE
+                elif tag == TAG_NONE:
+                    value = None
+                elif tag == TAG_INT:
+                    value, pos = _read_signed(data, pos)
+                elif tag == TAG_DECI or tag == TAG_CENTI:
+                    scaled, pos = _read_signed(data, pos)
+                    value = scaled / (10 if tag == TAG_DECI else 100)
+                elif tag == TAG_FLOAT:
+                    value = DOUBLE.unpack_from(data, pos)[0]
+                    pos += DOUBLE.size
+                elif tag == TAG_STR:
+                    length, pos = _read_varint(data, pos)
+                    value = bytes(data[pos:pos + length]).decode("utf-8")
+                    pos += length
+                else:
+                    raise ValueError(f"알 수 없는 값 태그: {tag}")
+                reading[key] = value
+            readings.append(reading)
+    except (IndexError, struct.error) as e:
+        raise ValueError(f"잘린 압축 데이터: {e}")
+    if pos != len(data):
+        raise ValueError("압축 데이터 뒤에 남는 바이트가 있습니다")
+    return readings
@@ -5,6 +5,17 @@ import board
 import neopixel
 import random
 import requests  # 추가
+import json
+import os
+import gzip
+import queue
+import sys
+import threading
+from spool import DiskSpool
+
+# 전송 형식은 서버(mainflie)와 같은 구현을 쓴다 - 라즈베리파이에도 mainflie 폴더를 같이 둘 것
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "mainflie"))
+from wire_format import PACKED_TYPE, encode_readings
 
 # --- 핀 설정 ---
 SOIL_SENSOR_PIN = 17       # 토양 수분 센서 (DO)
@@ -16,6 +27,35 @@ LED_COUNT = 8              # 연결된 LED 개수로 수정
 # --- 서버 설정 (추가) ---
 SERVER_URL = "http://"  # PC IP 주소로 변경
 
+# --- 주기 설정 ---
+SAMPLE_INTERVAL = 2        # 샘플링 주기 (초) - 네트워크 지연과 상관없이 유지
+PUMP_PULSE_SECONDS = 5     # 토양이 건조할 때 펌프를 켜 두는 시간
+SEND_QUEUE_SIZE = 100      # 전송 대기 큐 크기
+
+# --- 전송 스레드용 큐와 keep-alive 세션 ---
+send_queue = queue.Queue(maxsize=SEND_QUEUE_SIZE)
+session = requests.Session()
+stop_event = threading.Event()
+
+# --- 배치 전송 설정 ---
+BATCH_SIZE = 1             # 2 이상이면 읽기를 모아서 한 번에 전송
+BATCH_MAX_AGE = 30         # 이 시간(초)이 지나면 개수와 상관없이 전송
+PACKED_ENCODING = False    # True면 JSON 대신 압축 바이너리 형식으로 전송 (셀룰러 회선용)
+pending_readings = []
+
+# --- 액추에이터 명령 설정 (서버 → 라즈베리파이 롱폴링) ---
+FARM_ID = "FARM_001"
+COMMAND_WAIT = 25               # 롱폴링 대기 시간 (초) - 명령이 오면 바로 응답이 옴
+COMMAND_STATE_FILE = "command_state.json"  # 마지막으로 적용한 명령 seq (재시작해도 중복 적용 안 함)
+PUMP_COMMAND_MAX_SECONDS = 300  # 원격으로 켠 펌프도 이 시간이 지나면 자동으로 끔 (안전장치)
+MANUAL_OVERRIDE_SECONDS = 600   # 펌프 명령 뒤 이 시간 동안은 토양 센서로 자동 급수하지 않음
+led_enabled = True
+pump_override_until = 0
+
+# --- 오프라인 스풀 설정 ---
+SPOOL_DIR = "spool"        # 전송 실패한 읽기를 보관할 폴더
+spool = DiskSpool(SPOOL_DIR)
+
 # --- GPIO 초기화 ---
 GPIO.setmode(GPIO.BCM)
 GPIO.setup(SOIL_SENSOR_PIN, GPIO.IN)
@@ -37,48 +77,268 @@ def set_random_led():
     for i in range(LED_COUNT):
         pixels[i] = random.choice(color_list)
 
-# --- 서버로 데이터 전송 (추가) ---
-def send_to_server(temperature, humidity, soil_dry):
-    data = {
-        "temperature": temperature,
-        "humidity": humidity,
-        "soil_moisture": 0 if soil_dry else 1,  # 0: 건조, 1: 촉촉
-        "water_pump": not GPIO.input(RELAY_PIN),  # 펌프 상태
-        "led_status": "on"
-    }
+# --- 펌프 제어 (타이머로 끄기 때문에 샘플링 루프를 막지 않음) ---
+pump_lock = threading.Lock()
+pump_timer = None
+
+def pump_off():
+    GPIO.output(RELAY_PIN, GPIO.HIGH)
+
+def pulse_pump():
+    global pump_timer
+    with pump_lock:
+        if pump_timer is not None and pump_timer.is_alive():
+            return  # 이미 작동 중
+        GPIO.output(RELAY_PIN, GPIO.LOW)
+        pump_timer = threading.Timer(PUMP_PULSE_SECONDS, pump_off)
+        pump_timer.daemon = True
+        pump_timer.start()
+
+def set_pump(on):
+    """원격 명령으로 펌프 켜기/끄기 - 켤 때도 최대 시간 뒤에는 자동으로 끔"""
+    global pump_timer
+    with pump_lock:
+        if pump_timer is not None:
+            pump_timer.cancel()
+            pump_timer = None
+        if on:
+            GPIO.output(RELAY_PIN, GPIO.LOW)
+            pump_timer = threading.Timer(PUMP_COMMAND_MAX_SECONDS, pump_off)
+            pump_timer.daemon = True
+            pump_timer.start()
+        else:
+            pump_off()
+
+# --- 서버 명령 적용 ---
+def apply_command(command):
+    global led_enabled, pump_override_until
+    actuator, state = command["actuator"], command["state"]
+    print(f"명령 수신 #{command['seq']}: {actuator} → {'켜기' if state else '끄기'} ({command.get('source')})")
+    if actuator == "water_pump":
+        pump_override_until = time.monotonic() + MANUAL_OVERRIDE_SECONDS
+        set_pump(state)
+    elif actuator == "led_lights":
+        led_enabled = state
+        if state:
+            set_random_led()
+        else:
+            pixels.fill((0, 0, 0))
+    else:
+        print(f"이 장치에는 {actuator}가 연결되어 있지 않습니다.")
+
+def parse_commands(body):
+    """롱폴링 응답 → (epoch, seq 순 명령 목록) - 형식이 틀리면 ValueError/KeyError/TypeError"""
+    commands = body["commands"]
+    for command in commands:
+        if not isinstance(command, dict) or not {"seq", "actuator", "state"} <= command.keys():
+            raise ValueError(f"명령 형식이 아닙니다: {command}")
+    return body["epoch"], sorted(commands, key=lambda command: command["seq"])
+
+def load_command_state():
+    try:
+        with open(COMMAND_STATE_FILE, "r") as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {"epoch": None, "seq": 0}
+
+def save_command_state(state):
+    # 임시 파일에 쓰고 바꿔치기 - 쓰는 도중 전원이 나가도 이전 상태가 남는다
+    tmp_path = COMMAND_STATE_FILE + ".tmp"
+    with open(tmp_path, "w") as f:
+        json.dump(state, f)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp_path, COMMAND_STATE_FILE)
+
+# --- 서버로 데이터 전송 (전송 스레드에서만 호출) ---
+def send_to_server(data):
+    if spool.has_pending():
+        # 오프라인 중 - 순서를 지키기 위해 스풀 뒤에 붙이고, 백오프 시간이 되었으면 재전송
+        spool.append(data)
+        spool.replay(post_batch)
+        return
+    if BATCH_SIZE > 1:
+        pending_readings.append(data)
+        age = time.time() - pending_readings[0]["timestamp"]
+        if len(pending_readings) >= BATCH_SIZE or age >= BATCH_MAX_AGE:
+            flush_to_server()
+        return
     try:
-        requests.post(f"{SERVER_URL}/api/sensor_data", json=data, timeout=3)
+        if PACKED_ENCODING:
+            response = session.post(f"{SERVER_URL}/api/sensor_data", data=encode_readings([data]),
+                                    headers={"Content-Type": PACKED_TYPE}, timeout=3)
+        else:
+            response = session.post(f"{SERVER_URL}/api/sensor_data", json=data, timeout=3)
+        if response.status_code >= 500:
+            raise requests.exceptions.HTTPError(f"서버 오류 {response.status_code}")
         print(f"서버 전송 완료")
-    except:
-        print("서버 전송 실패")
+    except requests.exceptions.RequestException as e:
+        print(f"서버 전송 실패 - 스풀에 저장: {e}")
+        spool.append(data)
 
-try:
+# --- 여러 읽기를 한 번에 전송 (gzip NDJSON 또는 gzip 압축 바이너리) ---
+def post_batch(readings):
+    if PACKED_ENCODING:
+        body = gzip.compress(encode_readings(readings))
+        content_type = PACKED_TYPE
+    else:
+        body = gzip.compress("\n".join(json.dumps(reading) for reading in readings).encode("utf-8"))
+        content_type = "application/x-ndjson"
+    response = session.post(
+        f"{SERVER_URL}/api/sensor_data/batch",
+        data=body,
+        headers={"Content-Type": content_type, "Content-Encoding": "gzip"},
+        timeout=3
+    )
+    if response.status_code >= 500:
+        return False  # 나중에 다시 시도
+    if response.status_code != 200:
+        print(f"서버가 데이터를 거부했습니다: {response.status_code}")
+    return True
+
+# --- 모아둔 데이터 일괄 전송 ---
+def flush_to_server():
+    readings = pending_readings[:]
+    pending_readings.clear()
+    try:
+        sent = post_batch(readings)
+    except requests.exceptions.RequestException as e:
+        print(f"서버 배치 전송 오류: {e}")
+        sent = False
+    if sent:
+        print(f"서버 배치 전송 완료: {len(readings)}건")
+    else:
+        print(f"서버 배치 전송 실패 - 스풀에 저장: {len(readings)}건")
+        for reading in readings:
+            spool.append(reading)
+
+# --- 전송 대기열에 넣기 (가득 차면 가장 오래된 읽기를 버림) ---
+def enqueue_reading(data):
     while True:
+        try:
+            send_queue.put_nowait(data)
+            return
+        except queue.Full:
+            try:
+                send_queue.get_nowait()
+                print("전송 대기열이 가득 차 가장 오래된 읽기를 버립니다.")
+            except queue.Empty:
+                pass
+
+# --- 샘플링 스레드: 고정 주기로 센서를 읽고 타임스탬프를 찍는다 ---
+def sampling_loop():
+    next_tick = time.monotonic()
+    while not stop_event.is_set():
+        sampled_at = time.time()
+
         # 토양 수분 감지
         soil_dry = GPIO.input(SOIL_SENSOR_PIN) == 0
-        if soil_dry:
+        if soil_dry and time.monotonic() < pump_override_until:
+            print("토양이 건조하지만 원격 펌프 명령이 우선합니다.")
+        elif soil_dry:
             print("토양이 건조합니다. 펌프 작동 중...")
-            GPIO.output(RELAY_PIN, GPIO.LOW)
-            time.sleep(5)
-            GPIO.output(RELAY_PIN, GPIO.HIGH)
+            pulse_pump()
         else:
             print("토양이 촉촉합니다. 펌프 정지 중...")
 
-        # 온습도 출력
-        humidity, temperature = Adafruit_DHT.read_retry(Adafruit_DHT.DHT11, DHT_PIN)
+        # 온습도 출력 (재시도 횟수를 줄여 샘플링 주기를 넘기지 않게 함)
+        read_started = time.monotonic()
+        humidity, temperature = Adafruit_DHT.read_retry(Adafruit_DHT.DHT11, DHT_PIN, retries=3, delay_seconds=0.5)
+        read_ms = round((time.monotonic() - read_started) * 1000, 1)
         if humidity is not None and temperature is not None:
             print(f"현재 온도: {temperature:.1f}°C / 습도: {humidity:.1f}%")
-            
-            # 서버로 데이터 전송 (추가)
-            send_to_server(temperature, humidity, soil_dry)
+            enqueue_reading({
+                "temperature": temperature,
+                "humidity": humidity,
+                "soil_moisture": 0 if soil_dry else 1,  # 0: 건조, 1: 촉촉
+                "water_pump": not GPIO.input(RELAY_PIN),  # 펌프 상태
+                "led_status": "on" if led_enabled else "off",
+                "sensor_read_ms": read_ms,  # DHT 읽기에 걸린 시간 (재시도 포함)
+                "timestamp": sampled_at
+            })
         else:
             print("온습도 센서 값을 읽을 수 없습니다.")
 
-        # LED 랜덤 색상 설정
-        set_random_led()
+        # LED 랜덤 색상 설정 (원격으로 끈 경우 제외)
+        if led_enabled:
+            set_random_led()
+
+        # 다음 주기까지 대기 (밀린 주기는 건너뛰어 따라잡지 않음)
+        next_tick += SAMPLE_INTERVAL
+        now = time.monotonic()
+        if next_tick < now:
+            next_tick = now
+        stop_event.wait(next_tick - now)
+
+# --- 전송 스레드: 대기열의 읽기를 서버로 보낸다 ---
+def sender_loop():
+    while not (stop_event.is_set() and send_queue.empty()):
+        try:
+            data = send_queue.get(timeout=1)
+        except queue.Empty:
+            if spool.has_pending():
+                spool.replay(post_batch)
+            continue
+        send_to_server(data)
 
-        time.sleep(2)
+# --- 명령 스레드: 서버에 롱폴링 연결을 열어 두고 명령을 바로 적용한다 ---
+def command_loop():
+    command_session = requests.Session()  # 전송 스레드와 연결을 나눠 쓰지 않음
+    state = load_command_state()
+    backoff = 1
+    while not stop_event.is_set():
+        try:
+            response = command_session.get(
+                f"{SERVER_URL}/api/commands",
+                params={"farm_id": FARM_ID, "after": state["seq"], "epoch": state["epoch"] or "",
+                        "wait": COMMAND_WAIT},
+                timeout=COMMAND_WAIT + 5
+            )
+            response.raise_for_status()
+            epoch, commands = parse_commands(response.json())
+        except (requests.exceptions.RequestException, ValueError, KeyError, TypeError) as e:
+            # 응답 형식이 틀려도 스레드가 죽지 않고 같은 백오프로 다시 받는다
+            print(f"명령 수신 실패 - {backoff}초 뒤 재접속: {e}")
+            stop_event.wait(backoff)
+            backoff = min(backoff * 2, 60)
+            continue
+        backoff = 1
+
+        if epoch != state["epoch"]:
+            state = {"epoch": epoch, "seq": 0}  # 서버가 재시작됨 - seq가 처음부터 다시 시작
+        applied = False
+        for command in commands:
+            if command["seq"] <= state["seq"]:
+                continue  # 이미 적용한 명령 (재전송)
+            apply_command(command)
+            state["seq"] = command["seq"]
+            applied = True
+        if applied:
+            save_command_state(state)
+            try:
+                command_session.post(f"{SERVER_URL}/api/commands/ack",
+                                     json={"farm_id": FARM_ID, "seq": state["seq"], "epoch": state["epoch"]},
+                                     timeout=3)
+            except requests.exceptions.RequestException:
+                pass  # 다음 롱폴링의 after가 ack를 대신한다
+
+sampler = threading.Thread(target=sampling_loop, daemon=True)
+sender = threading.Thread(target=sender_loop, daemon=True)
+commander = threading.Thread(target=command_loop, daemon=True)
+sampler.start()
+sender.start()
+commander.start()
+
+try:
+    while sampler.is_alive():
+        sampler.join(1)
 
 except KeyboardInterrupt:
     print("종료합니다.")
+    stop_event.set()
+    sampler.join()
+    sender.join(10)
+    if pending_readings:
+        flush_to_server()
+    spool.close()
     GPIO.cleanup()
\ No newline at end of file
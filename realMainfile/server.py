@@ -1,8 +1,32 @@
-from flask import Flask, jsonify, request, render_template
+from flask import Flask, Response, g, jsonify, request
+import json
+import gzip
+import hashlib
+import logging
 import os
+import queue
+import sys
+import threading
+import time
 from datetime import datetime
 
+# 명령 큐/전송 형식/지표/로깅은 서버(mainflie)와 같은 구현을 복사하지 않고 mainflie 폴더에서 가져온다
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "mainflie"))
+from commands import CommandQueue
+from log_setup import setup_logging
+from metrics import REGISTRY, CONTENT_TYPE as METRICS_CONTENT_TYPE
+from wire_format import PACKED_TYPE, decode_readings
+
 app = Flask(__name__)
+logger = logging.getLogger("smartfarm.pi_server")
+
+# --- 지표 (/metrics) ---
+READ_DURATION_FIELD = "sensor_read_ms"  # sensor.py가 읽기에 실어 보내는 센서 읽기 시간 - 상태에는 넣지 않음
+READINGS_TOTAL = REGISTRY.counter("smartfarm_ingest_readings_total", "반영한 읽기 수", ("source",))
+SENSOR_READ_SECONDS = REGISTRY.histogram("smartfarm_sensor_read_seconds", "라즈베리파이 센서 읽기 시간",
+                                         buckets=(0.01, 0.05, 0.1, 0.25, 0.5, 1.0, 2.0, 3.0, 5.0, 10.0))
+HTTP_REQUEST_SECONDS = REGISTRY.histogram("smartfarm_http_request_seconds", "라우트별 응답 시간",
+                                          ("method", "route", "status"))
 
 # 센서 데이터 저장
 sensor_data = {
@@ -11,15 +35,20 @@ sensor_data = {
     "soil_moisture": 1,
     "water_pump": False,
     "led_status": "off",
-    "last_updated": "대기 중"
+    "last_updated": "대기 중",
+    "data_version": 0
 }
 
-# 템플릿 폴더 생성
-if not os.path.exists('templates'):
-    os.makedirs('templates')
+# sensor_data는 통째로 교체만 한다 (copy-on-write) - 읽는 쪽은 잠금 없이 참조를 가져감
+data_lock = threading.Lock()
+
+# SSE 구독자 (클라이언트별 제한 큐)
+STREAM_QUEUE_SIZE = 50
+stream_clients = set()
+stream_lock = threading.Lock()
 
-# 웹페이지 HTML 생성
-html_content = '''<!DOCTYPE html>
+# 대시보드 HTML - 디스크에 쓰지 않고 메모리에서 바로 응답 (템플릿 변수 없음)
+INDEX_HTML = '''<!DOCTYPE html>
 <html>
 <head>
     <title>스마트팜 모니터링</title>
@@ -73,51 +102,294 @@ html_content = '''<!DOCTYPE html>
     </div>
 
     <script>
+        let state = {};
+        
+        function render(data) {
+            document.getElementById('temperature').textContent = data.temperature || '--';
+            document.getElementById('humidity').textContent = data.humidity || '--';
+            document.getElementById('soil').textContent = data.soil_moisture ? '촉촉' : '건조';
+            document.getElementById('pump').textContent = data.water_pump ? 'ON' : 'OFF';
+            document.getElementById('led').textContent = data.led_status;
+            document.getElementById('last-updated').textContent = data.last_updated;
+        }
+        
         function updateData() {
             fetch('/api/data')
                 .then(response => response.json())
-                .then(data => {
-                    document.getElementById('temperature').textContent = data.temperature || '--';
-                    document.getElementById('humidity').textContent = data.humidity || '--';
-                    document.getElementById('soil').textContent = data.soil_moisture ? '촉촉' : '건조';
-                    document.getElementById('pump').textContent = data.water_pump ? 'ON' : 'OFF';
-                    document.getElementById('led').textContent = data.led_status;
-                    document.getElementById('last-updated').textContent = data.last_updated;
-                });
+                .then(data => render(data));
+        }
+        
+        function startStream() {
+            // 서버가 변경분만 푸시
+            const source = new EventSource('/api/stream');
+            source.addEventListener('snapshot', event => {
+                state = JSON.parse(event.data);
+                render(state);
+            });
+            source.addEventListener('delta', event => {
+                const changes = JSON.parse(event.data);
+                if (changes.data_version <= state.data_version) return;
+                if (changes.data_version > state.data_version + 1) {
+                    // 중간 변경분을 놓침 - 다시 접속해서 전체 스냅샷부터 받는다
+                    source.close();
+                    startStream();
+                    return;
+                }
+                Object.assign(state, changes);
+                render(state);
+            });
         }
         
-        updateData();
-        setInterval(updateData, 2000);  // 2초마다 업데이트
+        if (window.EventSource) {
+            startStream();
+        } else {
+            updateData();
+            setInterval(updateData, 2000);  // 2초마다 업데이트
+        }
     </script>
 </body>
 </html>'''
 
-with open('templates/index.html', 'w', encoding='utf-8') as f:
-    f.write(html_content)
+def sse_message(event, data):
+    return f"id: {data['data_version']}\nevent: {event}\ndata: {json.dumps(data, ensure_ascii=False)}\n\n"
+
+def publish_changes(changes):
+    """변경분을 SSE 구독자에게 전달 (느린 클라이언트는 끊음)"""
+    message = sse_message("delta", changes)
+    with stream_lock:
+        clients = list(stream_clients)
+    for client in clients:
+        try:
+            client.put_nowait(message)
+        except queue.Full:
+            with stream_lock:
+                stream_clients.discard(client)
+
+# 대시보드 응답 캐시 - 본문/gzip/ETag를 한 번만 만든다
+index_page = None
+
+def build_index_page():
+    global index_page
+    if index_page is None:
+        body = INDEX_HTML.encode('utf-8')
+        index_page = {
+            "body": body,
+            "gzip": gzip.compress(body, compresslevel=9),
+            "etag": hashlib.blake2b(body, digest_size=8).hexdigest()
+        }
+    return index_page
 
 @app.route('/')
 def home():
-    return render_template('index.html')
+    page = build_index_page()
+    use_gzip = 'gzip' in request.headers.get('Accept-Encoding', '')
+    etag = page["etag"] + ('-gz' if use_gzip else '')
+    headers = {"ETag": f'"{etag}"', "Vary": "Accept-Encoding", "Cache-Control": "no-cache"}
+    if request.if_none_match.contains(etag):
+        return Response(status=304, headers=headers)
+    if use_gzip:
+        headers["Content-Encoding"] = "gzip"
+        return Response(page["gzip"], mimetype='text/html', headers=headers)
+    return Response(page["body"], mimetype='text/html', headers=headers)
+
+# /api/data 응답 캐시 - data_version이 바뀔 때만 다시 직렬화
+response_cache = {"version": None}
+
+def cached_response():
+    global response_cache
+    snapshot = sensor_data
+    cache = response_cache
+    if cache["version"] != snapshot["data_version"]:
+        body = json.dumps(snapshot, ensure_ascii=False).encode('utf-8')
+        cache = {
+            "version": snapshot["data_version"],
+            "body": body,
+            "gzip": gzip.compress(body, compresslevel=5),
+            "etag": hashlib.blake2b(body, digest_size=8).hexdigest()
+        }
+        response_cache = cache
+    return cache
+
+@app.before_request
+def start_timer():
+    g.started = time.perf_counter()
+
+@app.after_request
+def observe_latency(response):
+    """라우트별 응답 시간 기록 (SSE는 스트림 시작까지)"""
+    started = g.pop('started', None)
+    if started is not None:
+        route = request.url_rule.rule if request.url_rule else "unmatched"
+        HTTP_REQUEST_SECONDS.observe(time.perf_counter() - started, request.method, route, str(response.status_code))
+    return response
+
+@app.route('/metrics')
+def metrics():
+    """Prometheus 지표"""
+    return Response(REGISTRY.render(), mimetype=METRICS_CONTENT_TYPE)
 
 @app.route('/api/data')
 def get_data():
-    return jsonify(sensor_data)
+    cache = cached_response()
+    use_gzip = 'gzip' in request.headers.get('Accept-Encoding', '')
+    etag = cache["etag"] + ('-gz' if use_gzip else '')
+    headers = {"ETag": f'"{etag}"', "Vary": "Accept-Encoding", "Cache-Control": "no-cache"}
+    if request.if_none_match.contains(etag):
+        return Response(status=304, headers=headers)
+    if use_gzip:
+        headers["Content-Encoding"] = "gzip"
+        return Response(cache["gzip"], mimetype='application/json', headers=headers)
+    return Response(cache["body"], mimetype='application/json', headers=headers)
+
+def apply_readings(readings):
+    """읽기 목록을 타임스탬프 순으로 한 번에 반영하고 변경분을 푸시"""
+    merged = {}
+    for reading in sorted(readings, key=lambda reading: reading.get('timestamp', 0)):
+        READINGS_TOTAL.inc(str(reading.get('source', 'raspberry_pi')))
+        if READ_DURATION_FIELD in reading:
+            # 센서 값이 아니라 측정 정보 - 지표로만 남긴다
+            reading = dict(reading)
+            read_ms = reading.pop(READ_DURATION_FIELD)
+            if isinstance(read_ms, (int, float)) and not isinstance(read_ms, bool):
+                SENSOR_READ_SECONDS.observe(read_ms / 1000)
+        merged.update(reading)
+    
+    global sensor_data
+    with data_lock:
+        changes = {key: value for key, value in merged.items() if sensor_data.get(key) != value}
+        snapshot = dict(sensor_data)
+        snapshot.update(merged)
+        snapshot['last_updated'] = datetime.now().strftime('%H:%M:%S')
+        snapshot['data_version'] = sensor_data['data_version'] + 1
+        changes['last_updated'] = snapshot['last_updated']
+        changes['data_version'] = snapshot['data_version']
+        sensor_data = snapshot
+        publish_changes(changes)  # 잠금 안에서 큐에 넣어야 버전 순서대로 나간다
 
 @app.route('/api/sensor_data', methods=['POST'])
 def receive_sensor_data():
-    global sensor_data
-    data = request.get_json()
-    
-    sensor_data.update(data)
-    sensor_data['last_updated'] = datetime.now().strftime('%H:%M:%S')
+    if request.mimetype == PACKED_TYPE:
+        # 압축 바이너리 형식 - 단건도 읽기 목록으로 온다
+        try:
+            readings = decode_readings(request.get_data())
+        except ValueError as e:
+            return jsonify({"status": "error", "message": str(e)}), 400
+    else:
+        readings = [request.get_json()]
+    apply_readings(readings)
     
-    print(f"센서 데이터 수신: {data}")
+    logger.debug("센서 데이터 수신: %s", readings[-1] if readings else None)
     return jsonify({"status": "success"})
 
+@app.route('/api/sensor_data/batch', methods=['POST'])
+def receive_sensor_batch():
+    """센서 데이터 일괄 수신 (NDJSON, JSON 배열 또는 압축 바이너리, gzip 압축 가능)"""
+    try:
+        body = request.get_data()
+        if request.headers.get('Content-Encoding') == 'gzip':
+            body = gzip.decompress(body)
+        if request.mimetype == PACKED_TYPE:
+            readings = decode_readings(body)
+        elif request.mimetype in ('application/x-ndjson', 'application/ndjson'):
+            text = body.decode('utf-8')
+            readings = [json.loads(line) for line in text.splitlines() if line.strip()]
+        else:
+            readings = json.loads(body.decode('utf-8'))
+        if not isinstance(readings, list) or not all(isinstance(reading, dict) for reading in readings):
+            raise ValueError("읽기 객체의 배열이어야 합니다")
+    except Exception as e:
+        logger.warning("❌ 배치 수신 오류: %s", e)
+        return jsonify({"status": "error", "message": str(e)}), 400
+    
+    if readings:
+        apply_readings(readings)
+    logger.debug("센서 데이터 배치 수신: %d건", len(readings))
+    return jsonify({"status": "success", "count": len(readings)})
+
+@app.route('/api/stream')
+def stream():
+    """SSE 스트림 - 접속 시 전체 스냅샷, 이후 변경분만 전송"""
+    client = queue.Queue(maxsize=STREAM_QUEUE_SIZE)
+    with stream_lock:
+        stream_clients.add(client)
+    initial = sse_message("snapshot", sensor_data)
+    
+    def generate():
+        try:
+            yield "retry: 3000\n\n" + initial
+            while client in stream_clients:
+                try:
+                    yield client.get(timeout=15)
+                except queue.Empty:
+                    yield ": keepalive\n\n"
+        finally:
+            with stream_lock:
+                stream_clients.discard(client)
+    
+    return Response(generate(), mimetype='text/event-stream',
+                    headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"})
+
+# 액추에이터 명령 채널 - 라즈베리파이(sensor.py)가 롱폴링으로 받아감
+command_queue = CommandQueue()
+
+def stream_client_count():
+    with stream_lock:
+        return len(stream_clients)
+
+REGISTRY.register_callback("smartfarm_stream_clients", "SSE 구독자 수", stream_client_count)
+
+@app.route('/api/commands', methods=['POST'])
+def send_command():
+    """액추에이터 명령 보내기 {"farm_id", "actuator", "state"}"""
+    data = request.get_json(silent=True) or {}
+    try:
+        command = command_queue.enqueue(str(data.get('farm_id', 'FARM_001')), data.get('actuator'),
+                                        data.get('state'))
+    except ValueError as e:
+        return jsonify({"status": "error", "message": str(e)}), 400
+    logger.info("🎛️ 명령 전송: %s", command)
+    return jsonify({"status": "success", "command": command})
+
+@app.route('/api/commands')
+def poll_commands():
+    """명령 롱폴링 (?farm_id=&after=마지막 적용 seq&epoch=&wait=초)"""
+    wait = min(30.0, max(0.0, request.args.get('wait', 25, type=float)))
+    epoch, pending = command_queue.wait(request.args.get('farm_id', 'FARM_001'),
+                                        request.args.get('after', 0, type=int),
+                                        request.args.get('epoch'), wait)
+    return jsonify({"epoch": epoch, "commands": pending})
+
+@app.route('/api/commands/ack', methods=['POST'])
+def ack_commands():
+    """명령 적용 완료 알림 {"farm_id", "seq", "epoch"}"""
+    data = request.get_json(silent=True) or {}
+    try:
+        remaining = command_queue.ack(str(data.get('farm_id', 'FARM_001')), int(data.get('seq', 0)),
+                                      data.get('epoch'))
+    except (TypeError, ValueError) as e:
+        return jsonify({"status": "error", "message": str(e)}), 409
+    return jsonify({"status": "success", "pending": remaining})
+
+@app.route('/api/commands/status')
+def command_status():
+    return jsonify(command_queue.status(request.args.get('farm_id', 'FARM_001')))
+
+
+def create_app():
+    """앱 팩토리 (예: gunicorn --preload 'server:create_app()')
+    
+    응답 캐시를 미리 만들어 두므로 fork된 워커는 첫 요청부터 바로 응답한다.
+    센서 데이터/명령 큐는 프로세스마다 따로이므로 워커는 1개로 띄운다.
+    로그는 큐 로거로 보내 요청 스레드가 stdout 쓰기를 기다리지 않게 한다.
+    """
+    setup_logging()
+    build_index_page()
+    cached_response()
+    return app
 
 
 if __name__ == '__main__':
     print("🌐 스마트팜 웹서버 시작")
     print("📊 대시보드: http://localhost:5000")
     print("📡 라즈베리파이 연결 대기 중...")
-    app.run(host='0.0.0.0', port=5000, debug=False)
\ No newline at end of file
+    create_app().run(host='0.0.0.0', port=5000, debug=False, threaded=True)
\ No newline at end of file
@@ -0,0 +1,134 @@
+import os
+import json
+import time
+
+# --- 오프라인 스풀 (store-and-forward) ---
+# 서버로 보내지 못한 읽기를 세그먼트 파일(NDJSON)에 순서대로 쌓아두고,
+# 서버가 살아나면 오래된 세그먼트부터 한 번에 다시 보낸다.
+# 파일은 append-only이며 fsync는 여러 건을 모아서 한 번만 한다.
+
+
+class DiskSpool:
+    def __init__(self, directory="spool", segment_bytes=256 * 1024, max_bytes=20 * 1024 * 1024,
+                 fsync_every=10, fsync_interval=5.0, min_backoff=2.0, max_backoff=300.0):
+        self.directory = directory
+        self.segment_bytes = segment_bytes
+        self.max_bytes = max_bytes
+        self.fsync_every = fsync_every
+        self.fsync_interval = fsync_interval
+        self.min_backoff = min_backoff
+        self.max_backoff = max_backoff
+
+        self.active = None          # 현재 쓰고 있는 세그먼트 파일
+        self.active_path = None
+        self.unsynced = 0
+        self.last_sync = time.time()
+        self.backoff = min_backoff
+        self.retry_at = 0.0
+
+        os.makedirs(directory, exist_ok=True)
+        segments = self.segments()
+        self.next_index = int(segments[-1][-13:-7]) + 1 if segments else 1
+
+    # --- 세그먼트 관리 ---
+    def segments(self):
+        names = sorted(name for name in os.listdir(self.directory)
+                       if name.startswith("segment-") and name.endswith(".ndjson"))
+        return [os.path.join(self.directory, name) for name in names]
+
+    def has_pending(self):
+        return self.active is not None or bool(self.segments())
+
+    def _open_segment(self):
+        self.active_path = os.path.join(self.directory, f"segment-{self.next_index:06d}.ndjson")
+        self.next_index += 1
+        self.active = open(self.active_path, "a", encoding="utf-8")
+
+    def _seal(self):
+        """현재 세그먼트를 닫는다 (닫힌 세그먼트만 재전송 대상)"""
+        if self.active is None:
+            return
+        self.sync()
+        self.active.close()
+        self.active = None
+        self.active_path = None
+
+    def _enforce_limit(self):
+        """최대 크기를 넘으면 가장 오래된 닫힌 세그먼트부터 삭제"""
+        segments = [path for path in self.segments() if path != self.active_path]
+        total = sum(os.path.getsize(path) for path in self.segments())
+        while total > self.max_bytes and segments:
+            oldest = segments.pop(0)
+            total -= os.path.getsize(oldest)
+            os.remove(oldest)
+            print(f"스풀 용량 초과 - 오래된 세그먼트 삭제: {oldest}")
+
+    # --- 쓰기 ---
+    def append(self, reading):
+        """읽기 한 건을 스풀에 추가 (원래 타임스탬프 유지)"""
+        if self.active is None:
+            self._open_segment()
+        self.active.write(json.dumps(reading) + "\n")
+        self.unsynced += 1
+
+        if self.unsynced >= self.fsync_every or time.time() - self.last_sync >= self.fsync_interval:
+            self.sync()
+        if self.active.tell() >= self.segment_bytes:
+            self._seal()
+            self._enforce_limit()
+
+    def sync(self):
+        if self.active is None or not self.unsynced:
+            return
+        self.active.flush()
+        os.fsync(self.active.fileno())
+        self.unsynced = 0
+        self.last_sync = time.time()
+
+    # --- 재전송 ---
+    def replay(self, send_batch):
+        """백오프 시간이 되었으면 가장 오래된 세그먼트 하나를 send_batch로 재전송
+
+        send_batch(readings)가 True를 반환하면 세그먼트를 지운다.
+        한 번 호출에 세그먼트 하나만 보내서 센서 루프를 오래 붙잡지 않는다.
+        """
+        if time.time() < self.retry_at:
+            return False
+        segments = self.segments()
+        if self.active_path in segments and len(segments) == 1:
+            self._seal()
+        segments = [path for path in self.segments() if path != self.active_path]
+        if not segments:
+            return True
+
+        oldest = segments[0]
+        readings = []
+        with open(oldest, encoding="utf-8") as f:
+            for line in f:
+                try:
+                    readings.append(json.loads(line))
+                except ValueError:
+                    pass  # 전원 차단 등으로 잘린 마지막 줄은 버린다
+        if not readings:
+            os.remove(oldest)
+            return True
+
+        try:
+            sent = send_batch(readings)
+        except Exception as e:
+            print(f"스풀 재전송 오류: {e}")
+            sent = False
+
+        if not sent:
+            self.retry_at = time.time() + self.backoff
+            self.backoff = min(self.backoff * 2, self.max_backoff)
+            return False
+
+        os.remove(oldest)
+        self.backoff = self.min_backoff
+        self.retry_at = 0.0
+        print(f"스풀 재전송 완료: {len(readings)}건")
+        return True
+
+    def close(self):
+        self._seal()
@@ -0,0 +1,7 @@
+import os
+import sys
+
+# mainflie/webhook은 폴더 안에서 바로 실행하는 스크립트 구조(패키지 아님)라 테스트에서는 경로만 추가한다
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+for folder in ("webhook", "mainflie"):
+    sys.path.insert(0, os.path.join(ROOT, folder))
@@ -0,0 +1,55 @@
+import random
+
+from anomaly import AnomalyFilter
+
+
+def warm_up(detector, farm_id="A", metric="temperature", center=20.0, count=40):
+    rng = random.Random(1)
+    for _ in range(count):
+        assert detector.check(farm_id, {metric: center + rng.uniform(-0.5, 0.5)}) == ([], [])
+
+
+def test_physically_impossible_value_is_rejected():
+    detector = AnomalyFilter()
+    assert detector.check("A", {"humidity": 140.0}) == ([], ["humidity"])
+    assert detector.check("A", {"temperature": float("nan")}) == ([], ["temperature"])
+
+
+def test_spike_is_rejected_and_not_learned():
+    detector = AnomalyFilter()
+    warm_up(detector)
+    assert detector.check("A", {"temperature": 60.0}) == ([], ["temperature"])
+    assert detector.snapshot("A", "temperature")["temperature"]["median"] < 21
+
+
+def test_moderate_jump_is_flagged():
+    detector = AnomalyFilter()
+    warm_up(detector)
+    flagged, rejected = detector.check("A", {"temperature": 21.6})
+    assert flagged == ["temperature"] and rejected == []
+
+
+def test_sustained_level_shift_is_accepted():
+    detector = AnomalyFilter(max_rejects=3)
+    warm_up(detector)
+    results = [detector.check("A", {"temperature": 40.0})[1] for _ in range(5)]
+    assert results[:3] == [["temperature"]] * 3
+    assert results[-1] == []
+
+
+def test_bools_timestamps_and_other_farms_are_ignored():
+    detector = AnomalyFilter()
+    warm_up(detector)
+    assert detector.check("A", {"water_pump": True, "timestamp": 1e12, "source": "x"}) == ([], [])
+    assert detector.check("B", {"temperature": 60.0}) == ([], [])  # B는 아직 워밍업 중
+
+
+def test_store_drops_rejected_metrics_and_marks_anomalies():
+    from main import SimpleDataStore
+
+    store = SimpleDataStore(anomaly_filter=AnomalyFilter())
+    store.update_data({"farm_id": "A", "temperature": 21.0, "humidity": 150.0})
+    snapshot = store.snapshot("A")
+    assert "humidity" not in snapshot
+    assert snapshot["anomalies"] == {"humidity": "rejected"}
+    assert store.history.query("A", "humidity") == ([], [])
@@ -0,0 +1,50 @@
+import time
+
+from archive import SensorArchive
+
+
+def make_archive(tmp_path, readings):
+    archive = SensorArchive(str(tmp_path / "archive.db"), flush_interval=0.01)
+    archive.start()
+    for farm_id, ts, values in readings:
+        archive.record(farm_id, ts, values)
+    archive.close()
+    return archive
+
+
+def test_raw_query_when_few_points(tmp_path):
+    now = time.time()
+    archive = make_archive(tmp_path, [("A", now - 30 + i, {"temperature": float(i)}) for i in range(10)])
+    result = archive.query("A", "temperature", now - 60, now)
+    assert result["resolution"] == "raw"
+    assert result["values"] == [float(i) for i in range(10)]
+    assert archive.query("B", "temperature", now - 60, now)["values"] == []
+
+
+def test_rollup_when_range_has_too_many_points(tmp_path):
+    start = (int(time.time()) // 3600 - 2) * 3600  # 두 시간 전 정시부터 1시간, 10초 간격
+    readings = [("A", start + i * 10, {"temperature": float(i % 6)}) for i in range(360)]
+    archive = make_archive(tmp_path, readings)
+
+    result = archive.query("A", "temperature", start, start + 3599, max_points=100)
+    assert result["resolution"] == "1m"
+    assert len(result["timestamps"]) == 60
+    assert result["min"][0] == 0.0 and result["max"][0] == 5.0
+    assert result["values"][0] == 2.5
+
+    result = archive.query("A", "temperature", start, start + 3599, max_points=10)
+    assert result["resolution"] == "1h"
+    assert result["values"] == [2.5]
+
+
+def test_store_recorder_writes_every_reading(tmp_path):
+    from main import SimpleDataStore
+
+    archive = SensorArchive(str(tmp_path / "archive.db"), flush_interval=0.01)
+    store = SimpleDataStore()
+    store.add_recorder(archive.record)
+    archive.start()
+    now = time.time()
+    store.update_batch([{"farm_id": "A", "humidity": 40.0 + i, "timestamp": now - 10 + i} for i in range(5)])
+    archive.close()
+    assert archive.query("A", "humidity", now - 60, now)["values"] == [40.0, 41.0, 42.0, 43.0, 44.0]
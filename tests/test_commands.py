@@ -0,0 +1,86 @@
+import threading
+import time
+
+import pytest
+
+from commands import CommandQueue
+
+
+def test_enqueue_validates():
+    commands = CommandQueue()
+    with pytest.raises(ValueError):
+        commands.enqueue("A", "sprinkler", True)
+    with pytest.raises(ValueError):
+        commands.enqueue("A", "water_pump", "on")
+
+
+def test_wait_returns_commands_after_cursor_and_ack_clears():
+    commands = CommandQueue()
+    first = commands.enqueue("A", "water_pump", True)
+    second = commands.enqueue("A", "led_lights", False)
+    epoch, pending = commands.wait("A", 0, commands.epoch, timeout=0)
+    assert [command["seq"] for command in pending] == [first["seq"], second["seq"]]
+
+    assert commands.ack("A", first["seq"], epoch) == 1
+    _, pending = commands.wait("A", first["seq"], epoch, timeout=0)
+    assert pending == [second]
+
+
+def test_newer_command_replaces_pending_one_for_same_actuator():
+    commands = CommandQueue()
+    commands.enqueue("A", "water_pump", True)
+    latest = commands.enqueue("A", "water_pump", False)
+    assert commands.status("A")["pending"] == [latest]
+
+
+def test_unknown_epoch_restarts_from_zero():
+    commands = CommandQueue()
+    command = commands.enqueue("A", "heater", True)
+    epoch, pending = commands.wait("A", after=99, epoch="old-epoch", timeout=0)
+    assert epoch == commands.epoch
+    assert pending == [command]
+    with pytest.raises(ValueError):
+        commands.ack("A", 1, "old-epoch")
+
+
+def test_long_poll_wakes_on_enqueue():
+    commands = CommandQueue()
+    result = {}
+
+    def poll():
+        started = time.monotonic()
+        result["pending"] = commands.wait("A", 0, commands.epoch, timeout=5)[1]
+        result["waited"] = time.monotonic() - started
+
+    thread = threading.Thread(target=poll)
+    thread.start()
+    time.sleep(0.05)
+    commands.enqueue("A", "water_pump", True)
+    thread.join()
+    assert len(result["pending"]) == 1
+    assert result["waited"] < 1
+
+
+def test_rules_do_not_override_operator_or_repeat():
+    commands = CommandQueue(override_seconds=600)
+    assert commands.command_if_changed("A", "water_pump", True) is not None
+    assert commands.command_if_changed("A", "water_pump", True) is None
+    commands.enqueue("A", "led_lights", True)  # 운영자 명령
+    assert commands.command_if_changed("A", "led_lights", False) is None
+
+
+def test_store_rules_issue_commands():
+    from main import SimpleDataStore
+    from rules import RuleEngine
+
+    commands = CommandQueue()
+    rules = RuleEngine([{"id": "dry", "metric": "soil_moisture", "type": "threshold", "op": "<",
+                         "value": 35, "actuator": "water_pump"}])
+    store = SimpleDataStore(rule_engine=rules, command_queue=commands)
+    store.update_data({"farm_id": "A", "soil_moisture": 20.0})
+    store.update_data({"farm_id": "A", "soil_moisture": 21.0})
+
+    pending = commands.status("A")["pending"]
+    assert [(command["actuator"], command["state"], command["source"]) for command in pending] == \
+        [("water_pump", True, "rules")]
+    assert store.snapshot("A")["water_pump"] is True
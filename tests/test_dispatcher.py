@@ -0,0 +1,139 @@
+import json
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+
+pytest.importorskip("requests")
+
+from dispatcher import WebhookDispatcher
+
+
+class Endpoint:
+    """경로별로 정한 상태 코드를 돌려주는 로컬 웹훅 수신 서버"""
+
+    def __init__(self):
+        self.statuses = {}
+        self.delay = {}
+        self.received = []
+        endpoint = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_POST(self):
+                body = json.loads(self.rfile.read(int(self.headers["Content-Length"])))
+                endpoint.received.append((self.path, body))
+                time.sleep(endpoint.delay.get(self.path, 0))
+                self.send_response(endpoint.statuses.get(self.path, 200))
+                self.send_header("Content-Length", "0")
+                self.end_headers()
+
+            def log_message(self, *args):
+                pass
+
+        self.server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+        self.url = f"http://127.0.0.1:{self.server.server_port}"
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+
+    def hits(self, path):
+        return sum(1 for received_path, _ in self.received if received_path == path)
+
+
+@pytest.fixture
+def endpoint():
+    endpoint = Endpoint()
+    yield endpoint
+    endpoint.server.shutdown()
+
+
+@pytest.fixture
+def dispatcher(tmp_path):
+    dispatcher = WebhookDispatcher(workers=2, max_attempts=3, min_backoff=0.01, max_backoff=0.05,
+                                   dead_letter_path=str(tmp_path / "dead.jsonl"))
+    yield dispatcher
+    dispatcher.close()
+
+
+def wait_until(condition, timeout=5):
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        if condition():
+            return True
+        time.sleep(0.01)
+    return False
+
+
+def dead_letters(dispatcher):
+    with open(dispatcher.dead_letter_path, encoding="utf-8") as f:
+        return [json.loads(line) for line in f]
+
+
+def test_delivers_to_every_subscriber(endpoint, dispatcher):
+    dispatcher.register(endpoint.url + "/a", "a")
+    dispatcher.register(endpoint.url + "/b", "b")
+    dispatcher.dispatch({"value": 1})
+    assert wait_until(lambda: endpoint.hits("/a") == 1 and endpoint.hits("/b") == 1)
+    assert wait_until(lambda: dispatcher.metrics()["subscribers"]["a"]["delivered"] == 1)
+
+
+def test_server_errors_are_retried_then_dead_lettered(endpoint, dispatcher):
+    endpoint.statuses["/down"] = 503
+    dispatcher.register(endpoint.url + "/down", "down")
+    dispatcher.dispatch({"value": 1})
+    assert wait_until(lambda: dispatcher.metrics()["subscribers"]["down"]["dead_lettered"] == 1)
+    assert endpoint.hits("/down") == 3
+
+
+def test_attempts_reset_after_dead_letter(endpoint, dispatcher):
+    """죽은 엔드포인트라도 dead-letter 뒤 다음 이벤트는 다시 max_attempts번 시도한다"""
+    endpoint.statuses["/down"] = 500
+    dispatcher.register(endpoint.url + "/down", "down")
+    dispatcher.dispatch({"value": 1})
+    assert wait_until(lambda: dispatcher.metrics()["subscribers"]["down"]["dead_lettered"] == 1)
+    dispatcher.dispatch({"value": 2})
+    assert wait_until(lambda: dispatcher.metrics()["subscribers"]["down"]["dead_lettered"] == 2)
+    assert endpoint.hits("/down") == 6
+    assert dispatcher.metrics()["subscribers"]["down"]["retried"] == 4
+
+
+def test_client_errors_fail_without_retry(endpoint, dispatcher):
+    endpoint.statuses["/bad"] = 400
+    dispatcher.register(endpoint.url + "/bad", "bad")
+    dispatcher.dispatch({"value": 1})
+    assert wait_until(lambda: dispatcher.metrics()["subscribers"]["bad"]["dead_lettered"] == 1)
+    metrics = dispatcher.metrics()["subscribers"]["bad"]
+    assert metrics["delivered"] == 0 and metrics["failed"] == 1 and metrics["retried"] == 0
+    assert endpoint.hits("/bad") == 1
+    assert dead_letters(dispatcher)[0]["error"] == "HTTP 400"
+
+
+def test_too_many_requests_is_retried(endpoint, dispatcher):
+    endpoint.statuses["/busy"] = 429
+    dispatcher.register(endpoint.url + "/busy", "busy")
+    dispatcher.dispatch({"value": 1})
+    assert wait_until(lambda: dispatcher.metrics()["subscribers"]["busy"]["dead_lettered"] == 1)
+    assert endpoint.hits("/busy") == 3
+
+
+def test_unregister_during_delivery_keeps_session_until_done(endpoint, dispatcher):
+    endpoint.delay["/slow"] = 0.3
+    dispatcher.register(endpoint.url + "/slow", "slow")
+    dispatcher.dispatch({"value": 1})
+    assert wait_until(lambda: endpoint.hits("/slow") == 1)
+    assert dispatcher.unregister("slow")
+    time.sleep(0.5)
+    assert not dispatcher.unregister("slow")
+    assert endpoint.hits("/slow") == 1  # 등록 해제된 구독자는 재시도하지 않음
+    assert dispatcher.metrics()["subscribers"] == {}
+
+
+def test_redeliver_dead_letters(endpoint, dispatcher):
+    endpoint.statuses["/flaky"] = 500
+    dispatcher.register(endpoint.url + "/flaky", "flaky")
+    dispatcher.dispatch({"value": 1})
+    assert wait_until(lambda: dispatcher.metrics()["subscribers"]["flaky"]["dead_lettered"] == 1)
+
+    endpoint.statuses["/flaky"] = 200
+    assert dispatcher.redeliver_dead_letters() == 1
+    assert wait_until(lambda: dispatcher.metrics()["subscribers"]["flaky"]["delivered"] == 1)
+    assert endpoint.received[-1] == ("/flaky", {"value": 1})
@@ -0,0 +1,53 @@
+import pytest
+
+np = pytest.importorskip("numpy")
+
+from downsample import SeriesCache, downsample, lttb, minmax
+
+
+def series(n=1000):
+    ts = np.arange(n, dtype=np.float64)
+    values = np.sin(ts / 50.0)
+    values[n * 437 // 1000] = 10.0  # 스파이크
+    return ts, values
+
+
+def test_lttb_keeps_endpoints_and_size():
+    ts, values = series()
+    index = lttb(ts, values, 100)
+    assert len(index) == 100
+    assert index[0] == 0 and index[-1] == len(ts) - 1
+    assert np.all(np.diff(index) > 0)
+    assert 437 in index
+
+
+def test_minmax_never_misses_a_spike():
+    ts, values = series()
+    index = minmax(ts, values, 40)
+    assert len(index) <= 40
+    assert 437 in index
+    assert np.all(np.diff(index) > 0)
+
+
+def test_small_series_is_returned_as_is():
+    ts, values = series(10)
+    out_ts, out_values = downsample(ts, values, 50)
+    assert out_ts.tolist() == ts.tolist()
+    assert out_values.tolist() == values.tolist()
+
+
+def test_unknown_method():
+    ts, values = series(10)
+    with pytest.raises(ValueError):
+        downsample(ts, values, 5, method="average")
+
+
+def test_series_cache_reuses_closed_ranges():
+    cache = SeriesCache(max_entries=2)
+    cache.put("a", version=1, newest=100.0, result="old")
+    assert cache.get("a", 0.0, 50.0, oldest=0.0, version=2) == "old"   # 끝난 구간 - 새 읽기와 무관
+    assert cache.get("a", 0.0, 150.0, oldest=0.0, version=2) is None  # 최신 구간 - 다시 계산
+    cache.put("b", 1, 1.0, "b")
+    cache.put("c", 1, 1.0, "c")
+    assert cache.get("a", 0.0, 50.0, 0.0, 1) is None  # LRU로 밀려남
+    assert cache.hits == 1 and cache.misses == 2
@@ -0,0 +1,51 @@
+import json
+
+from farm_summary import FarmSummary
+from main import SimpleDataStore
+
+
+def render(summary, fields=None, since=None):
+    version, body = summary.render(fields, since)
+    return version, json.loads(body)
+
+
+def test_summary_tracks_store_changes():
+    store = SimpleDataStore()
+    summary = FarmSummary()
+    summary.seed(store)
+    store.add_listener(summary.update)
+    store.update_data({"farm_id": "A", "temperature": 21.0, "humidity": 50.0})
+    store.update_data({"farm_id": "B", "temperature": 25.0})
+
+    version, body = render(summary)
+    assert body["count"] == 3
+    assert body["farms"]["A"]["temperature"] == 21.0
+
+
+def test_since_returns_only_changed_farms():
+    store = SimpleDataStore()
+    summary = FarmSummary()
+    store.add_listener(summary.update)
+    store.update_data({"farm_id": "A", "temperature": 21.0})
+    version, _ = render(summary)
+    store.update_data({"farm_id": "B", "temperature": 25.0})
+
+    _, body = render(summary, since=version)
+    assert list(body["farms"]) == ["B"]
+
+
+def test_field_projection_and_body_reuse():
+    summary = FarmSummary()
+    summary.update({"farm_id": "A"}, {"farm_id": "A", "temperature": 1.0, "humidity": 2.0, "data_version": 1})
+    fields = FarmSummary.parse_fields(" humidity , ,temperature")
+    assert fields == ("humidity", "temperature")
+    assert render(summary, ("humidity",))[1]["farms"]["A"] == {"humidity": 2.0}
+    assert summary.render(fields)[1] is summary.render(fields)[1]
+    assert FarmSummary.parse_fields("") is None
+
+
+def test_older_snapshot_does_not_replace_newer():
+    summary = FarmSummary()
+    summary.update({"farm_id": "A"}, {"farm_id": "A", "temperature": 2.0, "data_version": 2})
+    summary.update({"farm_id": "A"}, {"farm_id": "A", "temperature": 1.0, "data_version": 1})
+    assert render(summary)[1]["farms"]["A"]["temperature"] == 2.0
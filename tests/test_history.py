@@ -0,0 +1,66 @@
+import math
+
+from history import FarmHistory, TimeSeriesHistory, numeric_values
+
+
+def test_numeric_values_keeps_numbers_and_actuators_only():
+    values = numeric_values({"temperature": 21.5, "co2": 400, "water_pump": True, "source": "x",
+                             "timestamp": 1.0, "data_version": 3})
+    assert values == {"temperature": 21.5, "co2": 400.0, "water_pump": 1.0}
+
+
+def test_range_query_and_missing_values():
+    history = TimeSeriesHistory()
+    for ts in range(10):
+        values = {"temperature": float(ts)}
+        if ts % 2 == 0:
+            values["humidity"] = 50.0 + ts
+        history.append("A", 1000 + ts, values)
+
+    assert history.query("A", "temperature", 1003, 1005) == ([1003.0, 1004.0, 1005.0], [3.0, 4.0, 5.0])
+    assert history.query("A", "humidity", 1003, 1006)[1] == [54.0, 56.0]
+    assert history.query("A", "unknown") == ([], [])
+    assert history.query("B", "temperature") == ([], [])
+    assert history.metrics("A") == ["humidity", "temperature"]
+
+
+def test_out_of_order_reading_is_dropped():
+    farm = FarmHistory(capacity=100, retention_seconds=3600)
+    assert farm.append(10.0, {"temperature": 1.0})
+    assert not farm.append(5.0, {"temperature": 2.0})
+    assert farm.dropped == 1
+
+
+def test_grows_then_wraps_at_capacity():
+    farm = FarmHistory(capacity=100, retention_seconds=10**9)
+    for ts in range(250):
+        farm.append(float(ts), {"temperature": float(ts)})
+    timestamps, values = farm.query("temperature")
+    assert farm.size == 100
+    assert timestamps == [float(ts) for ts in range(150, 250)]
+    assert values == timestamps
+
+
+def test_retention_expires_old_points():
+    farm = FarmHistory(capacity=1000, retention_seconds=60)
+    for ts in range(0, 200, 10):
+        farm.append(float(ts), {"temperature": 1.0})
+    timestamps, _ = farm.query("temperature")
+    assert timestamps[0] >= 190 - 60
+
+
+def test_query_arrays_matches_query():
+    import pytest
+    np = pytest.importorskip("numpy")
+    history = TimeSeriesHistory(max_points=80)
+    for ts in range(200):
+        values = {"temperature": float(ts)} if ts % 3 else {"humidity": 1.0}
+        history.append("A", float(ts), values)
+
+    timestamps, values, version = history.query_arrays("A", "temperature", 150, 190)
+    expected = history.query("A", "temperature", 150, 190)
+    assert timestamps.tolist() == expected[0]
+    assert values.tolist() == expected[1]
+    assert version == 200
+    assert not np.isnan(values).any()
+    assert not math.isnan(history.bounds("A")[0])
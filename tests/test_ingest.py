@@ -0,0 +1,118 @@
+import gzip
+import json
+import time
+
+import pytest
+
+from main import SimpleDataStore, SimpleWebApp
+from wire_format import PACKED_TYPE, encode_readings
+
+
+@pytest.fixture
+def store():
+    return SimpleDataStore()
+
+
+@pytest.fixture
+def client(store):
+    return SimpleWebApp(store).app.test_client()
+
+
+def test_single_reading_is_applied(client, store):
+    response = client.post("/api/external_data", json={"farm_id": "A", "temperature": 21.0})
+    assert response.status_code == 200
+    assert store.snapshot("A")["temperature"] == 21.0
+    assert store.snapshot("A")["source"] == "raspberry_pi"
+
+
+def test_packed_batch_is_applied(client, store):
+    body = encode_readings([{"farm_id": "A", "temperature": 21.0, "timestamp": time.time()},
+                            {"farm_id": "B", "temperature": 22.0, "timestamp": time.time()}])
+    response = client.post("/api/external_data", data=body, content_type=PACKED_TYPE)
+    assert response.status_code == 200
+    assert store.farm_ids() == ["A", "B", "FARM_001"]
+
+
+def test_gzip_ndjson_batch(client, store):
+    lines = "\n".join(json.dumps({"farm_id": "A", "temperature": t}) for t in (20.0, 21.0))
+    response = client.post("/api/external_data/batch", data=gzip.compress(lines.encode()),
+                           headers={"Content-Type": "application/x-ndjson", "Content-Encoding": "gzip"})
+    assert response.status_code == 200
+    assert response.get_json()["count"] == 2
+
+
+@pytest.mark.parametrize("readings", [
+    [{"farm_id": "A", "temperature": 1.0}, {"farm_id": "B", "timestamp": "abc"}],
+    [{"farm_id": "A", "temperature": 1.0}, {"farm_id": "B", "nested": {"x": 1}}],
+    [{"farm_id": "A", "temperature": 1.0}, {"farm_id": 7, "temperature": 1.0}],
+    [{"farm_id": "A", "temperature": 1.0}, {}],
+])
+def test_invalid_batch_is_rejected_before_anything_is_applied(client, store, readings):
+    response = client.post("/api/external_data/batch", json=readings)
+    assert response.status_code == 400
+    assert response.get_json()["status"] == "error"
+    assert store.farm_ids() == ["FARM_001"]
+
+
+def test_invalid_single_reading_is_400(client, store):
+    assert client.post("/api/external_data", json={"farm_id": "A", "timestamp": "abc"}).status_code == 400
+    assert client.post("/api/external_data", data="not json", content_type="application/json").status_code == 400
+    assert store.snapshot("A") is None
+
+
+def test_mixed_null_and_numeric_timestamps(client, store):
+    response = client.post("/api/external_data/batch", json=[
+        {"farm_id": "A", "temperature": 1.0, "timestamp": None},
+        {"farm_id": "A", "humidity": 50.0, "timestamp": time.time() - 5},
+    ])
+    assert response.status_code == 200
+    assert store.snapshot("A")["temperature"] == 1.0
+
+
+def test_future_timestamp_is_clamped(client, store):
+    response = client.post("/api/external_data", json={"farm_id": "A", "temperature": 1.0, "timestamp": 1e12})
+    assert response.status_code == 200
+    assert store.snapshot("A")["timestamp"] <= time.time() + 1
+
+
+def test_data_etag_and_not_modified(client):
+    client.post("/api/external_data", json={"farm_id": "A", "temperature": 21.0})
+    first = client.get("/api/data?farm_id=A")
+    assert first.status_code == 200
+    again = client.get("/api/data?farm_id=A", headers={"If-None-Match": first.headers["ETag"]})
+    assert again.status_code == 304
+    assert client.get("/api/data?farm_id=missing").status_code == 404
+
+
+@pytest.mark.parametrize("options", [
+    {"log_level": "verbose"},
+    {"enabled": True, "interval": "fast"},
+    {"enabled": True, "interval": -1},
+    {"enabled": "yes"},
+])
+def test_profiler_rejects_bad_options(client, options):
+    response = client.post("/api/profiler", json=options)
+    assert response.status_code == 400
+
+
+def test_profiler_start_stop(client):
+    assert client.post("/api/profiler", json={"enabled": True, "interval": 0.01}).status_code == 200
+    assert client.post("/api/profiler", json={"enabled": False}).status_code == 200
+
+
+def test_metrics_endpoint(client):
+    client.post("/api/external_data", json={"farm_id": "A", "temperature": 21.0, "sensor_read_ms": 50})
+    text = client.get("/metrics").get_data(as_text=True)
+    assert "smartfarm_ingest_readings_total" in text
+    assert "smartfarm_sensor_read_seconds_count" in text
+
+
+def test_asgi_ingest_body_is_validated():
+    from asgi_app import parse_ingest_body
+
+    readings = parse_ingest_body(b'{"farm_id": "A", "temperature": 1}', "application/json", "", False)
+    assert readings[0]["farm_id"] == "A" and "timestamp" in readings[0]
+    with pytest.raises(ValueError):
+        parse_ingest_body(b'[{"farm_id": "A"}, {"timestamp": "abc"}]', "application/json", "", True)
+    with pytest.raises(ValueError):
+        parse_ingest_body(b'[1, 2]', "application/json", "", False)
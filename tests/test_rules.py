@@ -0,0 +1,80 @@
+import pytest
+
+from rules import RuleEngine, compile_rule
+
+
+def engine(*specs):
+    return RuleEngine(specs)
+
+
+def test_threshold_with_hysteresis():
+    rules = engine({"id": "hot", "metric": "temperature", "type": "threshold", "op": ">", "value": 30,
+                    "hysteresis": 1, "alert": "온도 높음"})
+    assert rules.evaluate("A", 0, {"temperature": 31})[0] == ["온도 높음"]
+    assert rules.evaluate("A", 1, {"temperature": 29.5})[0] == ["온도 높음"]  # 아직 hysteresis 안쪽
+    assert rules.evaluate("A", 2, {"temperature": 28.9})[0] == []
+
+
+def test_rate_needs_min_span():
+    rules = engine({"id": "rising", "metric": "temperature", "type": "rate", "op": ">", "value": 0.1,
+                    "window": 60, "alert": "급상승"})
+    assert rules.evaluate("A", 0, {"temperature": 20})[0] == []
+    assert rules.evaluate("A", 1, {"temperature": 25})[0] == []  # 구간이 min_span(15초)보다 짧음
+    assert rules.evaluate("A", 20, {"temperature": 25})[0] == ["급상승"]
+
+
+def test_duration_holds_for_period():
+    rules = engine({"id": "dry", "metric": "humidity", "type": "duration", "op": "<", "value": 45,
+                    "for": 60, "alert": "건조"})
+    assert rules.evaluate("A", 0, {"humidity": 40})[0] == []
+    assert rules.evaluate("A", 59, {"humidity": 40})[0] == []
+    assert rules.evaluate("A", 60, {"humidity": 40})[0] == ["건조"]
+    assert rules.evaluate("A", 61, {"humidity": 50})[0] == []
+
+
+def test_actuator_is_on_if_any_rule_is_active():
+    rules = engine(
+        {"id": "dry", "metric": "soil_moisture", "type": "threshold", "op": "<", "value": 35,
+         "actuator": "water_pump"},
+        {"id": "hot", "metric": "temperature", "type": "threshold", "op": ">", "value": 30,
+         "actuator": "water_pump"},
+    )
+    assert rules.evaluate("A", 0, {"soil_moisture": 30, "temperature": 20})[1] == {"water_pump": True}
+    assert rules.evaluate("A", 1, {"soil_moisture": 50, "temperature": 20})[1] == {"water_pump": False}
+
+
+def test_farm_filter_and_per_farm_state():
+    rules = engine({"id": "hot", "metric": "temperature", "type": "threshold", "op": ">", "value": 30,
+                    "alert": "온도 높음", "farms": ["A"]})
+    assert rules.evaluate("A", 0, {"temperature": 35})[0] == ["온도 높음"]
+    assert rules.evaluate("B", 0, {"temperature": 35})[0] == []
+
+
+@pytest.mark.parametrize("spec", [
+    {"id": "x", "metric": "temperature", "type": "threshold", "op": ">"},
+    {"id": "x", "metric": "temperature", "type": "spike", "op": ">", "value": 1},
+    {"id": "x", "metric": "temperature", "type": "threshold", "op": "!=", "value": 1},
+])
+def test_invalid_rule_raises_value_error(spec):
+    with pytest.raises(ValueError):
+        compile_rule(spec)
+
+
+def test_evaluate_history_matches_streaming():
+    pytest.importorskip("numpy")
+    from history import TimeSeriesHistory
+
+    spec = {"id": "hot", "metric": "temperature", "type": "threshold", "op": ">", "value": 30, "hysteresis": 1}
+    history = TimeSeriesHistory()
+    streaming = engine(spec)
+    values = [29, 31, 30.5, 29.5, 28.5, 31.5]
+    active = []
+    for ts, value in enumerate(values, start=1000):
+        history.append("A", ts, {"temperature": value})
+        active.append(bool(streaming.evaluate("A", ts, {"temperature": value})[0] or
+                           "hot" in streaming.active["A"]))
+
+    result = engine(spec).evaluate_history(history, "A")[0]
+    assert result["samples"] == len(values)
+    assert result["active_now"] == active[-1]
+    assert result["active_ratio"] == pytest.approx(sum(active) / len(active))
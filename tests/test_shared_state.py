@@ -0,0 +1,93 @@
+import uuid
+
+import pytest
+
+pytest.importorskip("fcntl")  # 슬롯 잠금이 fcntl.lockf 기반
+
+from main import SimpleDataStore
+from shared_state import SharedStateTable
+
+
+@pytest.fixture
+def tables():
+    name = f"farm_test_{uuid.uuid4().hex[:8]}"
+    owner = SharedStateTable(name=name, max_farms=16, owner=True)
+    worker = SharedStateTable(name=name, max_farms=16)
+    yield owner, worker
+    worker.close()
+    owner.close()
+
+
+def test_read_matches_written_state(tables):
+    owner, worker = tables
+    owner.write({"farm_id": "A", "temperature": 21.5, "light_intensity": 300, "water_pump": True,
+                 "alerts": ["온도 높음"], "anomalies": {"ph": "flagged"}, "led_status": "on"})
+
+    state = worker.read("A")
+    assert state["temperature"] == 21.5
+    assert state["light_intensity"] == 300 and isinstance(state["light_intensity"], int)
+    assert state["water_pump"] is True
+    assert state["alerts"] == ["온도 높음"]
+    assert state["anomalies"] == {"ph": "flagged"}
+    assert state["led_status"] == "on"
+    assert worker.farm_ids() == ["A"]
+
+
+def test_unknown_farm_reads_none(tables):
+    owner, _ = tables
+    assert owner.read("missing") is None
+
+
+def test_workers_merge_changes_without_losing_fields(tables):
+    """워커마다 저장소가 따로여도 서로 다른 필드의 최신값이 모두 남는다"""
+    owner, worker = tables
+    first, second = SimpleDataStore(), SimpleDataStore()
+    first.add_listener(owner.publish)
+    second.add_listener(worker.publish)
+
+    first.update_data({"farm_id": "A", "temperature": 20.0, "humidity": 50.0})
+    second.update_data({"farm_id": "A", "temperature": 30.0})
+    first.update_data({"farm_id": "A", "humidity": 55.0})  # first의 스냅샷은 아직 temperature=20
+
+    state = owner.read("A")
+    assert state["temperature"] == 30.0
+    assert state["humidity"] == 55.0
+
+
+def test_slot_version_is_shared_and_monotonic(tables):
+    owner, worker = tables
+    versions = []
+    for i in range(5):
+        table = owner if i % 2 else worker
+        versions.append(table.merge("A", {"farm_id": "A", "temperature": float(i), "data_version": 1}))
+        assert owner.read("A")["data_version"] == worker.read("A")["data_version"] == versions[-1]
+    assert versions == sorted(versions) and len(set(versions)) == len(versions)
+
+
+def test_oversized_extra_keeps_essentials(tables):
+    owner, _ = tables
+    owner.write({"farm_id": "A", "temperature": 1.0, "source": "raspberry_pi",
+                 "alerts": ["경고" * 50] * 40})
+    state = owner.read("A")
+    assert state["temperature"] == 1.0
+    assert state["source"] == "raspberry_pi"
+    assert len(state["alerts"]) < 40
+
+
+def test_stale_segment_layout_is_replaced():
+    from multiprocessing import shared_memory
+
+    name = f"farm_test_{uuid.uuid4().hex[:8]}"
+    stale = shared_memory.SharedMemory(name=name, create=True, size=128)
+    stale.buf[:8] = b"FARMSHM1"
+    try:
+        table = SharedStateTable(name=name, max_farms=4, owner=True)
+        table.write({"farm_id": "A", "temperature": 1.0})
+        assert table.read("A")["temperature"] == 1.0
+        table.close()
+    finally:
+        stale.close()
+        try:
+            stale.unlink()
+        except FileNotFoundError:
+            pass
@@ -0,0 +1,117 @@
+import threading
+import time
+
+from main import SimpleDataStore
+from storage import PersistentStorage, from_schema, to_schema
+
+
+def test_update_merges_fields_and_bumps_version():
+    store = SimpleDataStore()
+    store.update_data({"farm_id": "A", "temperature": 21.0, "humidity": 50.0})
+    store.update_data({"farm_id": "A", "temperature": 22.5})
+
+    snapshot = store.snapshot("A")
+    assert snapshot["temperature"] == 22.5
+    assert snapshot["humidity"] == 50.0
+    assert snapshot["data_version"] == 2
+
+
+def test_listener_gets_only_changed_fields():
+    store = SimpleDataStore()
+    seen = []
+    store.add_listener(lambda changes, snapshot: seen.append(changes))
+    store.update_data({"farm_id": "A", "temperature": 21.0, "humidity": 50.0})
+    store.update_data({"farm_id": "A", "temperature": 21.0, "humidity": 55.0})
+
+    assert "temperature" not in seen[1]
+    assert seen[1]["humidity"] == 55.0
+    assert seen[1]["data_version"] == 2
+
+
+def test_batch_applies_in_timestamp_order_once_per_farm():
+    store = SimpleDataStore()
+    now = time.time()
+    store.update_batch([
+        {"farm_id": "A", "temperature": 2.0, "timestamp": now},
+        {"farm_id": "A", "temperature": 1.0, "timestamp": now - 10},
+        {"farm_id": "B", "temperature": 5.0, "timestamp": now},
+    ])
+
+    assert store.snapshot("A")["temperature"] == 2.0
+    assert store.snapshot("A")["data_version"] == 1
+    assert store.history.query("A", "temperature")[1] == [1.0, 2.0]
+    assert store.farm_ids() == ["A", "B", "FARM_001"]
+
+
+def test_listeners_see_versions_in_order_under_contention():
+    store = SimpleDataStore()
+    versions = []
+    store.add_listener(lambda changes, snapshot: versions.append(changes["data_version"]))
+
+    def writer():
+        for i in range(500):
+            store.update_data({"farm_id": "A", "temperature": float(i % 40)})
+
+    threads = [threading.Thread(target=writer) for _ in range(4)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert versions == list(range(1, 2001))
+
+
+def test_future_timestamp_does_not_lock_history():
+    store = SimpleDataStore()
+    store.update_data({"farm_id": "A", "temperature": 20.0, "timestamp": 1e12})
+    store.update_data({"farm_id": "A", "temperature": 21.0, "timestamp": time.time() + 1})
+
+    timestamps, values = store.history.query("A", "temperature")
+    assert values == [20.0, 21.0]
+    assert max(timestamps) < 1e12
+    assert store.history.farms["A"].dropped == 0
+
+
+def test_sensor_read_ms_is_not_stored():
+    store = SimpleDataStore()
+    store.update_data({"farm_id": "A", "temperature": 20.0, "sensor_read_ms": 120.0})
+    assert "sensor_read_ms" not in store.snapshot("A")
+
+
+def test_schema_roundtrip():
+    state = {"farm_id": "A", "temperature": 20.5, "water_pump": True, "alerts": ["x"],
+             "source": "raspberry_pi", "data_version": 3}
+    document = to_schema(state)
+    assert document["sensors"] == {"temperature": 20.5}
+    assert document["actuators"] == {"water_pump": True}
+    restored = from_schema(document)
+    assert {key: restored[key] for key in state} == state
+
+
+def test_persistent_storage_recovers_from_wal_and_snapshot(tmp_path):
+    storage = PersistentStorage(str(tmp_path), snapshot_every=3)
+    store = SimpleDataStore()
+    store.add_listener(storage.append)
+    storage.start()
+    for i in range(5):
+        store.update_data({"farm_id": "A", "temperature": 20.0 + i})
+    store.update_data({"farm_id": "B", "humidity": 40.0})
+    storage.close()
+
+    states = PersistentStorage(str(tmp_path)).load()
+    assert states["A"]["temperature"] == 24.0
+    assert states["A"]["data_version"] == 5
+    assert states["B"]["humidity"] == 40.0
+
+
+def test_wal_replay_stops_at_torn_line(tmp_path):
+    storage = PersistentStorage(str(tmp_path), snapshot_every=10**6, snapshot_interval=10**6)
+    storage.start()
+    storage.append({}, {"farm_id": "A", "temperature": 1.0, "data_version": 1, "alerts": []})
+    storage.running = False
+    storage.thread.join()
+    storage.wal.close()
+    with open(storage.wal_path, "a", encoding="utf-8") as f:
+        f.write('{"farm_id": "A", "data_ver')
+
+    states = PersistentStorage(str(tmp_path)).load()
+    assert states["A"]["temperature"] == 1.0
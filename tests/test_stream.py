@@ -0,0 +1,74 @@
+import json
+
+from stream import EventBroker, format_sse
+
+
+def parse(message):
+    fields = dict(line.split(": ", 1) for line in message.strip().splitlines())
+    return fields["event"], json.loads(fields["data"]), fields.get("id")
+
+
+def test_format_sse():
+    event, data, event_id = parse(format_sse("delta", {"temperature": 21.5, "alerts": ["온도"]}, 7))
+    assert event == "delta"
+    assert data == {"temperature": 21.5, "alerts": ["온도"]}
+    assert event_id == "7"
+
+
+def test_publish_only_to_matching_topic():
+    broker = EventBroker()
+    farm_a = broker.subscribe("A")
+    everything = broker.subscribe()
+    broker.publish("delta", {"farm_id": "B"}, 1, topic="B")
+
+    assert farm_a.queue.empty()
+    assert parse(everything.queue.get_nowait())[1] == {"farm_id": "B"}
+
+
+def test_slow_subscriber_is_dropped_without_blocking():
+    broker = EventBroker(max_queue=2)
+    slow = broker.subscribe("A")
+    for version in range(5):
+        broker.publish("delta", {"data_version": version}, version, topic="A")
+
+    assert slow.dropped
+    assert broker.client_count() == 0
+    assert broker.dropped_count == 1
+
+
+def test_stream_sends_initial_then_events():
+    broker = EventBroker(keepalive=0.01)
+    subscriber = broker.subscribe("A")
+    stream = broker.stream(subscriber, initial=format_sse("snapshot", {"data_version": 1}, 1))
+    assert next(stream).startswith("retry:")
+    assert parse(next(stream))[0] == "snapshot"
+    assert next(stream) == ": keepalive\n\n"
+    broker.publish("delta", {"data_version": 2}, 2, topic="A")
+    assert parse(next(stream))[1] == {"data_version": 2}
+    stream.close()
+    assert broker.client_count() == 0
+
+
+def test_store_deltas_reach_subscribers_in_version_order():
+    import threading
+    from main import SimpleDataStore, SimpleWebApp
+
+    store = SimpleDataStore()
+    app = SimpleWebApp(store)
+    app.broker.max_queue = 10000
+    subscriber = app.broker.subscribe("A")
+
+    def writer():
+        for i in range(300):
+            store.update_data({"farm_id": "A", "temperature": float(i % 40)})
+
+    threads = [threading.Thread(target=writer) for _ in range(4)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    versions = []
+    while not subscriber.queue.empty():
+        versions.append(parse(subscriber.queue.get_nowait())[1]["data_version"])
+    assert versions == list(range(1, 1201))
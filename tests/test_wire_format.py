@@ -0,0 +1,56 @@
+import math
+
+import pytest
+
+from wire_format import METRIC_IDS, PACKED_TYPE, decode_readings, encode_readings
+
+
+def test_roundtrip_keeps_types_and_values():
+    readings = [
+        {"farm_id": "FARM_001", "temperature": 23.4, "humidity": 61.25, "ph": 6.123456,
+         "light_intensity": 512, "water_pump": True, "led_lights": False, "source": None,
+         "custom_metric": -3, "timestamp": 1700000000.123},
+        {"farm_id": "FARM_001", "temperature": -0.5, "timestamp": 1700000002.5},
+        {"farm_id": "FARM_002", "humidity": 40.0},
+    ]
+    decoded = decode_readings(encode_readings(readings))
+    assert decoded == readings
+    assert isinstance(decoded[0]["light_intensity"], int)
+    assert decoded[0]["water_pump"] is True
+
+
+def test_packed_is_smaller_than_json():
+    import json
+    reading = {name: 1.5 for name in METRIC_IDS if name not in ("farm_id", "source", "led_status")}
+    reading.update(farm_id="FARM_001", timestamp=1700000000.0)
+    assert len(encode_readings([reading])) < len(json.dumps(reading)) / 2
+
+
+@pytest.mark.parametrize("value", [math.inf, -math.inf, math.nan])
+def test_non_finite_values_raise_value_error(value):
+    with pytest.raises(ValueError):
+        encode_readings([{"temperature": value}])
+    with pytest.raises(ValueError):
+        encode_readings([{"temperature": 1.0, "timestamp": value}])
+
+
+def test_unsupported_value_raises_value_error():
+    with pytest.raises(ValueError):
+        encode_readings([{"alerts": ["x"]}])
+
+
+@pytest.mark.parametrize("data", [b"", b"XX\x01", b"FP\x09\x00", b"FP\x01\x05"])
+def test_malformed_input_raises_value_error(data):
+    with pytest.raises(ValueError):
+        decode_readings(data)
+
+
+def test_truncated_body_raises_value_error():
+    body = encode_readings([{"farm_id": "A", "temperature": 21.5, "timestamp": 1700000000.0}])
+    for cut in range(3, len(body)):
+        with pytest.raises(ValueError):
+            decode_readings(body[:cut])
+
+
+def test_content_type():
+    assert PACKED_TYPE == "application/x-farm-packed"
@@ -0,0 +1,290 @@
+import heapq
+import json
+import os
+import queue
+import random
+import threading
+import time
+
+import requests
+
+RETRYABLE_STATUS = (408, 429)  # 4xx지만 잠시 뒤 다시 보내면 받아 줄 수 있는 응답
+
+# =============================================================================
+# 웹훅 디스패처
+#
+# - 구독자(URL)마다 keep-alive 세션을 하나씩 두고, 고정 개수의 작업 스레드가 전송
+# - 구독자마다 "보낼 최신 이벤트" 한 칸만 둔다. 전송 중/재시도 대기 중에 새 변경이
+#   오면 이전 이벤트를 덮어쓴다 (coalescing) - 값이 빨리 바뀌어도 스레드/요청이
+#   늘어나지 않고, 구독자는 항상 최신 값을 받는다
+# - 실패(연결 오류, 5xx, 408/429)하면 지수 백오프(+지터)로 재시도, max_attempts를 넘기면
+#   dead-letter 파일(JSONL)에 기록. 실패 횟수는 구독자 단위로 세서 병합된 이벤트에 걸쳐
+#   누적한다 (계속 바뀌는 농장이라도 죽은 엔드포인트는 dead-letter로 간다). 성공하거나
+#   dead-letter로 보낸 뒤에는 0으로 돌려 다음 이벤트가 다시 온전한 재시도를 받는다
+# - 그 밖의 4xx는 요청 자체가 거부된 것이라 다시 보내도 같다 - 재시도 없이 바로 dead-letter
+# - 전송 중에 등록 해제하면 세션은 그 전송이 끝난 뒤 작업 스레드가 닫는다
+# - 구독자별 전송 지표 (성공/실패/재시도/병합/dead-letter 수, 지연시간)
+#   registry(metrics.Registry)를 주면 전송 시간 히스토그램과 대기열 깊이도 /metrics로 노출
+# =============================================================================
+
+
+class Subscriber:
+    """웹훅 구독자 한 명 (세션, 대기 이벤트, 전송 지표)"""
+
+    def __init__(self, name, url, timeout):
+        self.name = name
+        self.url = url
+        self.timeout = timeout
+        self.session = requests.Session()
+
+        self.pending = None     # 다음에 보낼 이벤트 (새 이벤트가 오면 덮어씀)
+        self.scheduled = False  # 작업 큐 또는 재시도 대기열에 들어가 있는지
+        self.attempts = 0       # 연속 실패 횟수 (병합된 이벤트에 걸쳐 누적, 성공/dead-letter 뒤 0으로)
+        self.active = True
+        self.sending = False    # 작업 스레드가 이 세션으로 전송 중인지 (등록 해제 시 세션 닫기를 미룸)
+
+        self.delivered = 0
+        self.failed = 0
+        self.retried = 0
+        self.coalesced = 0
+        self.dead_lettered = 0
+        self.latency_total = 0.0
+        self.latency_max = 0.0
+        self.last_status = None
+        self.last_error = None
+        self.last_delivered_at = None
+
+    def metrics(self):
+        return {
+            "url": self.url,
+            "delivered": self.delivered,
+            "failed": self.failed,
+            "retried": self.retried,
+            "coalesced": self.coalesced,
+            "dead_lettered": self.dead_lettered,
+            "pending": self.pending is not None,
+            "latency_avg_ms": round(self.latency_total / self.delivered * 1000, 2) if self.delivered else None,
+            "latency_max_ms": round(self.latency_max * 1000, 2),
+            "last_status": self.last_status,
+            "last_error": self.last_error,
+            "last_delivered_at": self.last_delivered_at
+        }
+
+
+class WebhookDispatcher:
+    """등록된 구독자들에게 변경 이벤트를 전달하는 디스패처"""
+
+    def __init__(self, workers=4, timeout=5, max_attempts=6, min_backoff=0.5, max_backoff=60.0,
+                 dead_letter_path="webhook_dead_letter.jsonl", registry=None):
+        self.timeout = timeout
+        self.max_attempts = max_attempts
+        self.min_backoff = min_backoff
+        self.max_backoff = max_backoff
+        self.dead_letter_path = dead_letter_path
+
+        self.subscribers = {}
+        self.lock = threading.Lock()
+        self.ready = queue.Queue()  # 바로 보낼 구독자
+        self.retry_heap = []        # (재시도 시각, 순번, 구독자)
+        self.retry_counter = 0
+        self.retry_wakeup = threading.Condition(self.lock)
+        self.running = True
+
+        self.delivery_seconds = None
+        if registry is not None:
+            self.delivery_seconds = registry.histogram("webhook_delivery_seconds", "웹훅 전송 시간",
+                                                       ("subscriber", "result"))
+            registry.register_callback("webhook_queue_depth", "전송/재시도 대기 중인 구독자 수",
+                                       lambda: {("ready",): self.ready.qsize(), ("retry",): len(self.retry_heap)},
+                                       ("queue",))
+
+        self.threads = [threading.Thread(target=self._worker, daemon=True) for _ in range(workers)]
+        self.threads.append(threading.Thread(target=self._retry_scheduler, daemon=True))
+        for thread in self.threads:
+            thread.start()
+
+    # --- 구독자 관리 ---
+    def register(self, url, name=None):
+        name = name or url
+        with self.lock:
+            if name in self.subscribers:
+                self.subscribers[name].url = url
+            else:
+                self.subscribers[name] = Subscriber(name, url, self.timeout)
+        return name
+
+    def unregister(self, name):
+        with self.lock:
+            subscriber = self.subscribers.pop(name, None)
+            if subscriber is None:
+                return False
+            subscriber.active = False
+            sending = subscriber.sending
+        if not sending:
+            subscriber.session.close()  # 전송 중이면 그 작업 스레드가 끝나고 닫는다
+        return True
+
+    # --- 이벤트 발행 ---
+    def dispatch(self, event):
+        """모든 구독자에게 이벤트 예약 (블로킹 없음, 스레드 생성 없음)"""
+        with self.lock:
+            for subscriber in self.subscribers.values():
+                if subscriber.pending is not None:
+                    subscriber.coalesced += 1
+                subscriber.pending = event
+                if not subscriber.scheduled:
+                    subscriber.scheduled = True
+                    self.ready.put(subscriber)
+
+    # --- 전송 ---
+    def _worker(self):
+        while self.running:
+            subscriber = self.ready.get()
+            if subscriber is None:
+                break
+            with self.lock:
+                event = subscriber.pending
+                subscriber.pending = None
+                if event is None or not subscriber.active:
+                    subscriber.scheduled = False
+                    continue
+                subscriber.sending = True
+
+            started = time.perf_counter()
+            retryable = True
+            try:
+                response = subscriber.session.post(subscriber.url, json=event, timeout=subscriber.timeout)
+                subscriber.last_status = response.status_code
+                ok = response.status_code < 400
+                retryable = response.status_code >= 500 or response.status_code in RETRYABLE_STATUS
+                error = None if ok else f"HTTP {response.status_code}"
+            except requests.exceptions.RequestException as e:
+                ok = False
+                error = str(e)
+            elapsed = time.perf_counter() - started
+            if self.delivery_seconds is not None:
+                self.delivery_seconds.observe(elapsed, subscriber.name, "ok" if ok else "error")
+
+            with self.lock:
+                subscriber.sending = False
+                if not subscriber.active:
+                    # 전송 중에 등록 해제됨 - 미뤄 둔 세션 닫기만 하고 재시도하지 않는다
+                    subscriber.pending = None
+                    subscriber.scheduled = False
+                    closed = True
+                else:
+                    closed = False
+            if closed:
+                subscriber.session.close()
+                continue
+
+            with self.lock:
+                if ok:
+                    subscriber.delivered += 1
+                    subscriber.latency_total += elapsed
+                    subscriber.latency_max = max(subscriber.latency_max, elapsed)
+                    subscriber.last_delivered_at = time.time()
+                    subscriber.attempts = 0
+                    if subscriber.pending is not None:
+                        self.ready.put(subscriber)  # 전송 중에 새 이벤트가 들어옴
+                    else:
+                        subscriber.scheduled = False
+                    continue
+
+                subscriber.failed += 1
+                subscriber.last_error = error
+                if not retryable:
+                    # 거부된 이벤트만 dead-letter - 전송 중에 들어온 새 이벤트는 그대로 보낸다
+                    dead = event
+                    subscriber.attempts = 0
+                    subscriber.dead_lettered += 1
+                    if subscriber.pending is not None:
+                        self.ready.put(subscriber)
+                    else:
+                        subscriber.scheduled = False
+                elif subscriber.attempts + 1 >= self.max_attempts:
+                    if subscriber.pending is None:
+                        subscriber.pending = event
+                    dead = subscriber.pending
+                    subscriber.pending = None
+                    subscriber.scheduled = False
+                    subscriber.attempts = 0  # 다음 이벤트는 다시 max_attempts번 시도
+                    subscriber.dead_lettered += 1
+                else:
+                    if subscriber.pending is None:
+                        subscriber.pending = event  # 더 새로운 이벤트가 없으면 같은 이벤트를 재시도
+                    subscriber.attempts += 1
+                    dead = None
+                    delay = min(self.max_backoff, self.min_backoff * 2 ** (subscriber.attempts - 1))
+                    delay *= random.uniform(0.8, 1.2)
+                    subscriber.retried += 1
+                    self.retry_counter += 1
+                    heapq.heappush(self.retry_heap, (time.time() + delay, self.retry_counter, subscriber))
+                    self.retry_wakeup.notify()
+
+            if dead is not None:
+                self._dead_letter(subscriber, dead, error)
+            print(f"웹훅 전송 실패 ({subscriber.name}): {error}")
+
+    def _retry_scheduler(self):
+        """백오프 시간이 된 구독자를 작업 큐로 되돌린다"""
+        with self.lock:
+            while self.running:
+                if not self.retry_heap:
+                    self.retry_wakeup.wait()
+                    continue
+                due, _, subscriber = self.retry_heap[0]
+                wait = due - time.time()
+                if wait > 0:
+                    self.retry_wakeup.wait(wait)
+                    continue
+                heapq.heappop(self.retry_heap)
+                self.ready.put(subscriber)
+
+    def _dead_letter(self, subscriber, event, error):
+        """재시도를 모두 실패한 이벤트를 JSONL 파일에 남긴다"""
+        record = {"subscriber": subscriber.name, "url": subscriber.url, "event": event,
+                  "error": error, "failed_at": time.time()}
+        directory = os.path.dirname(self.dead_letter_path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        with open(self.dead_letter_path, "a", encoding="utf-8") as f:
+            f.write(json.dumps(record, ensure_ascii=False) + "\n")
+        print(f"웹훅 dead-letter 기록 ({subscriber.name})")
+
+    def redeliver_dead_letters(self):
+        """dead-letter 파일의 이벤트를 구독자별로 다시 예약하고 파일을 비운다"""
+        if not os.path.exists(self.dead_letter_path):
+            return 0
+        with open(self.dead_letter_path, encoding="utf-8") as f:
+            records = [json.loads(line) for line in f if line.strip()]
+        os.remove(self.dead_letter_path)
+        count = 0
+        with self.lock:
+            for record in records:
+                subscriber = self.subscribers.get(record["subscriber"])
+                if subscriber is None:
+                    continue
+                if subscriber.pending is None:  # 더 새로운 이벤트가 있으면 그쪽이 우선
+                    subscriber.pending = record["event"]
+                    count += 1
+                if not subscriber.scheduled:
+                    subscriber.scheduled = True
+                    self.ready.put(subscriber)
+        return count
+
+    # --- 상태 ---
+    def metrics(self):
+        with self.lock:
+            return {
+                "subscribers": {name: subscriber.metrics() for name, subscriber in self.subscribers.items()},
+                "queue_depth": self.ready.qsize(),
+                "retry_waiting": len(self.retry_heap)
+            }
+
+    def close(self):
+        with self.lock:
+            self.running = False
+            self.retry_wakeup.notify_all()
+        for _ in range(len(self.threads) - 1):
+            self.ready.put(None)
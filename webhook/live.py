@@ -0,0 +1,63 @@
+import json
+import queue
+import threading
+
+# =============================================================================
+# 페이지 실시간 갱신용 SSE 채널
+#
+# 페이지 전체를 새로고침하는 대신, 값이 바뀔 때 JSON 한 줄을 밀어주고
+# 브라우저가 바뀐 필드만 고친다. 느린 구독자는 큐가 차면 끊는다
+# (EventSource가 재접속하면 현재 값부터 다시 받음).
+# =============================================================================
+
+
+class LiveSubscriber:
+    def __init__(self, max_queue):
+        self.queue = queue.Queue(maxsize=max_queue)
+        self.dropped = False
+
+
+class LiveChannel:
+    def __init__(self, max_queue=50, keepalive=15):
+        self.max_queue = max_queue
+        self.keepalive = keepalive
+        self.subscribers = set()
+        self.lock = threading.Lock()
+
+    def publish(self, data):
+        """구독자 모두에게 data 전달 (직렬화는 한 번만, 블로킹 없음)"""
+        message = f"data: {json.dumps(data, ensure_ascii=False)}\n\n"
+        with self.lock:
+            subscribers = list(self.subscribers)
+        for subscriber in subscribers:
+            try:
+                subscriber.queue.put_nowait(message)
+            except queue.Full:
+                subscriber.dropped = True
+                with self.lock:
+                    self.subscribers.discard(subscriber)
+
+    def stream(self, current):
+        """SSE 생성기 - 접속하자마자 current를 보내고 이후 변경만 전달"""
+        subscriber = LiveSubscriber(self.max_queue)
+        with self.lock:
+            self.subscribers.add(subscriber)
+
+        def generate():
+            try:
+                yield "retry: 3000\n\n"
+                yield f"data: {json.dumps(current, ensure_ascii=False)}\n\n"
+                while not subscriber.dropped:
+                    try:
+                        yield subscriber.queue.get(timeout=self.keepalive)
+                    except queue.Empty:
+                        yield ": keepalive\n\n"
+            finally:
+                with self.lock:
+                    self.subscribers.discard(subscriber)
+
+        return generate()
+
+    def client_count(self):
+        with self.lock:
+            return len(self.subscribers)
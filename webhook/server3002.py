@@ -1,23 +1,31 @@
-from flask import Flask, request, jsonify, render_template_string
-import requests
+from flask import Flask, Response, request, jsonify, render_template_string
+import os
+import sys
 import threading
 import time
+from email.utils import formatdate, parsedate_to_datetime
+
+from dispatcher import WebhookDispatcher
+
+# 지표 레지스트리는 mainflie/metrics.py 하나를 같이 쓴다 (복사본을 두지 않음)
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "mainflie"))
+from metrics import REGISTRY, CONTENT_TYPE as METRICS_CONTENT_TYPE
 
 app_3002 = Flask(__name__)
 
 # 저장할 데이터
 current_value = {"data": "초기값", "timestamp": time.time()}
 
+# 값이 바뀌면 롱폴링으로 기다리는 요청을 깨운다
+data_changed = threading.Condition()
+MAX_WAIT_SECONDS = 30
+
 # 3003 서버에 알림을 보낼 URL
 WEBHOOK_URL = "http://localhost:3003/webhook"
 
-def notify_server_3003(data):
-    """3003 서버에 데이터 변경을 알리는 함수"""
-    try:
-        response = requests.post(WEBHOOK_URL, json=data, timeout=5)
-        print(f"3003 서버에 알림 전송: {response.status_code}")
-    except requests.exceptions.RequestException as e:
-        print(f"3003 서버 알림 실패: {e}")
+# 웹훅 디스패처 (구독자별 세션, 고정 작업 스레드, 병합/재시도/dead-letter)
+dispatcher = WebhookDispatcher(workers=4, registry=REGISTRY)
+dispatcher.register(WEBHOOK_URL, name="server3003")
 
 @app_3002.route('/')
 def index_3002():
@@ -49,18 +57,59 @@ def index_3002():
             <hr>
             <h3>API 엔드포인트:</h3>
             <ul>
-                <li>GET /api/data - 현재 데이터 조회</li>
+                <li>GET /api/data - 현재 데이터 조회 (?since=타임스탬프&amp;wait=초 롱폴링, ETag/If-Modified-Since)</li>
                 <li>POST /update - 데이터 업데이트 (웹훅 알림 포함)</li>
+                <li>GET/POST /api/webhooks - 구독자 목록·전송 지표 / 구독자 등록</li>
+                <li>DELETE /api/webhooks/&lt;name&gt; - 구독자 삭제</li>
             </ul>
         </div>
     </body>
     </html>
     ''', current_value=current_value)
 
+def not_modified(value):
+    """요청의 If-None-Match / If-Modified-Since 기준으로 value가 바뀌지 않았는지"""
+    if request.if_none_match:
+        return request.if_none_match.contains(etag_for(value))
+    since = request.headers.get('If-Modified-Since')
+    if since:
+        try:
+            return int(value["timestamp"]) <= parsedate_to_datetime(since).timestamp()
+        except (TypeError, ValueError):
+            return False
+    return False
+
+def etag_for(value):
+    return repr(value["timestamp"])
+
 @app_3002.route('/api/data', methods=['GET'])
 def get_data():
-    """현재 데이터를 반환하는 API"""
-    return jsonify(current_value)
+    """현재 데이터를 반환하는 API
+
+    롱폴링: ?wait=초 를 주면 값이 바뀔 때까지(최대 wait초) 기다린다.
+    기준은 ?since=타임스탬프 또는 If-None-Match(ETag). 끝까지 바뀌지 않으면 304.
+    """
+    since = request.args.get('since', type=float)
+    wait = min(max(request.args.get('wait', 0, type=float), 0), MAX_WAIT_SECONDS)
+
+    def unchanged():
+        if since is not None:
+            return current_value["timestamp"] <= since
+        return not_modified(current_value)
+
+    if wait and unchanged():
+        with data_changed:
+            data_changed.wait_for(lambda: not unchanged(), timeout=wait)
+
+    value = current_value
+    headers = {
+        "ETag": f'"{etag_for(value)}"',
+        "Last-Modified": formatdate(value["timestamp"], usegmt=True),
+        "Cache-Control": "no-cache"
+    }
+    if (since is not None and value["timestamp"] <= since) or not_modified(value):
+        return "", 304, headers
+    return jsonify(value), 200, headers
 
 @app_3002.route('/update', methods=['POST'])
 def update_data():
@@ -69,17 +118,50 @@ def update_data():
     
     new_value = request.form.get('new_value') or request.json.get('new_value')
     if new_value:
-        current_value = {
-            "data": new_value,
-            "timestamp": time.time()
-        }
+        with data_changed:
+            current_value = {
+                "data": new_value,
+                "timestamp": time.time()
+            }
+            data_changed.notify_all()
         
-        # 별도 스레드에서 3003 서버에 알림 (논블로킹)
-        threading.Thread(target=notify_server_3003, args=(current_value,)).start()
+        # 구독자들에게 알림 예약 (논블로킹, 빠른 연속 변경은 최신 값 하나로 병합)
+        dispatcher.dispatch(current_value)
         
         return jsonify({"success": True, "message": "데이터가 업데이트되었습니다.", "data": current_value})
     
     return jsonify({"success": False, "message": "새로운 값이 필요합니다."})
 
+@app_3002.route('/api/webhooks', methods=['GET'])
+def list_webhooks():
+    """구독자 목록과 구독자별 전송 지표"""
+    return jsonify(dispatcher.metrics())
+
+@app_3002.route('/api/webhooks', methods=['POST'])
+def register_webhook():
+    """웹훅 구독자 등록 ({"url": ..., "name": ...})"""
+    data = request.get_json(silent=True) or {}
+    if not data.get("url"):
+        return jsonify({"success": False, "message": "url이 필요합니다."}), 400
+    name = dispatcher.register(data["url"], data.get("name"))
+    return jsonify({"success": True, "name": name})
+
+@app_3002.route('/api/webhooks/<name>', methods=['DELETE'])
+def unregister_webhook(name):
+    """웹훅 구독자 삭제"""
+    if not dispatcher.unregister(name):
+        return jsonify({"success": False, "message": "없는 구독자입니다."}), 404
+    return jsonify({"success": True})
+
+@app_3002.route('/api/webhooks/redeliver', methods=['POST'])
+def redeliver_webhooks():
+    """dead-letter 파일의 이벤트를 다시 전송"""
+    return jsonify({"success": True, "count": dispatcher.redeliver_dead_letters()})
+
+@app_3002.route('/metrics')
+def metrics():
+    """Prometheus 지표 (웹훅 전송 시간/결과, 대기열 깊이)"""
+    return Response(REGISTRY.render(), mimetype=METRICS_CONTENT_TYPE)
+
 if __name__ == '__main__':
-    app_3002.run(host='localhost', port=3002, debug=True)
\ No newline at end of file
+    app_3002.run(host='localhost', port=3002, debug=True, threaded=True)
\ No newline at end of file
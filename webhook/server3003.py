@@ -1,15 +1,19 @@
-from flask import Flask, request, jsonify, render_template_string
+from flask import Flask, Response, request, jsonify
 import requests
 import time
 
+from live import LiveChannel
+
 app_3003 = Flask(__name__)
 
 # 3002 서버로부터 받은 데이터를 저장
 received_data = {"data": "아직 데이터가 없습니다", "timestamp": 0, "last_updated": "없음"}
 
-@app_3003.route('/')
-def index_3003():
-    return render_template_string('''
+# 값이 바뀌면 열린 페이지에 바뀐 값만 밀어주는 SSE 채널
+live = LiveChannel()
+
+# 페이지 템플릿은 시작할 때 한 번만 컴파일 (요청마다 다시 파싱하지 않음)
+INDEX_TEMPLATE = app_3003.jinja_env.from_string('''
     <!DOCTYPE html>
     <html>
     <head>
@@ -33,10 +37,25 @@ def index_3003():
             .status { color: #666; font-size: 0.9em; }
         </style>
         <script>
-            // 5초마다 자동으로 페이지 새로고침 (실시간 효과)
-            setTimeout(function() {
-                location.reload();
-            }, 5000);
+            // 페이지를 새로고침하지 않고 바뀐 필드만 고친다
+            function applyData(data) {
+                for (const key of ["data", "last_updated", "timestamp"]) {
+                    const el = document.getElementById(key);
+                    if (el && el.textContent !== String(data[key])) {
+                        el.textContent = data[key];
+                    }
+                }
+            }
+            function refreshData() {
+                fetch("/api/current").then(r => r.json()).then(applyData).catch(() => {});
+            }
+            if (window.EventSource) {
+                // 실시간 스트림 (끊기면 브라우저가 자동 재접속)
+                const source = new EventSource("/api/stream");
+                source.onmessage = (e) => applyData(JSON.parse(e.data));
+            } else {
+                setInterval(refreshData, 5000);
+            }
         </script>
     </head>
     <body>
@@ -44,23 +63,28 @@ def index_3003():
             <h1>서버 3003 - 데이터 표시</h1>
             <div class="data-display">
                 <h2>🔄 실시간 데이터:</h2>
-                <h3>{{ received_data.data }}</h3>
+                <h3 id="data">{{ received_data.data }}</h3>
                 <p class="status">
-                    마지막 업데이트: {{ received_data.last_updated }}<br>
-                    원본 타임스탬프: {{ received_data.timestamp }}
+                    마지막 업데이트: <span id="last_updated">{{ received_data.last_updated }}</span><br>
+                    원본 타임스탬프: <span id="timestamp">{{ received_data.timestamp }}</span>
                 </p>
             </div>
             
-            <button class="refresh-btn" onclick="location.reload()">수동 새로고침</button>
+            <button class="refresh-btn" onclick="refreshData()">수동 새로고침</button>
             
             <hr>
             <h3>수신 로그:</h3>
             <p>이 서버는 localhost:3002의 데이터 변경을 실시간으로 받아 표시합니다.</p>
             <p>웹훅 엔드포인트: POST /webhook</p>
+            <p>실시간 스트림: GET /api/stream (SSE)</p>
         </div>
     </body>
     </html>
-    ''', received_data=received_data)
+    ''')
+
+@app_3003.route('/')
+def index_3003():
+    return INDEX_TEMPLATE.render(received_data=received_data)
 
 @app_3003.route('/webhook', methods=['POST'])
 def receive_webhook():
@@ -76,6 +100,7 @@ def receive_webhook():
                 "last_updated": time.strftime("%Y-%m-%d %H:%M:%S")
             }
             print(f"웹훅으로 데이터 수신: {received_data}")
+            live.publish(received_data)
             return jsonify({"success": True, "message": "데이터를 성공적으로 받았습니다."})
     except Exception as e:
         print(f"웹훅 처리 오류: {e}")
@@ -87,5 +112,14 @@ def get_current_data():
     """현재 표시 중인 데이터 반환"""
     return jsonify(received_data)
 
+@app_3003.route('/api/stream')
+def stream_current_data():
+    """현재 데이터 SSE 스트림 - 접속 시 현재 값, 이후 웹훅으로 바뀔 때마다 전송"""
+    return Response(
+        live.stream(received_data),
+        mimetype='text/event-stream',
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
 if __name__ == '__main__':
-    app_3003.run(host='localhost', port=3003, debug=True)
\ No newline at end of file
+    app_3003.run(host='localhost', port=3003, debug=True, threaded=True)
\ No newline at end of file
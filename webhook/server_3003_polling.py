@@ -1,36 +1,129 @@
-from flask import Flask, render_template_string, jsonify
+from flask import Flask, Response, jsonify
 import requests
 import threading
 import time
 
+from live import LiveChannel
+
 app_polling = Flask(__name__)
 
 # 폴링으로 가져온 데이터
 polled_data = {"data": "폴링 대기 중...", "timestamp": 0, "last_checked": "없음"}
 
-def poll_server_3002():
-    """3002 서버를 주기적으로 폴링하는 함수"""
-    global polled_data
+# 값이 바뀌면 열린 페이지에 바뀐 값만 밀어주는 SSE 채널
+live = LiveChannel()
+
+POLL_URL = "http://localhost:3002/api/data"
+
+class Poller:
+    """3002 서버를 확인하는 단일 폴링 작업자
     
-    while True:
-        try:
-            response = requests.get("http://localhost:3002/api/data", timeout=5)
-            if response.status_code == 200:
-                data = response.json()
-                polled_data = {
-                    "data": data.get("data", ""),
-                    "timestamp": data.get("timestamp", 0),
-                    "last_checked": time.strftime("%Y-%m-%d %H:%M:%S")
-                }
-                print(f"폴링으로 데이터 확인: {polled_data}")
-        except requests.exceptions.RequestException as e:
-            print(f"폴링 실패: {e}")
+    - 스레드는 하나만 돈다 (start를 여러 번 불러도 추가로 생기지 않음)
+    - 실행마다 자기 정지 이벤트를 가진다 - stop 직후 start하면 롱폴링에 묶인 이전
+      스레드는 돌아오는 대로 끝나고 새 스레드가 바로 이어받는다
+    - keep-alive 세션 하나로 롱폴링(?since=&wait=) + ETag 조건부 요청
+    - 서버가 롱폴링을 지원하지 않아 바로 응답하면, 값이 그대로일 때마다
+      간격을 늘리고(최대 max_interval) 값이 바뀌면 다시 줄인다
+    - 연결 오류는 지수 백오프
+    """
+    
+    def __init__(self, url=POLL_URL, wait=25, min_interval=1.0, max_interval=30.0):
+        self.url = url
+        self.wait = wait
+        self.min_interval = min_interval
+        self.max_interval = max_interval
+        self.interval = min_interval
+        self.session = requests.Session()
+        self.etag = None
+        self.lock = threading.Lock()
+        self.stop_event = threading.Event()
+        self.thread = None
+        self.requests = 0
+        self.changes = 0
+    
+    def start(self):
+        """폴링 시작 - 이미 돌고 있으면 False"""
+        with self.lock:
+            if self.running():
+                return False
+            self.stop_event = threading.Event()  # 멈추는 중인 이전 스레드와 따로
+            self.session = requests.Session()     # 세션도 스레드끼리 나눠 쓰지 않음
+            self.thread = threading.Thread(target=self.run, args=(self.stop_event, self.session), daemon=True)
+            self.thread.start()
+            return True
+    
+    def stop(self):
+        with self.lock:
+            self.stop_event.set()
+    
+    def running(self):
+        return self.thread is not None and self.thread.is_alive() and not self.stop_event.is_set()
+    
+    def poll_once(self, stop_event=None, session=None):
+        """한 번 확인 → 값이 바뀌었으면 True"""
+        global polled_data
+        session = session or self.session
+        params = {"wait": self.wait}
+        if polled_data["timestamp"]:
+            params["since"] = polled_data["timestamp"]
+        headers = {"If-None-Match": self.etag} if self.etag else {}
+        response = session.get(self.url, params=params, headers=headers, timeout=self.wait + 10)
+        self.requests += 1
+        if stop_event is not None and stop_event.is_set():
+            return False  # 기다리는 동안 멈춤 - 결과는 새 실행에 맡긴다
         
-        time.sleep(3)  # 3초마다 확인
+        if response.status_code == 304:
+            polled_data = dict(polled_data, last_checked=time.strftime("%Y-%m-%d %H:%M:%S"))
+            return False
+        response.raise_for_status()
+        data = response.json()
+        self.etag = response.headers.get("ETag")
+        changed = data.get("timestamp", 0) != polled_data["timestamp"]
+        polled_data = {
+            "data": data.get("data", ""),
+            "timestamp": data.get("timestamp", 0),
+            "last_checked": time.strftime("%Y-%m-%d %H:%M:%S")
+        }
+        if changed:
+            self.changes += 1
+            print(f"폴링으로 데이터 변경 확인: {polled_data}")
+            live.publish(polled_data)
+        return changed
+    
+    def run(self, stop_event, session):
+        while not stop_event.is_set():
+            started = time.monotonic()
+            try:
+                changed = self.poll_once(stop_event, session)
+            except (requests.exceptions.RequestException, ValueError) as e:
+                print(f"폴링 실패: {e} ({self.interval:.1f}초 후 재시도)")
+                stop_event.wait(self.interval)
+                self.interval = min(self.interval * 2, self.max_interval)
+                continue
+            
+            if changed:
+                self.interval = self.min_interval
+                continue  # 바로 다음 변경을 기다린다
+            if time.monotonic() - started >= self.wait / 2:
+                continue  # 서버가 롱폴링으로 붙잡고 있었음 - 쉬지 않고 다시 대기
+            # 서버가 바로 응답함 (롱폴링 미지원) - 변화가 없으면 점점 드물게 확인
+            stop_event.wait(self.interval)
+            self.interval = min(self.interval * 1.5, self.max_interval)
+        session.close()
+    
+    def status(self):
+        return {
+            "running": self.running(),
+            "url": self.url,
+            "interval": round(self.interval, 2),
+            "requests": self.requests,
+            "changes": self.changes
+        }
 
-@app_polling.route('/')
-def index_polling():
-    return render_template_string('''
+poller = Poller()
+
+# 페이지 템플릿은 시작할 때 한 번만 컴파일 (요청마다 다시 파싱하지 않음)
+INDEX_TEMPLATE = app_polling.jinja_env.from_string('''
     <!DOCTYPE html>
     <html>
     <head>
@@ -47,7 +140,23 @@ def index_polling():
             .status { color: #666; font-size: 0.9em; }
         </style>
         <script>
-            setTimeout(function() { location.reload(); }, 4000);
+            // 페이지를 새로고침하지 않고 바뀐 필드만 고친다
+            function applyData(data) {
+                for (const key of ["data", "last_checked", "timestamp"]) {
+                    const el = document.getElementById(key);
+                    if (el && el.textContent !== String(data[key])) {
+                        el.textContent = data[key];
+                    }
+                }
+            }
+            if (window.EventSource) {
+                const source = new EventSource("/api/stream");
+                source.onmessage = (e) => applyData(JSON.parse(e.data));
+            } else {
+                setInterval(() => {
+                    fetch("/api/current").then(r => r.json()).then(applyData).catch(() => {});
+                }, 4000);
+            }
         </script>
     </head>
     <body>
@@ -55,29 +164,59 @@ def index_polling():
             <h1>서버 3003 - 폴링 방식</h1>
             <div class="data-display">
                 <h2>📊 폴링된 데이터:</h2>
-                <h3>{{ polled_data.data }}</h3>
+                <h3 id="data">{{ polled_data.data }}</h3>
                 <p class="status">
-                    마지막 확인: {{ polled_data.last_checked }}<br>
-                    원본 타임스탬프: {{ polled_data.timestamp }}
+                    마지막 확인: <span id="last_checked">{{ polled_data.last_checked }}</span><br>
+                    원본 타임스탬프: <span id="timestamp">{{ polled_data.timestamp }}</span>
                 </p>
             </div>
             
             <hr>
             <h3>폴링 정보:</h3>
-            <p>이 서버는 3초마다 localhost:3002를 확인합니다.</p>
+            <p>이 서버는 롱폴링으로 localhost:3002의 변경을 기다립니다 (지원하지 않으면 간격을 조절하며 확인).</p>
             <p>폴링은 정기적으로 데이터를 확인하는 방식으로, 실시간성은 떨어지지만 구현이 간단합니다.</p>
         </div>
     </body>
     </html>
-    ''', polled_data=polled_data)
+    ''')
+
+@app_polling.route('/')
+def index_polling():
+    return INDEX_TEMPLATE.render(polled_data=polled_data)
+
+@app_polling.route('/api/current')
+def get_current_data():
+    """현재 폴링된 데이터"""
+    return jsonify(polled_data)
+
+@app_polling.route('/api/stream')
+def stream_current_data():
+    """폴링된 데이터 SSE 스트림 - 접속 시 현재 값, 이후 바뀔 때마다 전송"""
+    return Response(
+        live.stream(polled_data),
+        mimetype='text/event-stream',
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
 
 @app_polling.route('/start-polling')
 def start_polling():
-    """폴링을 시작하는 엔드포인트"""
-    threading.Thread(target=poll_server_3002, daemon=True).start()
-    return jsonify({"message": "폴링이 시작되었습니다."})
+    """폴링을 시작하는 엔드포인트 (이미 실행 중이면 그대로 둠)"""
+    if poller.start():
+        return jsonify({"message": "폴링이 시작되었습니다."})
+    return jsonify({"message": "폴링이 이미 실행 중입니다."})
+
+@app_polling.route('/stop-polling')
+def stop_polling():
+    """폴링을 멈추는 엔드포인트"""
+    poller.stop()
+    return jsonify({"message": "폴링을 멈춥니다."})
+
+@app_polling.route('/api/polling')
+def polling_status():
+    """폴링 작업자 상태"""
+    return jsonify(poller.status())
 
 if __name__ == '__main__':
     # 서버 시작 시 폴링도 같이 시작
-    threading.Thread(target=poll_server_3002, daemon=True).start()
-    app_polling.run(host='localhost', port=3004, debug=True)
\ No newline at end of file
+    poller.start()
+    app_polling.run(host='localhost', port=3004, debug=True, threaded=True)
\ No newline at end of file